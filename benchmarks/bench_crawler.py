@@ -0,0 +1,95 @@
+"""
+Measures fetches per second of the threaded and the asyncio crawler against a local stand-in web server.
+The server answers from a separate process after a simulated latency, and serves the same site under many hosts
+(127.0.0.1, 127.0.0.2, ...), such that per-host politeness does not limit the crawl.
+Run from the repository root: python -m benchmarks.bench_crawler
+"""
+import argparse
+import asyncio
+import multiprocessing
+import threading
+import time
+from tempfile import TemporaryDirectory
+
+from aiohttp import web
+
+from webcrawling.async_crawler import AsyncCrawler
+from webcrawling.crawler import Crawler
+
+
+def serve(port, latency, num_hosts, links):
+    """ Serves an endless site where every page links to pages on other hosts """
+    async def page(request):
+        await asyncio.sleep(latency)
+        number = int(request.match_info['number'])
+        hrefs = ''.join(f'<a href="http://127.0.0.{(number * links + link) % num_hosts + 1}:{port}/'
+                        f'{number * links + link}">page</a>' for link in range(1, links + 1))
+
+        return web.Response(text=f'<html><body><p>page {number}</p>{hrefs}</body></html>', content_type='text/html')
+
+    async def robots(_):
+        return web.Response(text='User-agent: *\nDisallow: /private\n', content_type='text/plain')
+
+    app = web.Application()
+    app.router.add_get('/robots.txt', robots)
+    app.router.add_get('/{number}', page)
+    web.run_app(app, host='0.0.0.0', port=port, print=None, access_log=None)
+
+
+def measure(crawler, start_crawl, duration):
+    """ Returns the number of pages fetched per second while crawling for a duration """
+    start = time.perf_counter()
+    start_crawl()
+    time.sleep(duration)
+    stage_stats = crawler.get_stage_stats()
+    crawler.stop_crawlers()
+
+    fetch_rate, parse_rate, num_waiting, fetch_wait_time = stage_stats
+    print(f'  fetched {fetch_rate:.1f} and parsed {parse_rate:.1f} pages/sec, {num_waiting} pages waiting to be '
+          f'parsed, fetching waited {fetch_wait_time:.1f}s for the parsers')
+
+    return crawler.num_requests / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--hosts', type=int, default=250)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--threads', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=1000)
+    parser.add_argument('--parsers', type=int, default=Crawler.DefaultParsers)
+    args = parser.parse_args()
+
+    server = multiprocessing.Process(target=serve, args=(args.port, args.latency, args.hosts, 10), daemon=True)
+    server.start()
+    time.sleep(1)
+    seeds = [f'http://127.0.0.{host + 1}:{args.port}/{host}' for host in range(args.hosts)]
+    documents_directory = TemporaryDirectory()
+
+    # Politeness is disabled, since it would otherwise bound the fetch rate of both crawlers
+    threaded = Crawler(threads=args.threads, parsers=args.parsers,
+                       documents_path=f'{documents_directory.name}/threaded')
+    threaded.back_heap.delay = 0
+    threaded.back_heap.response_time_factor = 0
+
+    def start_threaded():
+        for seed in seeds:
+            threaded.queue_raw_url(seed)
+        threaded.start_crawlers()
+
+    print(f'threaded, {args.threads} threads, {args.parsers} parsers:')
+    print(f'  {measure(threaded, start_threaded, args.duration):8.1f} fetches/sec')
+    num_requests, num_connections, reuse_ratio, median_latency, _ = threaded.http.get_stats()
+    print(f'  {num_requests} requests over {num_connections} connections, {reuse_ratio:.1%} reused, '
+          f'median latency {median_latency * 1000:.1f} ms')
+
+    asynchronous = AsyncCrawler(concurrency=args.concurrency, delay=0, parsers=args.parsers,
+                                documents_path=f'{documents_directory.name}/asynchronous')
+    asynchronous.back_heap.response_time_factor = 0
+    crawl = threading.Thread(target=asynchronous.start_crawlers, args=(seeds,))
+    print(f'asyncio, {args.concurrency} concurrent, {args.parsers} parsers:')
+    rate = measure(asynchronous, crawl.start, args.duration)
+    crawl.join()
+    print(f'  {rate:8.1f} fetches/sec')
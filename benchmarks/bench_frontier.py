@@ -0,0 +1,56 @@
+"""
+Measures enqueue and dequeue throughput and peak memory of a front queue holding many URLs, for an in-memory Queue
+and a SpillingQueue. Each queue is measured in a separate process, such that peak memory is its own.
+Run from the repository root: python -m benchmarks.bench_frontier
+"""
+import argparse
+import multiprocessing
+import resource
+import time
+from functools import partial
+from queue import Queue
+
+from webcrawling.spilling_queue import SpillingQueue
+
+
+def synthetic_url(i):
+    return f'http://www.host{i % 100000}.com/section/{i // 7}/article-{i}'
+
+
+def measure(make_queue, num_urls, results):
+    # Peak resident memory is reported in kilobytes on Linux
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue = make_queue()
+
+    start = time.perf_counter()
+    for i in range(num_urls):
+        queue.put(synthetic_url(i))
+    put_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(num_urls):
+        queue.get()
+    get_time = time.perf_counter() - start
+
+    results.put((num_urls / put_time, num_urls / get_time,
+                 (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline) / 1024))
+
+
+def run(name, make_queue, num_urls):
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=measure, args=(make_queue, num_urls, results))
+    process.start()
+    put_rate, get_rate, peak_memory = results.get()
+    process.join()
+
+    print(f'{name:16} {put_rate:10.0f} puts/sec {get_rate:10.0f} gets/sec {peak_memory:8.0f} MB peak memory')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--urls', type=int, default=10000000)
+    parser.add_argument('--segment-size', type=int, default=SpillingQueue.DefaultSegmentSize)
+    args = parser.parse_args()
+
+    run('Queue', Queue, args.urls)
+    run('SpillingQueue', partial(SpillingQueue, segment_size=args.segment_size), args.urls)
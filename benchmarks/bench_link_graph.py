@@ -0,0 +1,33 @@
+"""
+Compares the memory held by a dictionary of reference sets and by a link graph, and the time to build a PageRank graph.
+Run from the repository root: python -m benchmarks.bench_link_graph
+"""
+import argparse
+import time
+
+from benchmarks.bench_pagerank import synthetic_references
+from benchmarks.bench_postings import measure
+from ranking.pagerank import PageRank
+from shared.link_graph import LinkGraph
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--urls', type=int, default=100000)
+    parser.add_argument('--out-degree', type=int, default=20)
+    args = parser.parse_args()
+
+    # Only the URLs are generated outside of measurement, since both layouts share the URL strings
+    references = synthetic_references(args.urls, args.out_degree)
+    reference_lists = {url: list(links) for url, links in references.items()}
+    num_links = sum(len(links) for links in references.values())
+
+    url_references, dict_size = measure(lambda: {url: set(links) for url, links in reference_lists.items()})
+    link_graph, graph_size = measure(lambda: LinkGraph.from_references(reference_lists))
+    print(f'{args.urls} URLs, {num_links} links')
+    print(f'dictionary of sets: {dict_size / num_links:6.1f} bytes/link')
+    print(f'link graph:         {graph_size / num_links:6.1f} bytes/link')
+
+    for name, links in (('dictionary of sets', url_references), ('link graph', link_graph)):
+        start = time.perf_counter()
+        PageRank(links).construct_graph()
+        print(f'{name + ":":19} {time.perf_counter() - start:6.2f}s to build the PageRank graph')
@@ -0,0 +1,83 @@
+"""
+Compares time and memory of PageRank with a dense transition matrix and with sparse iteration over blocks of URLs.
+Then measures re-ranking after the graph grows slightly, starting from the previous ranks or from a uniform vector.
+Run from the repository root: python -m benchmarks.bench_pagerank
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from ranking.pagerank import PageRank
+
+
+def synthetic_references(num_urls, out_degree, dangling=0.1, seed=0):
+    """ Generates a link graph where popular URLs attract more links, and a fraction of URLs link nowhere """
+    random = np.random.default_rng(seed)
+    urls = [f'http://example.com/{idx}' for idx in range(num_urls)]
+
+    return {url: set() if random.random() < dangling else
+            {urls[target] for target in np.minimum(random.zipf(1.5, random.poisson(out_degree)), num_urls) - 1}
+            for url in urls}
+
+
+def grow(references, fraction, seed=1):
+    """ Adds new URLs that link to and are linked from existing URLs, as a crawl increment would """
+    random = np.random.default_rng(seed)
+    urls = list(references)
+    new_references = dict()
+
+    for idx in range(int(len(urls) * fraction)):
+        url = f'http://example.com/new/{idx}'
+        new_references[url] = {urls[target] for target in random.integers(0, len(urls), 10)}
+        new_references.setdefault(urls[random.integers(0, len(urls))], set()).add(url)
+
+    return new_references
+
+
+def run(references, dense):
+    """ Returns the ranks, the time taken and the peak number of bytes allocated while ranking """
+    tracemalloc.start()
+    start = time.perf_counter()
+    ranks = PageRank(references).rank(dense=dense)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return dict(ranks), elapsed, peak
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 4000, 100000, 1000000])
+    parser.add_argument('--out-degree', type=int, default=20)
+    parser.add_argument('--max-dense', type=int, default=5000)
+    parser.add_argument('--increment', type=float, default=0.01)
+    parser.add_argument('--tolerance', type=float, default=1e-9)
+    args = parser.parse_args()
+
+    for num_urls in args.sizes:
+        references = synthetic_references(num_urls, args.out_degree)
+        sparse, sparse_time, sparse_peak = run(references, dense=False)
+        print(f'{num_urls:8d} URLs, sparse: {sparse_time:7.2f}s, {sparse_peak / 2 ** 20:8.1f} MB peak')
+
+        # The dense matrix needs 8 * N^2 bytes, so it is only run for small graphs
+        if num_urls <= args.max_dense:
+            dense, dense_time, dense_peak = run(references, dense=True)
+            difference = max(abs(sparse[url] - dense[url]) for url in dense)
+            print(f'{num_urls:8d} URLs, dense:  {dense_time:7.2f}s, {dense_peak / 2 ** 20:8.1f} MB peak, '
+                  f'max difference {difference:.1e}')
+
+    # Re-rank the largest graph after a crawl increment, with and without the previous ranks
+    references = synthetic_references(args.sizes[-1], args.out_degree)
+    new_references = grow(references, args.increment)
+    for warm_start in (False, True):
+        page_rank = PageRank({url: set(links) for url, links in references.items()})
+        page_rank.rank(tolerance=args.tolerance)
+
+        start = time.perf_counter()
+        page_rank.update(new_references, tolerance=args.tolerance, warm_start=warm_start)
+        print(f'{"warm" if warm_start else "cold"} start after {args.increment:.0%} growth: '
+              f'{time.perf_counter() - start:7.2f}s, {page_rank.iterations} iterations, '
+              f'residual {page_rank.residual:.1e}')
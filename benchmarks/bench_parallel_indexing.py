@@ -0,0 +1,58 @@
+"""
+Measures how indexing scales with the number of worker processes, and checks that the result matches a serial build.
+Run from the repository root: python -m benchmarks.bench_parallel_indexing
+"""
+import argparse
+import os
+import string
+import time
+
+import numpy as np
+
+from indexing.indexer import Indexer
+
+
+def synthetic_documents(num_documents, document_length, vocabulary_size, seed=0):
+    """ Generates documents of random words whose frequencies follow a Zipfian distribution """
+    random = np.random.default_rng(seed)
+    letters = np.array(list(string.ascii_lowercase))
+    vocabulary = [''.join(random.choice(letters, random.integers(3, 10))) for _ in range(vocabulary_size)]
+
+    return {f'http://example.com/{doc}': ' '.join(vocabulary[term] for term in
+                                                  np.minimum(random.zipf(1.2, document_length), vocabulary_size) - 1)
+            for doc in range(num_documents)}
+
+
+def postings_of(indexer):
+    return {term: (postings.doc_ids().tolist(), postings.tfs().tolist())
+            for term, postings in indexer.term_dict._term_postings.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--documents', type=int, default=4000)
+    parser.add_argument('--length', type=int, default=500)
+    parser.add_argument('--vocabulary', type=int, default=50000)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    documents = synthetic_documents(args.documents, args.length, args.vocabulary)
+    serial_postings = None
+    serial_time = None
+
+    workers = 1
+    while workers <= args.max_workers:
+        indexer = Indexer()
+        start = time.perf_counter()
+        indexer.index_corpus(documents, workers=workers)
+        elapsed = time.perf_counter() - start
+
+        if serial_postings is None:
+            serial_postings, serial_time = postings_of(indexer), elapsed
+            identical = True
+        else:
+            identical = postings_of(indexer) == serial_postings
+
+        print(f'{workers:3d} workers: {elapsed:7.2f}s, speedup {serial_time / elapsed:5.2f}x, '
+              f'{"identical to" if identical else "DIFFERENT FROM"} serial build')
+        workers *= 2
@@ -0,0 +1,67 @@
+"""
+Compares the memory used per posting by dictionary postings and compressed postings on a synthetic corpus.
+Run from the repository root: python -m benchmarks.bench_postings
+"""
+import argparse
+import tracemalloc
+
+import numpy as np
+
+from indexing.postings import CompressedPostings
+
+
+def synthetic_corpus(num_documents, document_length, vocabulary_size, seed=0):
+    """ Generates documents of term IDs following a Zipfian distribution, as natural language roughly does """
+    random = np.random.default_rng(seed)
+
+    for _ in range(num_documents):
+        yield np.minimum(random.zipf(1.2, document_length), vocabulary_size) - 1
+
+
+def build_dict_postings(corpus):
+    term_postings = dict()
+
+    for doc_id, terms in enumerate(corpus):
+        for term in terms.tolist():
+            postings = term_postings.setdefault(f'term{term}', dict())
+            postings[doc_id] = postings.get(doc_id, 0) + 1
+
+    return term_postings
+
+
+def measure(build):
+    """ Returns the result of build and the number of bytes it has allocated and still holds """
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return result, size
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--documents', type=int, default=5000)
+    parser.add_argument('--length', type=int, default=300)
+    parser.add_argument('--vocabulary', type=int, default=100000)
+    args = parser.parse_args()
+
+    term_postings = build_dict_postings(synthetic_corpus(args.documents, args.length, args.vocabulary))
+    num_postings = sum(len(postings) for postings in term_postings.values())
+    terms = list(term_postings)
+
+    # Measure the postings only, since both layouts share the term strings
+    compressed, compressed_size = measure(
+        lambda: {term: CompressedPostings.from_dict(term_postings[term]) for term in terms})
+    del term_postings
+
+    # Document IDs are converted from arrays to get fresh int objects, as when they are created by indexing
+    _, dict_size = measure(
+        lambda: {term: dict(zip(postings.doc_ids().tolist(), postings.tfs().tolist()))
+                 for term, postings in compressed.items()})
+    payload_size = sum(postings.nbytes() for postings in compressed.values())
+
+    print(f'{len(terms)} terms, {num_postings} postings')
+    print(f'dict postings:       {dict_size / num_postings:8.2f} bytes/posting')
+    print(f'compressed postings: {compressed_size / num_postings:8.2f} bytes/posting '
+          f'({payload_size / num_postings:.2f} bytes/posting excluding object overhead)')
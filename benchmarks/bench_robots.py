@@ -0,0 +1,70 @@
+"""
+Measures robots.txt rule matching throughput of the compiled matcher against scanning every rule, on a synthetic
+robots.txt with many rules, and checks that both agree.
+Run from the repository root: python -m benchmarks.bench_robots
+"""
+import argparse
+import random
+import time
+
+from webcrawling.parser.robots_parser import RobotsParser, _compile_pattern
+
+
+def synthetic_robots(num_rules, seed=0):
+    """ Returns robots.txt for any user agent with mostly plain Disallow rules, and some Allow and wildcard rules """
+    rng = random.Random(seed)
+    lines = ['User-agent: *']
+    for rule in range(num_rules):
+        kind = rng.random()
+        if kind < 0.05:
+            lines.append(f'Disallow: /*.ext{rule}$')
+        elif kind < 0.25:
+            lines.append(f'Allow: /section{rng.randrange(num_rules)}/public{rule}/')
+        else:
+            lines.append(f'Disallow: /section{rule}/')
+
+    return '\n'.join(lines)
+
+
+def synthetic_paths(num_paths, num_rules, seed=1):
+    rng = random.Random(seed)
+
+    return [f'/section{rng.randrange(2 * num_rules)}/{rng.choice(("page", "public"))}{rng.randrange(num_rules)}/'
+            f'{rng.choice(("", ".html", f".ext{rng.randrange(num_rules)}"))}' for _ in range(num_paths)]
+
+
+def scan_rules(rules, path):
+    """ Decides access by matching the path against every rule, the longest match deciding and Allow winning ties """
+    best_length, allow = 0, True
+    for pattern, rule_allow, regex in rules:
+        matches = regex.match(path) if regex else path.startswith(pattern)
+        if matches and (len(pattern) > best_length or (len(pattern) == best_length and rule_allow)):
+            best_length, allow = len(pattern), rule_allow
+
+    return allow
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rules', type=int, default=500)
+    parser.add_argument('--paths', type=int, default=100000)
+    args = parser.parse_args()
+
+    robots = RobotsParser(synthetic_robots(args.rules))
+    paths = synthetic_paths(args.paths, args.rules)
+    rules = [(pattern, allow, _compile_pattern(pattern) if '*' in pattern or pattern.endswith('$') else None)
+             for pattern, allow in robots.rules['*']]
+
+    start = time.perf_counter()
+    compiled = [robots.can_access(path) for path in paths]
+    compiled_time = time.perf_counter() - start
+
+    scan_paths = paths[:max(args.paths // 100, 1)]
+    start = time.perf_counter()
+    scanned = [scan_rules(rules, path) for path in scan_paths]
+    scan_time = (time.perf_counter() - start) * len(paths) / len(scan_paths)
+
+    print(f'{args.rules} rules, {sum(compiled)} of {len(paths)} paths allowed')
+    print(f'compiled matcher: {len(paths) / compiled_time:12.0f} paths/sec')
+    print(f'scanning rules:   {len(paths) / scan_time:12.0f} paths/sec')
+    print(f'agree: {compiled[:len(scan_paths)] == scanned}')
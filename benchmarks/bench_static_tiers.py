@@ -0,0 +1,79 @@
+"""
+Counts the postings evaluated and measures the latency per query when combining cosine and static scores, by scoring
+static tiers until the remaining tiers cannot reach the top k compared to scoring all postings, and checks that the
+top k agree.
+Run from the repository root: python -m benchmarks.bench_static_tiers
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.bench_postings import build_dict_postings, synthetic_corpus
+from benchmarks.bench_wand import TermsQuery
+from indexing.indexer import Indexer
+from indexing.postings import CompressedPostings
+from ranking.content_ranker import ContentRanker
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--documents', type=int, default=20000)
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--terms', type=int, default=3)
+    parser.add_argument('--static-weight', type=float, default=0.5)
+    parser.add_argument('--tiers', type=int, default=8)
+    parser.add_argument('-k', type=int, default=10)
+    args = parser.parse_args()
+
+    indexer = Indexer()
+    for doc_id in range(args.documents):
+        indexer.url_vocabulary.add(doc_id)
+
+    term_postings = build_dict_postings(synthetic_corpus(args.documents, 300, 50000))
+    indexer.term_dict.set_term_postings(
+        {term: CompressedPostings.from_dict(postings) for term, postings in term_postings.items()})
+    indexer.term_dict.update_document_lengths()
+
+    # PageRank is heavy-tailed, with few documents scoring high
+    random = np.random.default_rng(1)
+    indexer.set_static_scores(dict(enumerate(random.pareto(1.5, args.documents))), num_tiers=args.tiers)
+
+    # Query terms are sampled by document frequency, such that queries mix frequent and rare terms
+    terms = sorted(term_postings)
+    frequencies = np.array([len(term_postings[term]) for term in terms], dtype=np.float64)
+    frequencies /= frequencies.sum()
+
+    queries = [TermsQuery(indexer, list(random.choice(terms, args.terms, p=frequencies))) for _ in range(args.queries)]
+
+    # Postings grouped by tier are computed once per term, and then kept for later queries
+    start = time.perf_counter()
+    for query in queries:
+        for term in query.get_search_terms():
+            indexer.term_dict.get_tiered_postings(term)
+    print(f'grouping postings of query terms by tier: {time.perf_counter() - start:.2f}s')
+
+    evaluated = {None: 0, ContentRanker.TierPruning: 0}
+    elapsed = {None: 0, ContentRanker.TierPruning: 0}
+    agreeing = 0
+    for query in queries:
+
+        tops = list()
+        for pruning in evaluated:
+            ranker = ContentRanker(query, pruning=pruning, content_weight=1 - args.static_weight,
+                                   static_weight=args.static_weight)
+            start = time.perf_counter()
+            tops.append(ranker.top(args.k))
+            elapsed[pruning] += time.perf_counter() - start
+            evaluated[pruning] += ranker.postings_evaluated
+
+        agreeing += tops[0] == tops[1]
+
+    for pruning, name in ((None, 'exhaustive'), (ContentRanker.TierPruning, 'static tiers')):
+        print(f'{name + ":":13} {evaluated[pruning] / args.queries:10.1f} postings evaluated/query, '
+              f'{elapsed[pruning] / args.queries * 1000:6.2f} ms/query')
+    print(f'{agreeing}/{args.queries} queries with identical top {args.k}')
+
+    # Skipping tiers saves evaluating postings, but scoring tier by tier takes more steps than a single vectorized pass
+    if elapsed[ContentRanker.TierPruning] > elapsed[None]:
+        print(f'static tiers are {elapsed[ContentRanker.TierPruning] / elapsed[None]:.1f}x slower than scoring all '
+              f'postings')
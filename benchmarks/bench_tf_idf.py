@@ -0,0 +1,34 @@
+"""
+Measures get_tf_idf calls per second over the postings of a synthetic corpus.
+Run from the repository root: python -m benchmarks.bench_tf_idf
+"""
+import argparse
+import time
+
+from benchmarks.bench_postings import build_dict_postings, synthetic_corpus
+from indexing.indexer import Indexer
+from indexing.postings import CompressedPostings
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--documents', type=int, default=2000)
+    parser.add_argument('--calls', type=int, default=200000)
+    args = parser.parse_args()
+
+    indexer = Indexer()
+    for doc_id in range(args.documents):
+        indexer.url_vocabulary.add(f'http://example.com/{doc_id}')
+
+    term_postings = build_dict_postings(synthetic_corpus(args.documents, 300, 50000))
+    indexer.term_dict.set_term_postings(
+        {term: CompressedPostings.from_dict(postings) for term, postings in term_postings.items()})
+
+    # Score postings in the order a term-at-a-time loop would, as when building champion lists
+    lookups = [(term, doc) for term, postings in term_postings.items() for doc in postings][:args.calls]
+
+    start = time.perf_counter()
+    for term, doc in lookups:
+        indexer.term_dict.get_tf_idf(term, doc)
+    elapsed = time.perf_counter() - start
+
+    print(f'{len(lookups) / elapsed:10.0f} get_tf_idf calls/sec')
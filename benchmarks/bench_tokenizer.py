@@ -0,0 +1,45 @@
+"""
+Measures tokenizer throughput in tokens per second, compared to the original implementation.
+Run from the repository root: python -m benchmarks.bench_tokenizer
+"""
+import argparse
+import time
+
+from nltk import PorterStemmer
+from nltk.tokenize import word_tokenize
+
+from benchmarks.bench_parallel_indexing import synthetic_documents
+from shared.tokenizer import doc_preprocess, get_disallowed_tokens, get_stem_cache_info, tokenize
+
+
+def original_tokenize(text):
+    """ The tokenizer before stemming was memoized, which creates a stemmer per call """
+    tokenized = [token for token in word_tokenize(doc_preprocess(text)) if token not in get_disallowed_tokens()]
+    stemmer = PorterStemmer()
+
+    return [stemmer.stem(token) for token in tokenized]
+
+
+def throughput(tokenizer, texts):
+    start = time.perf_counter()
+    num_tokens = sum(len(tokenizer(text)) for text in texts)
+
+    return num_tokens / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--documents', type=int, default=500)
+    parser.add_argument('--length', type=int, default=500)
+    args = parser.parse_args()
+
+    # Sentences with punctuation, such that Treebank tokenization has work to do
+    texts = [text.replace(' ', ', ', 3).replace(' ', '. ', 2) + '.'
+             for text in synthetic_documents(args.documents, args.length, 50000).values()]
+
+    print(f'original:                   {throughput(original_tokenize, texts):10.0f} tokens/sec')
+    print(f'memoized stemming:          {throughput(tokenize, texts):10.0f} tokens/sec')
+    print(f'fast split, memoized stems: {throughput(lambda text: tokenize(text, fast=True), texts):10.0f} tokens/sec')
+
+    hits, misses, hit_rate = get_stem_cache_info()
+    print(f'stem cache: {hits} hits, {misses} misses, {hit_rate:.1%} hit rate')
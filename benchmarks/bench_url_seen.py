@@ -0,0 +1,54 @@
+"""
+Measures memory per URL and adds and lookups per second of a set of URL strings, the fingerprint set and the Bloom
+filter, on synthetic URLs, and the false positive rate of the Bloom filter.
+Run from the repository root: python -m benchmarks.bench_url_seen
+"""
+import argparse
+import time
+import tracemalloc
+
+from webcrawling.url_seen import UrlBloomFilter, UrlSeenSet
+
+
+def synthetic_url(i, scheme='http'):
+    return f'{scheme}://www.host{i % 10000}.com/section/{i // 7}/article-{i}'
+
+
+def measure(name, make_set, num_urls):
+    # Memory is traced in a separate pass, as tracing slows down allocation
+    # The URLs are created while tracing, since a set of URLs keeps them alive whereas the others do not
+    tracemalloc.start()
+    seen = make_set()
+    for i in range(num_urls):
+        seen.add(synthetic_url(i))
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    urls = [synthetic_url(i) for i in range(num_urls)]
+    unseen_urls = [synthetic_url(i, scheme='https') for i in range(num_urls // 10)]
+
+    start = time.perf_counter()
+    seen = make_set()
+    for url in urls:
+        seen.add(url)
+    add_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    false_positives = sum(url in seen for url in unseen_urls)
+    lookup_time = time.perf_counter() - start
+
+    print(f'{name:22} {memory / num_urls:8.1f} bytes/URL {num_urls / add_time:12.0f} adds/sec '
+          f'{len(unseen_urls) / lookup_time:12.0f} lookups/sec '
+          f'{false_positives / len(unseen_urls):10.5f} false positives')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--urls', type=int, default=1000000)
+    parser.add_argument('--false-positive-rate', type=float, default=UrlBloomFilter.DefaultFalsePositiveRate)
+    args = parser.parse_args()
+
+    measure('set of URLs', set, args.urls)
+    measure('fingerprint set', UrlSeenSet, args.urls)
+    measure(f'Bloom filter ({args.false_positive_rate})',
+            lambda: UrlBloomFilter(args.urls, args.false_positive_rate), args.urls)
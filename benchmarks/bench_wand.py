@@ -0,0 +1,81 @@
+"""
+Counts the postings evaluated and measures the latency per query of block-max MaxScore (the WAND pruning mode) compared
+to scoring all postings, and checks that the top k agree.
+Run from the repository root: python -m benchmarks.bench_wand
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.bench_postings import build_dict_postings, synthetic_corpus
+from indexing.indexer import Indexer
+from indexing.postings import CompressedPostings
+from ranking.content_ranker import ContentRanker
+
+
+class TermsQuery:
+    """ Query of already tokenized terms """
+    def __init__(self, indexer, terms):
+        self._indexer = indexer
+        self._terms = terms
+
+    def get_indexer(self):
+        return self._indexer
+
+    def get_search_terms(self):
+        return self._terms
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--documents', type=int, default=5000)
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--terms', type=int, default=3)
+    parser.add_argument('-k', type=int, default=10)
+    args = parser.parse_args()
+
+    indexer = Indexer()
+    for doc_id in range(args.documents):
+        indexer.url_vocabulary.add(doc_id)
+
+    term_postings = build_dict_postings(synthetic_corpus(args.documents, 300, 50000))
+    indexer.term_dict.set_term_postings(
+        {term: CompressedPostings.from_dict(postings) for term, postings in term_postings.items()})
+    indexer.term_dict.update_document_lengths()
+
+    # Query terms are sampled by document frequency, such that queries mix frequent and rare terms
+    random = np.random.default_rng(1)
+    terms = sorted(term_postings)
+    frequencies = np.array([len(term_postings[term]) for term in terms], dtype=np.float64)
+    frequencies /= frequencies.sum()
+
+    exhaustive_evaluated, wand_evaluated, agreeing = 0, 0, 0
+    exhaustive_time, wand_time = 0, 0
+    for _ in range(args.queries):
+        query = TermsQuery(indexer, list(random.choice(terms, args.terms, p=frequencies)))
+
+        exhaustive = ContentRanker(query, pruning=None)
+        start = time.perf_counter()
+        exhaustive_top = exhaustive.top(args.k)
+        exhaustive_time += time.perf_counter() - start
+
+        wand = ContentRanker(query, pruning=ContentRanker.WandPruning)
+        start = time.perf_counter()
+        wand_top = wand.top(args.k)
+        wand_time += time.perf_counter() - start
+
+        agreeing += exhaustive_top == wand_top
+        exhaustive_evaluated += exhaustive.postings_evaluated
+        wand_evaluated += wand.postings_evaluated
+
+    print(f'exhaustive: {exhaustive_evaluated / args.queries:10.1f} postings evaluated/query, '
+          f'{exhaustive_time / args.queries * 1000:.2f} ms/query')
+    print(f'MaxScore:   {wand_evaluated / args.queries:10.1f} postings evaluated/query, '
+          f'{wand_time / args.queries * 1000:.2f} ms/query, '
+          f'{100 * (1 - wand_evaluated / max(exhaustive_evaluated, 1)):.1f}% of postings skipped')
+    print(f'{agreeing}/{args.queries} queries with identical top {args.k}')
+
+    # Evaluating fewer postings only pays off where reading postings costs more than scoring them
+    if wand_time > exhaustive_time:
+        print(f'MaxScore is {wand_time / exhaustive_time:.1f}x slower than scoring all postings, which is vectorized')
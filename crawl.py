@@ -1,29 +1,52 @@
 import time
 from _thread import interrupt_main
-from pickle import dump
 from threading import Thread
 
 from loguru import logger
 
 from webcrawling.crawler import Crawler
 
+checkpoint_path = 'checkpoint'
+
+# Seconds between rankings of hosts, as it ranks the whole link graph
+host_rank_interval = 300
+
 if __name__ == "__main__":
     crawler = Crawler()
-    crawler.queue_raw_url('https://twitter.com/search?q=%23dkpol')
+
+    # Resume from the last checkpoint if the crawler was restarted, otherwise start from the seed
+    if crawler.load_checkpoint(checkpoint_path):
+        logger.info(f'Resumed crawl from {checkpoint_path}')
+    else:
+        crawler.queue_raw_url('https://twitter.com/search?q=%23dkpol')
 
     def log():
+        last_ranked = time.monotonic()
         while True:
             logger.info(
-                f'{len(crawler.seen_urls)} seen URLs, {len(crawler.back_heap.get_hosts())} waiting hosts, {len(crawler.back_queues)} back queues')
+                f'{len(crawler.seen_urls)} seen URLs, {len(crawler.back_heap)} waiting hosts, {len(crawler.back_queues)} back queues')
             logger.info(f'Requests made: {crawler.num_requests}')
-            logger.info(f'Contents: {len(crawler.url_contents)}')
+            _, num_connections, reuse_ratio, median_latency, not_modified = crawler.http.get_stats()
+            logger.info(f'{num_connections} connections opened, {reuse_ratio:.1%} of requests reused a connection, '
+                        f'median latency {median_latency or 0:.3f}s, {not_modified} pages not modified')
+            fetch_rate, parse_rate, num_waiting, fetch_wait_time = crawler.get_stage_stats()
+            logger.info(f'{fetch_rate:.1f} pages fetched and {parse_rate:.1f} parsed per second, {num_waiting} waiting '
+                        f'to be parsed, fetching has waited {fetch_wait_time:.1f}s for parsing')
+            logger.info(f'Contents: {len(crawler.documents)}')
             time.sleep(5)
 
+            # Contents are written as pages are fetched, and are only flushed here
+            crawler.documents.flush()
+
+            # Rank hosts by the links found so far, which the priority of URLs found from now on depends on
+            if time.monotonic() - last_ranked >= host_rank_interval:
+                crawler.prioritizer.rank_hosts(crawler.link_graph)
+                last_ranked = time.monotonic()
+
             # If a certain content length has been reached, terminate
-            if len(crawler.url_contents) > 3000:
-                logger.info('Dumping contents and references...')
-                dump(crawler.url_contents, open('contents.pkl', 'wb'))
-                dump(crawler.url_references, open('references.pkl', 'wb'))
+            if len(crawler.documents) > 3000:
+                logger.info('Dumping references...')
+                crawler.link_graph.save('links')
                 logger.info('Dump complete')
 
                 interrupt_main()
@@ -31,5 +54,6 @@ if __name__ == "__main__":
     thread = Thread(target=log)
     thread.start()
 
-    # Start crawler threads
+    # Start crawler threads, and checkpoint the crawl periodically
     crawler.start_crawlers()
+    crawler.start_checkpoints(checkpoint_path)
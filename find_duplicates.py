@@ -1,7 +1,9 @@
+import os
 import pickle
 
 from duplicates.minhash import generate_hash_functions, get_min_hashes, jaccard_similarity
 from duplicates.shingles import get_shingles, get_supershingles
+from shared.document_store import DocumentStore
 
 min_overlap = 2  # Minimum supershingle overlap
 min_similarity = 0.5  # Minimum fractional sketch overlap
@@ -29,11 +31,14 @@ if __name__ == "__main__":
     # Generate hash functions to use
     hash_functions = generate_hash_functions(84)
 
-    # Load corpus from file
-    url_contents_dict = pickle.load(open('contents.pkl', 'rb'))
+    # Stream the corpus from the document store, or load the pickled contents of crawls dumped before it existed
+    if os.path.isdir('documents'):
+        documents = DocumentStore('documents').items()
+    else:
+        documents = pickle.load(open('contents.pkl', 'rb')).items()
 
     # For each URL, compute its supershingles
-    for url, contents in url_contents_dict.items():
+    for url, contents in documents:
         # Skip URLs lacking enough tokens to create shingles
         split_contents = contents.split()
         if len(split_contents) < 4:
@@ -1,71 +1,369 @@
 import math
-
+import os
+import pickle
+from collections import ChainMap, Counter, deque
+from collections.abc import MutableMapping
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import partial
+from itertools import islice
+from tempfile import TemporaryDirectory
+
+import numpy as np
+
+from indexing.postings import BlockSize, CompressedPostings
+from indexing.segment import write_segment, read_segment, write_static_scores
+from indexing.spimi import SpimiBlock, merge_blocks
 from shared.tokenizer import tokenize
 
 
+def _index_shard(shard, fast_tokenizer=False):
+    """ Tokenizes a shard of (docId, content) pairs and returns its postings as (term, doc_ids, tfs) in term order """
+    block = SpimiBlock()
+
+    for doc_id, contents in shard:
+        # At this point, markup has been removed, but we still need to tokenize
+        # Postings are added per distinct term, along with its frequency in the document
+        for term, tf in Counter(tokenize(contents, fast=fast_tokenizer)).items():
+            block.add(term, doc_id, tf)
+
+    return list(block.sorted_postings())
+
+
+def _map_ordered(executor, function, iterable, max_pending):
+    """ Like executor.map, but only submits max_pending items ahead such that the input can be streamed """
+    pending = deque()
+
+    for item in iterable:
+        pending.append(executor.submit(function, item))
+
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+
+    while pending:
+        yield pending.popleft().result()
+
+
 class UrlVocabulary:
     """
     UrlVocabulary assigns a document ID to URLs and points to the URL
+    IDs are assigned densely from 0, so URLs are kept in a list indexed by ID and a dictionary maps URLs back to IDs
     """
     def __init__(self):
-        self._document_counter = -1
-        self._internal_dict = dict()
+        self._urls = list()
+        self._url_ids = dict()
+
+        # Cached set of document IDs, cleared whenever a URL is added
+        self._document_ids = None
+
+    def __len__(self):
+        return len(self._urls)
 
     def get_document_ids(self):
-        return set(self._internal_dict.keys())
+        if self._document_ids is None:
+            self._document_ids = frozenset(self.get_id_range())
 
-    def add(self, url):
-        # Check if URL is already in dictionary (may not be necessary, NOT efficient)
-        for key, value in self._internal_dict.items():
-            if value == url:
-                return key
+        return self._document_ids
 
-        # Add URL and its content to dictionary
-        self._document_counter += 1
-        self._internal_dict[self._document_counter] = url
+    def get_id_range(self):
+        return range(len(self._urls))
 
-        return self._document_counter
+    def add(self, url):
+        # Check if URL is already in vocabulary
+        document_id = self._url_ids.get(url)
+        if document_id is not None:
+            return document_id
+
+        # Add URL as the next document ID
+        document_id = len(self._urls)
+        self._urls.append(url)
+        self._url_ids[url] = document_id
+        self._document_ids = None
+
+        return document_id
+
+    def register(self, document_id, url=None):
+        """
+        Registers a document ID assigned by the caller, e.g. when indexing a single document, along with its URL.
+        A URL replaces the one registered for the document ID before, but a URL of another document ID is rejected.
+        """
+        if url is not None and self._url_ids.get(url, document_id) != document_id:
+            raise ValueError(f'{url} is already registered as document {self._url_ids[url]}')
+
+        if document_id >= len(self._urls):
+            self._urls.extend([None] * (document_id + 1 - len(self._urls)))
+            self._document_ids = None
+
+        if url is not None:
+            # The replaced URL no longer maps to the document ID
+            replaced = self._urls[document_id]
+            if replaced is not None and self._url_ids.get(replaced) == document_id:
+                del self._url_ids[replaced]
+
+            self._urls[document_id] = url
+            self._url_ids[url] = document_id
+
+    def get_urls(self):
+        """ Get a list of all URLs, indexed by their document ID """
+        return list(self._urls)
+
+    def set_urls(self, urls):
+        """ Replace the vocabulary with a list of URLs, indexed by their document ID """
+        self._urls = list(urls)
+        self._url_ids = dict()
+        self._document_ids = None
+
+        for document_id, url in enumerate(self._urls):
+            if url is not None:
+                self._url_ids.setdefault(url, document_id)
+
+    def save(self, path):
+        with open(path, 'wb') as file:
+            pickle.dump(self._urls, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def load(self, path):
+        """ Replace the vocabulary with one previously saved to path """
+        with open(path, 'rb') as file:
+            self.set_urls(pickle.load(file))
 
     def get(self, id):
-        return self._internal_dict[id] if id in self._internal_dict else None
+        return self._urls[id] if 0 <= id < len(self._urls) else None
+
+    def get_id(self, url):
+        return self._url_ids.get(url)
 
 
 class TermDictionary:
     """ Provide an abstraction over term-postings dictionary """
+    # Default number of tiers that documents are split into by static score
+    DefaultStaticTiers = 8
+
     def __init__(self, url_vocabulary):
         self._term_postings = dict()
         self._url_vocabulary = url_vocabulary
-        self._url_length_dict = dict()
+        self._url_length_dict = np.zeros(0)
         self.champion_list = dict()
 
+        # Number of documents in the computed champion lists, and the number of them that are used
+        self._champion_list_size = 0
+        self._champion_r = 0
+
+        # Document frequency and idf of terms, computed once and invalidated when postings or the corpus size change
+        self._df = dict()
+        self._idf = dict()
+        self._idf_num_documents = 0
+
+        # Upper bounds of the length-normalized weight of each term per block of postings
+        # They depend on both idf and document lengths
+        self._block_max_scores = dict()
+
+        # Query-independent score of each document (e.g. PageRank), indexed by docId
+        # Documents are split into tiers of equal size by decreasing static score, each with the highest score in it
+        self._static_scores = None
+        self._static_tiers = None
+        self._static_tier_max_scores = None
+        self._num_static_tiers = 0
+
+        # Postings of terms grouped by static tier, computed when first used
+        self._tiered_postings = dict()
+
     # The only contender pruning approach I have implemented
     def update_champions(self, r=20):
-        self.champion_list = {term: dict() for term in self._term_postings.keys()}
+        """ Computes the champion list of each term, i.e. the r documents with the highest weight in weight order """
+        # Champion lists are ordered, so shorter ones are prefixes of those already computed
+        if self.champion_list and r <= self._champion_list_size:
+            self._champion_r = r
+
+            return
 
-        for term in self.champion_list:
+        self.champion_list = dict()
+        for term, postings in self._term_postings.items():
             # Get the docs which this term appears in
-            documents = self._term_postings[term].keys()
+            doc_ids, tfs = postings.doc_ids(), postings.tfs().astype(np.int64)
+
+            # Within a postings list idf is constant, so the highest weights are those of the highest frequencies
+            # Find the r-th highest frequency with partial selection instead of sorting the postings
+            if len(tfs) > r:
+                threshold = np.partition(tfs, len(tfs) - r)[len(tfs) - r]
+                above = np.flatnonzero(tfs > threshold)
+
+                # Ties are broken by docId, as a stable sort of postings would
+                selected = np.concatenate((above, np.flatnonzero(tfs == threshold)[:r - len(above)]))
+                doc_ids, tfs = doc_ids[selected], tfs[selected]
+
+            # Sort the top R by weight and use this as the champion list for the current term
+            self.champion_list[term] = doc_ids[np.lexsort((doc_ids, -tfs))].tolist()
 
-            # Compute the weights for these docs
-            weights = {doc: self.get_tf_idf(term, doc) for doc in documents}
+        self._champion_list_size = self._champion_r = r
 
-            # Tak the top R of these weights and use this as the champion list for the current term
-            self.champion_list[term] = sorted(weights, key=weights.get, reverse=True)[:r]
+    def set_champions(self, champion_list, r):
+        self.champion_list = champion_list
+        self._champion_list_size = self._champion_r = r
+
+    def get_champion_r(self):
+        return self._champion_r
+
+    """ Get the champion list of a term, or None if champion lists have not been computed. """
+    def get_champions(self, term):
+        if not self.champion_list:
+            return None
+
+        champions = self.champion_list.get(term, [])
+
+        return champions[:self._champion_r] if len(champions) > self._champion_r else champions
 
     def set_term_postings(self, term_postings):
         self._term_postings = term_postings
+        self._tiered_postings = dict()
+        self._invalidate_idf()
+
+    def add_document(self, document, term_frequencies):
+        """
+        Adds the term frequencies of a new document to the postings, e.g. when a document is indexed incrementally.
+        Only the length of this document is computed, update_document_lengths recomputes those of other documents.
+        The document must be in the URL vocabulary, which the number of documents (and so idf) is taken from.
+        """
+        # An opened segment is read-only, so postings and bounds changed since are kept in dictionaries on top of it
+        if not isinstance(self._term_postings, MutableMapping):
+            self._term_postings = ChainMap(dict(), self._term_postings)
+        if not isinstance(self._block_max_scores, MutableMapping):
+            self._block_max_scores = ChainMap(dict(), self._block_max_scores)
+
+        for term, tf in term_frequencies.items():
+            postings = self._term_postings.get(term)
+            postings = dict(zip(postings.doc_ids().tolist(), postings.tfs().tolist())) if postings else dict()
+            postings[document] = postings.get(document, 0) + tf
+            self._term_postings[term] = CompressedPostings.from_dict(postings)
+
+            # Only the document frequency of this term changed, unless the number of documents did as well
+            # Bounds are cleared rather than removed, as removing them would expose those of an opened segment
+            self._df.pop(term, None)
+            self._idf.pop(term, None)
+            self._block_max_scores[term] = None
+            self._tiered_postings.pop(term, None)
+
+        # A new document has no static score, and is placed in the lowest tier
+        if self._static_scores is not None and document >= len(self._static_scores):
+            missing = document + 1 - len(self._static_scores)
+            self._static_scores = np.concatenate((self._static_scores, np.zeros(missing)))
+            self._static_tiers = np.concatenate((self._static_tiers,
+                                                 np.full(missing, len(self._static_tier_max_scores) - 1)))
+
+        # Compute the length of the document, growing the array of lengths if it is a new document
+        squared_sum = sum(tf * pow(self.get_tf_idf(term, document), 2) for term, tf in term_frequencies.items())
+        lengths = np.zeros(max(len(self._url_length_dict), document + 1))
+        lengths[:len(self._url_length_dict)] = self._url_length_dict
+        lengths[document] = math.sqrt(squared_sum)
+        self._url_length_dict = lengths
+
+    def update_idf(self):
+        """ Precomputes the document frequency and idf of every term """
+        self._invalidate_idf()
+
+        for term, postings in self._term_postings.items():
+            df = len(postings)
+            self._df[term] = df
+            self._idf[term] = math.log10(self._idf_num_documents / df)
+
+    def _invalidate_idf(self):
+        self._df = dict()
+        self._idf = dict()
+        self._idf_num_documents = len(self._url_vocabulary)
+        self._block_max_scores = dict()
+
+    def update_max_scores(self):
+        """ Precomputes the upper bounds of the normalized weight of every term """
+        self._block_max_scores = dict()
+
+        for term in self._term_postings:
+            self.get_block_max_scores(term)
+
+    def set_block_max_scores(self, block_max_scores):
+        self._block_max_scores = block_max_scores
+
+    def update_document_lengths(self):
+        """ Computes the vector length of every document """
+        # I pre-compute these vector lengths because it's quite expensive to compute do with the inverse index
+        # Every occurrence of a term adds its squared tf-idf weight, so this is accumulated one postings list at a time
+        squared_sums = np.zeros(len(self._url_vocabulary))
+        for term, postings in self._term_postings.items():
+            tfs = postings.tfs()
+            squared_sums[postings.doc_ids()] += tfs * (tfs + self.get_idf(term)) ** 2
+
+        self._url_length_dict = np.sqrt(squared_sums)
+        self._block_max_scores = dict()
 
     def __contains__(self, term):
         return term in self._term_postings
 
+    def get_num_documents(self):
+        """ Returns the number of docIds, including those of documents added here that have no URL """
+        return max(len(self._url_vocabulary), len(self._url_length_dict))
+
+    def set_static_scores(self, static_scores, num_tiers=DefaultStaticTiers):
+        """ Sets the static score of every document, indexed by docId, and splits documents into tiers by it """
+        static_scores = np.asarray(static_scores, dtype=np.float64)
+
+        # Tiers are formed by position in static score order, so ties are split by docId
+        order = np.argsort(-static_scores, kind='stable')
+        tier_size = max(1, math.ceil(len(order) / num_tiers))
+        tiers = np.empty(len(order), dtype=np.int32)
+        tiers[order] = np.arange(len(order)) // tier_size
+
+        self._static_scores = static_scores
+        self._static_tiers = tiers
+        self._static_tier_max_scores = static_scores[order[::tier_size]]
+        self._num_static_tiers = num_tiers
+        self._tiered_postings = dict()
+
+    def has_static_scores(self):
+        return self._static_scores is not None
+
+    def get_num_static_tiers(self):
+        return self._num_static_tiers
+
+    """ Get the static scores of an array of documents, which are 0 if none have been set. """
+    def get_static_scores(self, documents):
+        if self._static_scores is None:
+            return np.zeros(len(documents))
+
+        return self._static_scores[documents]
+
+    """ Get the highest static score in each tier, in tier order, i.e. decreasing. """
+    def get_static_tier_max_scores(self):
+        return self._static_tier_max_scores
+
+    """ Get the postings of a term grouped by the static tier of documents, as document IDs, term frequencies and the
+        (tiers + 1) offsets of each tier. Within a tier, postings stay in docId order.
+    """
+    def get_tiered_postings(self, term):
+        tiered_postings = self._tiered_postings.get(term)
+        if tiered_postings is None:
+            postings = self._term_postings.get(term)
+            if not postings:
+                return None
+
+            doc_ids = postings.doc_ids()
+            tiers = self._static_tiers[doc_ids]
+            order = np.argsort(tiers, kind='stable')
+            offsets = np.searchsorted(tiers[order], np.arange(len(self._static_tier_max_scores) + 1))
+            tiered_postings = self._tiered_postings[term] = (doc_ids[order], postings.tfs()[order], offsets)
+
+        return tiered_postings
+
     def set_document_lengths(self, document_length_docs):
         self._url_length_dict = document_length_docs
+        self._block_max_scores = dict()
 
     """ Compute the length of a document. """
     def get_document_length(self, document):
         # I originally iterated over the term postings dict and summed
         # That approach was simply too slow
-        return self._url_length_dict[document]
+        return float(self._url_length_dict[document])
+
+    """ Get the vector lengths of an array of documents. """
+    def get_document_lengths(self, documents):
+        return self._url_length_dict[documents]
 
     """ Compute term frequency–inverse document frequency.
         Product of its tf weight and its idf weight.
@@ -82,11 +380,47 @@ class TermDictionary:
         Intuitively, rare words will have a higher idf.
     """
     def get_idf(self, term):
-        return math.log10(len(self._url_vocabulary.get_document_ids()) / self.get_df(term))
+        # All idfs depend on the number of documents, so they are invalidated if it has changed
+        if self._idf_num_documents != len(self._url_vocabulary):
+            self._invalidate_idf()
+
+        idf = self._idf.get(term)
+        if idf is None:
+            idf = self._idf[term] = math.log10(self._idf_num_documents / self.get_df(term))
+
+        return idf
 
     """ Get the number of documents that the word appears in. """
     def get_df(self, term):
-        return len(self.get_documents_with_term(term))
+        df = self._df.get(term)
+        if df is None:
+            df = self._df[term] = len(self._term_postings[term]) if term in self._term_postings else 0
+
+        return df
+
+    """ Get the highest tf-idf weight of a term in each block of its postings, normalized by document length.
+        This is an upper bound of the contribution of the term to the cosine score of documents in the block,
+        which allows dynamic pruning.
+    """
+    def get_block_max_scores(self, term):
+        # Depends on idf, so validate that idfs are up to date first
+        idf = self.get_idf(term) if term in self else 0
+
+        block_max_scores = self._block_max_scores.get(term)
+        if block_max_scores is None:
+            postings = self._term_postings.get(term)
+            if not postings:
+                return np.zeros(0)
+
+            weights = (postings.tfs() + idf) / self.get_document_lengths(postings.doc_ids())
+            block_max_scores = np.maximum.reduceat(weights, np.arange(0, len(weights), BlockSize))
+            self._block_max_scores[term] = block_max_scores
+
+        return block_max_scores
+
+    """ Get the highest tf-idf weight of a term in any document, normalized by the length of that document. """
+    def get_max_score(self, term):
+        return float(np.max(self.get_block_max_scores(term), initial=0))
 
     """ Compute log frequency weighting.
         Importance does not increase proportionally with frequency, so we use logging to damper the effect.
@@ -101,65 +435,134 @@ class TermDictionary:
         if term not in self:
             return 0
 
-        if document not in self._term_postings[term]:
-            return 0
+        return self._term_postings[term].get(document, 0)
 
-        return self._term_postings[term][document]
+    """ Get the postings list of a term, which exposes its sorted document IDs and term frequencies as arrays. """
+    def get_postings(self, term):
+        return self._term_postings.get(term)
 
     """ For some word, it will return a set of document IDs that contain the specified word. """
     def get_documents_with_term(self, term):
         if term not in self._term_postings:
             return set()
 
-        return set(self._term_postings[term].keys())
+        return set(self._term_postings[term].doc_ids().tolist())
 
 
 class Indexer:
-    def __init__(self):
-        self.url_vocabulary = UrlVocabulary()
-        self.term_dict = TermDictionary(self.url_vocabulary)
-
-    def index_corpus(self, url_content_dict):
-        """ Performs indexing over an entire corpus, e.g. a dictionary from URls to content """
-        # At this point, markup has been removed, but we still need to tokenize
-        url_token_dict = {url: tokenize(contents) for url, contents in url_content_dict.items()}
+    # Default number of bytes of postings kept in memory before flushing a block to disk
+    DefaultMemoryBudget = 256 * 1024 * 1024
 
-        # Add URLs to url vocabulary to get an index representation
-        url_index_dict = {url: self.url_vocabulary.add(url) for url in url_token_dict}
+    # Default number of documents tokenized together, e.g. by a single worker process
+    DefaultShardSize = 256
 
-        # Construct (term, docId) pairs
-        pairs = list()
-        for url, tokens in url_token_dict.items():
-            for token in tokens:
-                pairs.append((token, url_index_dict[url]))
-
-        # Sort pairs by term, then docId
-        # Python automatically does this for lists of pairs
-        pairs = sorted(pairs)
-
-        # Construct the dictionary of terms and their postings
-        term_postings = dict()
-
-        # Iterate over pairs in order
-        current_term = None
-        for term, doc_id in pairs:
-            # When a new term is found, change current term to it and initialize dictionary
-            if term != current_term:
-                current_term = term
-                term_postings[current_term] = dict()
+    def __init__(self, fast_tokenizer=False):
+        # Documents and queries must be tokenized the same way, so the choice of tokenizer is kept with the index
+        self.fast_tokenizer = fast_tokenizer
+        self.url_vocabulary = UrlVocabulary()
+        self.term_dict = TermDictionary(self.url_vocabulary)
 
-            # The postings are dictionaries mapping document to frequency
-            # We either increment the value part of the posting or set it to 1
-            term_postings[term][doc_id] = term_postings[term].get(doc_id, 0) + 1
+    def set_static_scores(self, url_scores, num_tiers=TermDictionary.DefaultStaticTiers):
+        """
+        Sets the static score of documents from a dictionary from URL to score, e.g. their PageRank.
+        Scores are scaled such that the highest is 1, and documents without a score have a score of 0.
+        """
+        static_scores = np.zeros(len(self.url_vocabulary))
+        for url, score in url_scores.items():
+            document = self.url_vocabulary.get_id(url)
+            if document is not None:
+                static_scores[document] = score
+
+        highest = np.max(static_scores, initial=0)
+        self.term_dict.set_static_scores(static_scores / highest if highest > 0 else static_scores, num_tiers)
+
+    def save(self, path):
+        """ Saves the built index, including champion lists and static scores, to a segment directory """
+        write_segment(self, path)
+
+    def save_static_scores(self, path):
+        """ Saves only the static scores to the segment the index was opened from or written to """
+        write_static_scores(self, path)
+
+    @classmethod
+    def load(cls, path):
+        """ Opens a previously saved segment without re-indexing the corpus """
+        return read_segment(cls(), path)
+
+    def _shards(self, documents, shard_size):
+        """ Assigns docIds to documents in order and groups them into shards of (docId, content) pairs """
+        documents = iter(documents)
+
+        while True:
+            shard = [(self.url_vocabulary.add(url), contents) for url, contents in islice(documents, shard_size)]
+            if not shard:
+                return
+
+            yield shard
+
+    def index_corpus(self, documents, memory_budget=DefaultMemoryBudget, workers=1, shard_size=DefaultShardSize,
+                     path=None):
+        """
+        Performs indexing over an entire corpus, e.g. a dictionary from URLs to content or an iterator of (URL, content)
+        pairs. Documents are indexed in a single pass into blocks of at most memory_budget bytes, and blocks exceeding
+        the budget are flushed to disk and merged afterwards, such that the corpus does not need to fit in memory.
+        With more than one worker, shards of documents are tokenized and indexed by a process pool. Shards are merged
+        in docId order, so the result is identical to indexing with a single worker.
+        Given a path, the merged postings are written to a segment there one term at a time, which is then opened, such
+        that neither the corpus nor its index needs to fit in memory.
+        """
+        if isinstance(documents, dict):
+            documents = documents.items()
+
+        executor = ProcessPoolExecutor(workers) if workers > 1 else None
+
+        with TemporaryDirectory() as block_directory, executor or nullcontext():
+            shards = self._shards(documents, shard_size)
+            index_shard = partial(_index_shard, fast_tokenizer=self.fast_tokenizer)
+            if executor:
+                # Shards are submitted a few at a time, keeping every worker busy without reading the whole corpus
+                shard_postings = _map_ordered(executor, index_shard, shards, max_pending=workers * 2)
+            else:
+                shard_postings = map(index_shard, shards)
+
+            blocks = list()
+            block = SpimiBlock()
+
+            for postings in shard_postings:
+                block.extend(postings)
+
+                if block.size > memory_budget:
+                    blocks.append(block.write(os.path.join(block_directory, f'block{len(blocks)}')))
+                    block = SpimiBlock()
+
+            # The last block is merged directly from memory
+            blocks.append(block.sorted_postings())
+
+            if path is not None:
+                # Every document has a docId by now, so lengths and bounds can be computed while writing the postings
+                write_segment(self, path, merge_blocks(blocks))
+            else:
+                # Construct the dictionary of terms and their postings by merging the blocks in term order
+                term_postings = {term: CompressedPostings(doc_ids, tfs) for term, doc_ids, tfs in merge_blocks(blocks)}
+
+        if path is not None:
+            read_segment(self, path)
+            return
 
         self.term_dict.set_term_postings(term_postings)
-
-        # Make a dictionary of the vector length of documents
-        # I pre-compute these vector lengths because it's quite expensive to compute do with the inverse index
-        document_length_dict = dict()
-        for url, tokens in url_token_dict.items():
-            document_id = url_index_dict[url]
-            squared_sum = sum([pow(self.term_dict.get_tf_idf(token, document_id), 2) for token in tokens])
-            document_length_dict[document_id] = math.sqrt(squared_sum)
-
-        self.term_dict.set_document_lengths(document_length_dict)
+        self.term_dict.update_idf()
+
+        # Make an array of the vector length of documents, indexed by docId
+        self.term_dict.update_document_lengths()
+
+        # Compute upper bounds of term weights, used for dynamic pruning
+        self.term_dict.update_max_scores()
+
+    def index_text(self, text, document, url=None):
+        """
+        Incrementally indexes the text of a single document by docId, e.g. one that has been crawled after indexing.
+        The docId is registered in the URL vocabulary, along with its URL if given, such that it counts towards idf.
+        Works on an opened segment as well, keeping the changed postings in memory until the index is saved again.
+        """
+        self.url_vocabulary.register(document, url)
+        self.term_dict.add_document(document, Counter(tokenize(text, fast=self.fast_tokenizer)))
@@ -0,0 +1,279 @@
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+
+import numpy as np
+
+# Number of postings per independently decodable block of a compressed postings list
+BlockSize = 128
+
+
+def vbyte_encode(values):
+    """
+    Variable-byte encodes non-negative integers, 7 bits per byte with the least significant group first.
+    The high bit is set on the last byte of each value.
+    """
+    if len(values) < 32:
+        # Per-call overhead of numpy dominates for short inputs, such as most postings lists
+        return _vbyte_encode_short(values)
+
+    values = np.asarray(values, dtype=np.uint64)
+
+    # Number of bytes needed for each value
+    num_bytes = np.ones(len(values), dtype=np.int64)
+    for shift in range(7, 64, 7):
+        num_bytes += values >= (1 << shift)
+
+    # Position of the first byte of each value
+    starts = np.cumsum(num_bytes) - num_bytes
+    encoded = np.zeros(int(num_bytes.sum()), dtype=np.uint8)
+
+    for group in range(int(num_bytes.max(initial=0))):
+        mask = num_bytes > group
+        encoded[starts[mask] + group] = (values[mask] >> np.uint64(7 * group)) & np.uint64(0x7f)
+
+    # Mark the last byte of every value
+    encoded[starts + num_bytes - 1] |= 0x80
+
+    return encoded.tobytes()
+
+
+def _vbyte_encode_short(values):
+    encoded = bytearray()
+
+    for value in values:
+        value = int(value)
+        while value >= 0x80:
+            encoded.append(value & 0x7f)
+            value >>= 7
+        encoded.append(value | 0x80)
+
+    return bytes(encoded)
+
+
+def _vbyte_decode_short(buffer):
+    values = list()
+    value, shift = 0, 0
+
+    for byte in buffer:
+        value |= (byte & 0x7f) << shift
+        if byte & 0x80:
+            values.append(value)
+            value, shift = 0, 0
+        else:
+            shift += 7
+
+    return values
+
+
+def vbyte_decode(buffer):
+    """ Decodes a buffer of variable-byte encoded integers, see vbyte_encode """
+    if len(buffer) < 32:
+        return np.array(_vbyte_decode_short(buffer), dtype=np.int64)
+
+    encoded = np.frombuffer(buffer, dtype=np.uint8)
+
+    # Find out which value each byte belongs to and its position within that value
+    ends = np.flatnonzero(encoded & 0x80)
+    value_index = np.zeros(len(encoded), dtype=np.int64)
+    value_index[ends[:-1] + 1] = 1
+    value_index = np.cumsum(value_index)
+    value_starts = np.concatenate(([0], ends[:-1] + 1))
+    group = np.arange(len(encoded)) - value_starts[value_index]
+
+    # Sum the 7-bit groups of each value, shifted into place
+    groups = (encoded & 0x7f).astype(np.float64) * np.power(2.0, 7 * group)
+
+    return np.bincount(value_index, weights=groups, minlength=len(ends)).astype(np.int64)
+
+
+def _scan_block(buffer, base, document):
+    """
+    Returns the position of a document in a block of variable-byte encoded gaps following base, or None.
+    Blocks are short, so decoding in Python with an early exit beats the per-call overhead of vectorized decoding.
+    """
+    current, value, shift, idx = base, 0, 0, 0
+
+    for byte in buffer:
+        value |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            shift += 7
+
+            continue
+
+        current += value
+        if current >= document:
+            return idx if current == document else None
+
+        idx, value, shift = idx + 1, 0, 0
+
+    return None
+
+
+def _smallest_array(values):
+    """ Stores values in the array type with the smallest item size that can hold them """
+    largest = max(values, default=0)
+    typecode = 'B' if largest < 1 << 8 else 'H' if largest < 1 << 16 else 'I'
+
+    return array(typecode, values)
+
+
+class CompressedPostings(Mapping):
+    """
+    Postings list mapping document IDs to term frequencies.
+    Document IDs are sorted and stored as variable-byte encoded gaps, term frequencies in a parallel array.
+    Long lists are split into blocks with skip entries, such that a lookup only decodes a single block.
+    """
+    __slots__ = ('_doc_bytes', '_tfs', '_block_last', '_block_offsets', '_length')
+
+    def __init__(self, doc_ids, tfs):
+        self._length = len(doc_ids)
+        self._tfs = _smallest_array([int(tf) for tf in tfs])
+
+        if self._length <= BlockSize:
+            # Short lists (the vast majority of terms) are a single block without skip entries
+            doc_ids = [int(doc) for doc in doc_ids]
+            self._doc_bytes = vbyte_encode([current - previous for previous, current in zip([0] + doc_ids, doc_ids)])
+            self._block_last = None
+            self._block_offsets = None
+        else:
+            doc_ids = np.asarray(doc_ids, dtype=np.int64)
+            gaps = np.diff(doc_ids, prepend=0)
+            starts = range(0, self._length, BlockSize)
+            blocks = [vbyte_encode(gaps[start:start + BlockSize]) for start in starts]
+            self._doc_bytes = b''.join(blocks)
+            self._block_last = array('i', [int(doc_ids[min(start + BlockSize, self._length) - 1]) for start in starts])
+            self._block_offsets = array('I', np.cumsum([0] + [len(block) for block in blocks]).tolist())
+
+    @classmethod
+    def from_dict(cls, postings):
+        """ Constructs compressed postings from a dictionary of document IDs to term frequencies """
+        doc_ids = sorted(postings)
+
+        return cls(doc_ids, [postings[doc] for doc in doc_ids])
+
+    def _find(self, document):
+        """ Returns the position of a document in the postings list, or None if it is not present """
+        if self._block_last is None:
+            return _scan_block(self._doc_bytes, 0, document)
+
+        # Skip directly to the only block that may contain the document
+        block = bisect_left(self._block_last, document)
+        if block == len(self._block_last):
+            return None
+
+        base = self._block_last[block - 1] if block else 0
+        idx = _scan_block(self._doc_bytes[self._block_offsets[block]:self._block_offsets[block + 1]], base, document)
+
+        return None if idx is None else block * BlockSize + idx
+
+    def __getitem__(self, document):
+        idx = self._find(document)
+        if idx is None:
+            raise KeyError(document)
+
+        return self._tfs[idx]
+
+    def __contains__(self, document):
+        return self._find(document) is not None
+
+    def __iter__(self):
+        return iter(self.doc_ids().tolist())
+
+    def __len__(self):
+        return self._length
+
+    def doc_ids(self):
+        # Gaps are relative to the previous document across block boundaries, so one cumulative sum decodes all
+        return np.cumsum(vbyte_decode(self._doc_bytes))
+
+    def tfs(self):
+        return np.frombuffer(self._tfs, dtype=self._tfs.typecode)
+
+    def block_last(self):
+        """ Returns the last document ID of each block of BlockSize postings """
+        if self._block_last is None:
+            return self.doc_ids()[-1:]
+
+        return np.frombuffer(self._block_last, dtype=np.int32)
+
+    def get_blocks(self, blocks):
+        """ Returns the document IDs and term frequencies in the given sorted blocks, decoding only those blocks """
+        blocks = np.asarray(blocks, dtype=np.int64)
+        if self._block_last is None or len(blocks) == len(self._block_last):
+            return (self.doc_ids(), self.tfs()) if len(blocks) else (np.zeros(0, dtype=np.int64), self.tfs()[:0])
+
+        # The selected blocks are decoded at once, after which gaps are made relative to the block before each
+        offsets = self._block_offsets
+        doc_ids = np.cumsum(vbyte_decode(b''.join(self._doc_bytes[offsets[block]:offsets[block + 1]]
+                                                  for block in blocks.tolist())))
+        lengths = np.minimum(BlockSize, self._length - blocks * BlockSize)
+        starts = np.cumsum(lengths) - lengths
+        bases = np.where(blocks > 0, self.block_last()[blocks - 1], 0)
+        doc_ids += np.repeat(bases - np.where(starts > 0, doc_ids[starts - 1], 0), lengths)
+
+        positions = np.repeat(blocks * BlockSize - starts, lengths) + np.arange(len(doc_ids))
+
+        return doc_ids, self.tfs()[positions]
+
+    def nbytes(self):
+        """ Number of bytes used by the buffers of the postings list """
+        skip_bytes = 0
+        if self._block_last is not None:
+            skip_bytes = len(self._block_last) * self._block_last.itemsize + \
+                         len(self._block_offsets) * self._block_offsets.itemsize
+
+        return len(self._doc_bytes) + len(self._tfs) * self._tfs.itemsize + skip_bytes
+
+
+class ArrayPostings(Mapping):
+    """
+    Read-only postings list backed by two parallel arrays: sorted document IDs and their term frequencies.
+    The arrays may be slices of a memory-mapped segment, in which case nothing is read until it is accessed.
+    """
+    __slots__ = ('_doc_ids', '_tfs')
+
+    def __init__(self, doc_ids, tfs):
+        self._doc_ids = doc_ids
+        self._tfs = tfs
+
+    def _find(self, document):
+        # Binary search over the sorted document IDs
+        idx = int(np.searchsorted(self._doc_ids, document))
+
+        return idx if idx < len(self._doc_ids) and self._doc_ids[idx] == document else None
+
+    def __getitem__(self, document):
+        idx = self._find(document)
+        if idx is None:
+            raise KeyError(document)
+
+        return int(self._tfs[idx])
+
+    def __contains__(self, document):
+        return self._find(document) is not None
+
+    def __iter__(self):
+        # Yield plain ints such that IDs can be mixed with those of the URL vocabulary
+        return iter(self._doc_ids.tolist())
+
+    def __len__(self):
+        return len(self._doc_ids)
+
+    def doc_ids(self):
+        return self._doc_ids
+
+    def tfs(self):
+        return self._tfs
+
+    def block_last(self):
+        """ Returns the last document ID of each block of BlockSize postings """
+        return self._doc_ids[np.minimum(np.arange(BlockSize, len(self._doc_ids) + BlockSize, BlockSize),
+                                        len(self._doc_ids)) - 1]
+
+    def get_blocks(self, blocks):
+        """ Returns the document IDs and term frequencies in the given sorted blocks """
+        positions = (np.asarray(blocks, dtype=np.int64)[:, None] * BlockSize + np.arange(BlockSize)).ravel()
+        positions = positions[positions < len(self._doc_ids)]
+
+        return self._doc_ids[positions], self._tfs[positions]
@@ -0,0 +1,238 @@
+"""
+A segment is a directory holding a fully built index:
+    terms.pkl           dictionary from term to its position in the (sorted) term list
+    postings.npy        (T + 1) offsets into doc_ids.npy and tfs.npy for each term
+    doc_ids.npy         concatenated, per-term sorted document IDs
+    tfs.npy             term frequencies parallel to doc_ids.npy
+    lengths.npy         document vector lengths, indexed by document ID
+    block_max.npy       (T + 1) offsets into block_maxes.npy for each term
+    block_maxes.npy     upper bounds of the normalized weight of each term, per block of postings
+    champions.npy       (T + 1) offsets into champion_ids.npy for each term
+    champion_ids.npy    concatenated champion lists
+    static_scores.npy   static scores of documents (e.g. PageRank), indexed by document ID, empty if none are set
+    urls.pkl            URLs, indexed by document ID
+    meta.pkl            settings the index was built with, e.g. the tokenizer, champion list size and static tiers
+Arrays are opened memory-mapped, so reopening a segment does no tokenization and reads pages lazily.
+"""
+
+import math
+import os
+import pickle
+from collections.abc import Mapping
+
+import numpy as np
+
+from indexing.postings import ArrayPostings, BlockSize
+
+_TERMS = 'terms.pkl'
+_POSTINGS = 'postings.npy'
+_DOC_IDS = 'doc_ids.npy'
+_TFS = 'tfs.npy'
+_LENGTHS = 'lengths.npy'
+_BLOCK_MAX = 'block_max.npy'
+_BLOCK_MAX_SCORES = 'block_maxes.npy'
+_CHAMPIONS = 'champions.npy'
+_CHAMPION_IDS = 'champion_ids.npy'
+_STATIC_SCORES = 'static_scores.npy'
+_URLS = 'urls.pkl'
+_META = 'meta.pkl'
+
+# Block upper bounds of streamed postings are computed this many blocks at a time
+_BlockBatchSize = 8192
+
+
+class _SegmentTable(Mapping):
+    """ Maps terms to views of their slice of concatenated arrays, only creating the view when it is accessed """
+    def __init__(self, term_index, offsets, make_view):
+        self._term_index = term_index
+        self._offsets = offsets
+        self._make_view = make_view
+
+    def __getitem__(self, term):
+        idx = self._term_index[term]
+
+        return self._make_view(int(self._offsets[idx]), int(self._offsets[idx + 1]))
+
+    def __contains__(self, term):
+        return term in self._term_index
+
+    def __iter__(self):
+        return iter(self._term_index)
+
+    def __len__(self):
+        return len(self._term_index)
+
+
+def _concatenate(terms, get_values, dtype):
+    """ Concatenates per-term value lists into a single array along with (T + 1) offsets """
+    offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    chunks = list()
+
+    for idx, term in enumerate(terms):
+        values = get_values(term)
+        offsets[idx + 1] = offsets[idx] + len(values)
+        chunks.append(np.asarray(values, dtype=dtype))
+
+    return offsets, np.concatenate(chunks) if chunks else np.zeros(0, dtype=dtype)
+
+
+def _write_postings(term_dict, path):
+    """ Writes the postings, document lengths and block upper bounds of a term dictionary, returns the sorted terms """
+    term_postings = term_dict._term_postings
+    terms = sorted(term_postings)
+
+    # Postings are written in document ID order, allowing binary search when reopened
+    offsets, doc_ids = _concatenate(terms, lambda term: term_postings[term].doc_ids(), np.int32)
+    _, tfs = _concatenate(terms, lambda term: term_postings[term].tfs(), np.int32)
+    np.save(os.path.join(path, _POSTINGS), offsets)
+    np.save(os.path.join(path, _DOC_IDS), doc_ids)
+    np.save(os.path.join(path, _TFS), tfs)
+
+    # Document lengths are stored densely by document ID
+    np.save(os.path.join(path, _LENGTHS), np.asarray(term_dict._url_length_dict, dtype=np.float64))
+
+    block_max_offsets, block_max_scores = _concatenate(terms, term_dict.get_block_max_scores, np.float64)
+    np.save(os.path.join(path, _BLOCK_MAX), block_max_offsets)
+    np.save(os.path.join(path, _BLOCK_MAX_SCORES), block_max_scores)
+
+    return terms
+
+
+def _save_raw(path, name, raw_path):
+    """ Saves a file of raw int32 values as an array, mapping rather than reading it into memory """
+    values = np.memmap(raw_path, dtype=np.int32, mode='r') if os.path.getsize(raw_path) else np.zeros(0, np.int32)
+    np.save(os.path.join(path, name), values)
+
+    del values
+    os.remove(raw_path)
+
+
+def _write_streamed_postings(term_postings, num_documents, path):
+    """
+    Writes postings from an iterator of (term, doc_ids, tfs) in term order one term at a time, along with the document
+    lengths and block upper bounds computed from them, returns the terms
+    """
+    terms, offsets, idfs = list(), [0], list()
+    squared_sums = np.zeros(num_documents)
+    raw_doc_ids, raw_tfs = os.path.join(path, _DOC_IDS + '.raw'), os.path.join(path, _TFS + '.raw')
+
+    # Postings are appended to raw files, and every occurrence adds its squared tf-idf weight to the document length
+    with open(raw_doc_ids, 'wb') as doc_ids_file, open(raw_tfs, 'wb') as tfs_file:
+        for term, doc_ids, tfs in term_postings:
+            idf = math.log10(num_documents / len(doc_ids))
+            squared_sums[doc_ids] += tfs * (tfs + idf) ** 2
+
+            np.asarray(doc_ids, dtype=np.int32).tofile(doc_ids_file)
+            np.asarray(tfs, dtype=np.int32).tofile(tfs_file)
+            terms.append(term)
+            offsets.append(offsets[-1] + len(doc_ids))
+            idfs.append(idf)
+
+    offsets, lengths = np.asarray(offsets, dtype=np.int64), np.sqrt(squared_sums)
+    np.save(os.path.join(path, _POSTINGS), offsets)
+    _save_raw(path, _DOC_IDS, raw_doc_ids)
+    _save_raw(path, _TFS, raw_tfs)
+    np.save(os.path.join(path, _LENGTHS), lengths)
+
+    # Block starts of all terms, as positions into the concatenated postings
+    num_blocks = -(-np.diff(offsets) // BlockSize)
+    block_max_offsets = np.concatenate(([0], np.cumsum(num_blocks))).astype(np.int64)
+    block_starts = np.repeat(offsets[:-1] - block_max_offsets[:-1] * BlockSize, num_blocks) \
+        + np.arange(block_max_offsets[-1]) * BlockSize
+    block_idfs = np.repeat(np.asarray(idfs, dtype=np.float64), num_blocks)
+    block_ends = np.append(block_starts[1:], offsets[-1])
+
+    # The postings are read back memory-mapped, computing the upper bounds of a batch of blocks at a time
+    doc_ids = np.load(os.path.join(path, _DOC_IDS), mmap_mode='r')
+    tfs = np.load(os.path.join(path, _TFS), mmap_mode='r')
+    block_max_scores = np.zeros(len(block_starts))
+
+    for first in range(0, len(block_starts), _BlockBatchSize):
+        batch = slice(first, first + _BlockBatchSize)
+        start, end = block_starts[first], block_ends[batch][-1]
+        posting_idfs = np.repeat(block_idfs[batch], block_ends[batch] - block_starts[batch])
+
+        weights = (tfs[start:end] + posting_idfs) / lengths[doc_ids[start:end]]
+        block_max_scores[batch] = np.maximum.reduceat(weights, block_starts[batch] - start)
+
+    np.save(os.path.join(path, _BLOCK_MAX), block_max_offsets)
+    np.save(os.path.join(path, _BLOCK_MAX_SCORES), block_max_scores)
+
+    return terms
+
+
+def write_segment(indexer, path, term_postings=None):
+    """
+    Writes the index of an indexer to a segment directory at the given path. Given term_postings, an iterator of
+    (term, doc_ids, tfs) in term order such as merged SPIMI blocks, postings are written from it one term at a time
+    instead, such that they never need to be in memory at once. All documents must be in the URL vocabulary by then.
+    """
+    os.makedirs(path, exist_ok=True)
+    term_dict = indexer.term_dict
+
+    if term_postings is None:
+        terms = _write_postings(term_dict, path)
+    else:
+        terms = _write_streamed_postings(term_postings, len(indexer.url_vocabulary), path)
+
+    # Champion lists are kept in their ranked order
+    champion_offsets, champion_ids = _concatenate(terms, lambda term: term_dict.get_champions(term) or [], np.int32)
+    np.save(os.path.join(path, _CHAMPIONS), champion_offsets)
+    np.save(os.path.join(path, _CHAMPION_IDS), champion_ids)
+
+    with open(os.path.join(path, _TERMS), 'wb') as file:
+        pickle.dump({term: idx for idx, term in enumerate(terms)}, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    indexer.url_vocabulary.save(os.path.join(path, _URLS))
+    write_static_scores(indexer, path)
+
+
+def write_static_scores(indexer, path):
+    """ Writes only the static scores of an indexer to its segment, e.g. after they are computed for an opened one """
+    term_dict = indexer.term_dict
+
+    static_scores = term_dict.get_static_scores(np.arange(len(indexer.url_vocabulary))) \
+        if term_dict.has_static_scores() else np.zeros(0)
+    np.save(os.path.join(path, _STATIC_SCORES), static_scores)
+
+    with open(os.path.join(path, _META), 'wb') as file:
+        pickle.dump({'fast_tokenizer': indexer.fast_tokenizer, 'champion_r': term_dict.get_champion_r(),
+                     'static_tiers': term_dict.get_num_static_tiers()}, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def read_segment(indexer, path):
+    """ Opens the segment at the given path memory-mapped and sets it as the index of the indexer """
+    def load(name):
+        return np.load(os.path.join(path, name), mmap_mode='r')
+
+    with open(os.path.join(path, _TERMS), 'rb') as file:
+        term_index = pickle.load(file)
+
+    indexer.url_vocabulary.load(os.path.join(path, _URLS))
+
+    with open(os.path.join(path, _META), 'rb') as file:
+        meta = pickle.load(file)
+        indexer.fast_tokenizer = meta['fast_tokenizer']
+
+    doc_ids, tfs = load(_DOC_IDS), load(_TFS)
+    champion_ids = load(_CHAMPION_IDS)
+
+    term_dict = indexer.term_dict
+    term_dict.set_term_postings(
+        _SegmentTable(term_index, load(_POSTINGS), lambda start, end: ArrayPostings(doc_ids[start:end], tfs[start:end])))
+    term_dict.set_document_lengths(load(_LENGTHS))
+    block_max_scores = load(_BLOCK_MAX_SCORES)
+    term_dict.set_block_max_scores(
+        _SegmentTable(term_index, load(_BLOCK_MAX), lambda start, end: block_max_scores[start:end]))
+
+    # An index saved before computing champion lists has none
+    if len(champion_ids):
+        term_dict.set_champions(_SegmentTable(term_index, load(_CHAMPIONS),
+                                              lambda start, end: champion_ids[start:end].tolist()), meta['champion_r'])
+
+    # Static scores are optional, and segments written before they existed have none
+    static_path = os.path.join(path, _STATIC_SCORES)
+    if os.path.exists(static_path) and len(load(_STATIC_SCORES)):
+        term_dict.set_static_scores(load(_STATIC_SCORES), meta['static_tiers'])
+
+    return indexer
@@ -0,0 +1,93 @@
+import heapq
+import pickle
+import sys
+from array import array
+from itertools import groupby
+from operator import itemgetter
+
+import numpy as np
+
+# Rough number of bytes used by the containers of a term in a block, excluding the term itself
+_TermOverhead = 300
+
+# Bytes used by a posting in a block, i.e. a docId and a frequency
+_PostingSize = 2 * array('i').itemsize
+
+
+class SpimiBlock:
+    """
+    A block of single-pass in-memory indexing (SPIMI).
+    Postings are added directly to per-term arrays as documents arrive, without collecting and sorting (term, docId) pairs.
+    The size is an estimate of the memory used, such that the caller can flush the block once it reaches a budget.
+    """
+    def __init__(self):
+        self._postings = dict()
+        self.size = 0
+
+    def _get_arrays(self, term):
+        postings = self._postings.get(term)
+        if postings is None:
+            postings = self._postings[term] = (array('i'), array('i'))
+            self.size += sys.getsizeof(term) + _TermOverhead
+
+        return postings
+
+    def add(self, term, doc_id, tf):
+        postings = self._get_arrays(term)
+        postings[0].append(doc_id)
+        postings[1].append(tf)
+        self.size += _PostingSize
+
+    def extend(self, records):
+        """ Appends (term, doc_ids, tfs) records whose docIds all follow those already in the block """
+        for term, doc_ids, tfs in records:
+            postings = self._get_arrays(term)
+            postings[0].extend(doc_ids)
+            postings[1].extend(tfs)
+            self.size += len(doc_ids) * _PostingSize
+
+    def __len__(self):
+        return len(self._postings)
+
+    def sorted_postings(self):
+        """ Yields (term, doc_ids, tfs) in term order """
+        for term in sorted(self._postings):
+            doc_ids, tfs = self._postings[term]
+
+            yield term, doc_ids, tfs
+
+    def write(self, path):
+        """ Flushes the block to a file of sequential records in term order, returns an iterator over the records """
+        with open(path, 'wb') as file:
+            for record in self.sorted_postings():
+                pickle.dump(record, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+        return read_block(path)
+
+
+def read_block(path):
+    """ Streams the records of a flushed block """
+    with open(path, 'rb') as file:
+        while True:
+            try:
+                yield pickle.load(file)
+            except EOFError:
+                return
+
+
+def merge_blocks(blocks):
+    """
+    Merges blocks, each an iterator of (term, doc_ids, tfs) in term order, into a single stream in term order.
+    Blocks must be given in the order they were built, such that concatenating their postings keeps docIds sorted.
+    """
+    for term, records in groupby(heapq.merge(*blocks, key=itemgetter(0)), key=itemgetter(0)):
+        records = list(records)
+        doc_ids = np.concatenate([np.frombuffer(doc_ids, dtype=np.int32) for _, doc_ids, _ in records])
+        tfs = np.concatenate([np.frombuffer(tfs, dtype=np.int32) for _, _, tfs in records])
+
+        # A document indexed twice (e.g. a URL already in the vocabulary) breaks the order, so sum its frequencies
+        if np.any(np.diff(doc_ids) <= 0):
+            doc_ids, inverse = np.unique(doc_ids, return_inverse=True)
+            tfs = np.bincount(inverse, weights=tfs).astype(np.int32)
+
+        yield term, doc_ids, tfs
@@ -1,3 +1,4 @@
+import os
 import pickle
 
 from loguru import logger
@@ -6,39 +7,73 @@ from indexing.indexer import Indexer
 from querying.free_text_query import FreeTextQuery
 from ranking.content_ranker import ContentRanker
 from ranking.pagerank import PageRank
+from shared.document_store import DocumentStore
+from shared.link_graph import LinkGraph
 
-if __name__ == "__main__":
-    # Load corpus from file
-    url_contents_dict = pickle.load(open('contents.pkl', 'rb'))
+index_path = 'index'
+links_path = 'links'
+documents_path = 'documents'
 
-    # Load URl references from file (used for link analysis)
-    url_references = pickle.load(open('references.pkl', 'rb'))
+# Weights of the cosine score and of the PageRank score (scaled such that the highest is 1) in the combined score
+content_weight = 0.7
+static_weight = 0.3
 
-    # Perform indexing on the corpus
-    logger.info(f'Indexing {len(url_contents_dict)} documents')
-    indexer = Indexer()
-    indexer.index_corpus(url_contents_dict)
 
-    # Compute champion list
-    logger.info('Updating champion list')
-    indexer.term_dict.update_champions(r=50)
+def set_pagerank_scores(indexer):
+    """ PageRanks the crawled pages by their links, and stores the scores with the index by docId """
+    # Load URL references from file (used for link analysis)
+    if os.path.isdir(links_path):
+        link_graph = LinkGraph.load(links_path)
+    else:
+        # Crawls dumped before the link graph existed pickled a dictionary of references
+        link_graph = LinkGraph.from_references(pickle.load(open('references.pkl', 'rb')))
 
     # PageRank the URL references
     logger.info('Performing PageRank')
-    page_rank = PageRank(url_references)
+    page_rank = PageRank(link_graph)
     rank_result = page_rank.rank()
     for index, url in enumerate(rank_result[:10]):
         print(f'{index + 1}. {url[0]}')
 
     # Make dictionary from URL to PageRank score (for combined score)
-    url_pagerank = {tup[0]: tup[1] for tup in rank_result}
+    indexer.set_static_scores({tup[0]: tup[1] for tup in rank_result})
+
+
+if __name__ == "__main__":
+    if os.path.isdir(index_path):
+        # Reopen the index built by a previous run, along with its PageRank scores
+        logger.info(f'Loading index from {index_path}')
+        indexer = Indexer.load(index_path)
+
+        # Segments saved before static scores were stored have none, so they are computed for this run only
+        if not indexer.term_dict.has_static_scores():
+            set_pagerank_scores(indexer)
+    else:
+        # Stream the corpus from the document store, crawls dumped before it existed pickled a dictionary of contents
+        if os.path.isdir(documents_path):
+            document_store = DocumentStore(documents_path)
+            num_documents, documents = len(document_store), document_store.items()
+        else:
+            documents = pickle.load(open('contents.pkl', 'rb'))
+            num_documents = len(documents)
+
+        # Perform indexing on the corpus
+        logger.info(f'Indexing {num_documents} documents')
+        indexer = Indexer(fast_tokenizer=True)
+        # The index is written to disk as it is merged, such that later runs can skip indexing
+        indexer.index_corpus(documents, workers=os.cpu_count(), path=index_path)
+
+        # Static scores are stored with the index, such that later runs neither index nor PageRank again
+        set_pagerank_scores(indexer)
+        indexer.save_static_scores(index_path)
 
     # Repeatedly accept user input
     while True:
         query = FreeTextQuery(indexer, input('Enter query:'))
 
-        # Rank with cosine similarity
-        content_ranker = ContentRanker(query)
+        # Rank with cosine similarity combined with PageRank, scoring every posting
+        # Pruning evaluates fewer postings, though on an index in memory it is not faster than a single vectorized pass
+        content_ranker = ContentRanker(query, pruning=None, content_weight=content_weight, static_weight=static_weight)
 
         # Print results
         for idx, document in enumerate(content_ranker.top(10)):
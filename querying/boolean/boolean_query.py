@@ -4,7 +4,7 @@ from querying.boolean.boolean_query_tokenizer import BooleanQueryTokenizer, Toke
 class BooleanQuery:
     def __init__(self, indexer, query):
         self._indexer = indexer
-        self._tokenizer = BooleanQueryTokenizer(query)
+        self._tokenizer = BooleanQueryTokenizer(query, fast=indexer.fast_tokenizer)
         self._search_terms = self._tokenizer.get_search_terms()
         self._matches = self._parse()
 
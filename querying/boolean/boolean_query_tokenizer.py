@@ -1,9 +1,7 @@
 import enum
 import re
 
-from stemming.porter2 import stem
-
-from shared.tokenizer import get_disallowed_tokens, doc_preprocess
+from shared.tokenizer import tokenize
 
 TokenizerRegex = re.compile(r'(\bAND\b|\bOR\b|NOT|\(|\))')
 
@@ -19,39 +17,39 @@ class TokenType(enum.Enum):
 
 
 class BooleanQueryTokenizer:
-    def __init__(self, query):
-        query = doc_preprocess(query)
+    def __init__(self, query, fast=False):
         self.index = 0
-        self.tokens = [token.strip() for token in TokenizerRegex.split(query) if token.strip() != '']
+        self.tokens = list()
         self._search_terms = set()
         self._token_types = list()
 
-        for idx, token in enumerate(self.tokens):
+        # Operators are split off before terms are lower-cased, as they are recognised by being upper case
+        for token in TokenizerRegex.split(query):
+            token = token.strip()
+            if token == '':
+                continue
+
             if token == 'AND':
-                self._token_types.append(TokenType.AND)
+                self._add(token, TokenType.AND)
             elif token == 'OR':
-                self._token_types.append(TokenType.OR)
+                self._add(token, TokenType.OR)
             elif token == 'NOT':
-                self._token_types.append(TokenType.NOT)
+                self._add(token, TokenType.NOT)
             elif token == '(':
-                self._token_types.append(TokenType.L_PAREN)
+                self._add(token, TokenType.L_PAREN)
             elif token == ')':
-                self._token_types.append(TokenType.R_PAREN)
+                self._add(token, TokenType.R_PAREN)
             else:
-                # Stem string token
-                self.tokens[idx] = stem(self.tokens[idx])
-
-                # Remove if disallowed word
-                if self.tokens[idx] in get_disallowed_tokens():
-                    del self.tokens[idx]
-
-                    continue
-
-                # Add to set of search terms, which is used when doing content ranking
-                self._search_terms.add(self.tokens[idx])
-
-                # Add to set of token types, which is used during parsing
-                self._token_types.append(TokenType.STRING)
+                # Terms are tokenized like documents, i.e. stemmed and with disallowed words removed
+                for term in tokenize(token, fast=fast):
+                    # Add to set of search terms, which is used when doing content ranking
+                    self._search_terms.add(term)
+                    self._add(term, TokenType.STRING)
+
+    def _add(self, token, token_type):
+        # Add to set of token types, which is used during parsing
+        self.tokens.append(token)
+        self._token_types.append(token_type)
 
     def get_search_terms(self):
         return self._search_terms
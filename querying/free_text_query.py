@@ -4,7 +4,7 @@ from shared.tokenizer import tokenize
 class FreeTextQuery:
     def __init__(self, indexer, query):
         self._indexer = indexer
-        self._tokens = tokenize(query)
+        self._tokens = tokenize(query, fast=indexer.fast_tokenizer)
         self._matches = self._get_matches()
 
     def _get_matches(self):
@@ -1,11 +1,69 @@
+import numpy as np
+
+# Relative slack on upper bounds, such that rounding never makes a bound lower than the score it bounds
+_BoundSlack = 1e-9
+
+
 def _sort_scores(document_scores):
     return sorted(document_scores, key=lambda x: x[1], reverse=True)
 
 
+def _select_top_k(documents, scores, k):
+    """ Selects the k highest scoring documents without sorting all of them, returns them by descending score """
+    if k < len(scores):
+        # Documents tied with the k-th score are all kept, such that ties are broken by docId below
+        threshold = scores[np.argpartition(-scores, k - 1)[k - 1]] if k else np.inf
+        selected = np.flatnonzero(scores >= threshold)
+        documents, scores = documents[selected], scores[selected]
+
+    # Only the selected documents are sorted, by descending score and then docId
+    order = np.lexsort((documents, -scores))[:k]
+
+    return documents[order], scores[order]
+
+
+def _top_k(documents, scores, k):
+    """ Selects the k highest scoring documents, returns (document, score) pairs """
+    documents, scores = _select_top_k(documents, scores, k)
+
+    return list(zip(documents.tolist(), scores.tolist()))
+
+
+def _kth_highest(scores, k):
+    """ Returns the k-th highest score, or -inf if there are fewer than k """
+    return scores[np.argpartition(-scores, k - 1)[k - 1]] if 0 < k <= len(scores) else -np.inf
+
+
 class ContentRanker:
-    def __init__(self, query):
+    # Pruning approaches: only rank champions of the query terms, skip documents and blocks of postings that cannot
+    # be in the top k (block-max MaxScore, of the WAND family of dynamic pruning),
+    # or score documents in tiers of decreasing static score until the remaining tiers cannot reach the top k
+    ChampionPruning = 'champions'
+    WandPruning = 'wand'
+    TierPruning = 'tiers'
+
+    # Number of blocks of postings that MaxScore first decodes at once for new documents, doubling for each batch
+    InitialBlockBatch = 4
+
+    def __init__(self, query, pruning=ChampionPruning, content_weight=1, static_weight=0):
+        """
+        Ranks matches of a query by cosine score. With pruning set to None, all postings are scored.
+        With a static weight, the score is a weighted sum of the cosine score and the static score of documents.
+        """
+        if pruning == self.WandPruning and static_weight:
+            raise ValueError('WAND pruning only bounds cosine scores, use tier pruning with static scores')
+
         self._query = query
-        self._rank_list = self._rank_cosine_score()
+        self._pruning = pruning
+        self._content_weight = content_weight
+        self._static_weight = static_weight
+
+        # Scores are computed on the first call to top
+        self._relevant = None
+        self._scores = None
+
+        # Number of postings whose weight was added to a score
+        self.postings_evaluated = 0
 
     def _rank_simple(self):
         scores = dict()
@@ -29,31 +87,200 @@ class ContentRanker:
 
         return _sort_scores(scores)
 
-    def _rank_cosine_score(self):
+    def _accumulate_cosine_scores(self):
+        """ Returns the candidate documents and their cosine scores, accumulated term-at-a-time """
         indexer = self._query.get_indexer()
+        term_dict = indexer.term_dict
         search_terms = set(self._query.get_search_terms())
 
-        # Find a subset of documents from our champion list
-        relevant = set()
-        for term in search_terms:
-            if term in indexer.term_dict:
-                relevant = relevant.union(indexer.term_dict.champion_list[term])
-
-        # Initialize score for each relevant document
-        scores = {doc: 0 for doc in relevant}
+        # Dense accumulators indexed by docId, so each posting costs a single array update
+        scores = np.zeros(term_dict.get_num_documents())
+        relevant = np.zeros(term_dict.get_num_documents(), dtype=bool)
 
         # Disregards the frequency of terms in queries and assumes they only occur once
         for term in search_terms:
-            for doc in relevant:
-                # No need to do a dot product here, since each query term has an equal weight
-                scores[doc] += indexer.term_dict.get_tf_idf(term, doc)
+            postings = term_dict.get_postings(term)
+            if postings is None:
+                continue
+
+            # Only score the documents in the champion list of the term, if one has been computed
+            # Their frequencies are looked up through the skip entries, rather than decoding the whole postings list
+            champions = term_dict.get_champions(term) if self._pruning == self.ChampionPruning else None
+            if champions is None or len(champions) >= len(postings):
+                doc_ids, tfs = postings.doc_ids(), postings.tfs()
+            else:
+                doc_ids = np.array(champions, dtype=np.int64)
+                tfs = np.fromiter((postings[doc] for doc in champions), dtype=np.float64, count=len(champions))
+
+            # No need to do a dot product here, since each query term has an equal weight
+            scores[doc_ids] += tfs + term_dict.get_idf(term)
+            relevant[doc_ids] = True
+            self.postings_evaluated += len(doc_ids)
 
         # Normalize scores wrt doc lengths
         # We are not normalizing wrt query lengths because it is a constant, i.e. would not change ordering
-        url = indexer.url_vocabulary.get
-        scores = [(url(doc), scores[doc] / indexer.term_dict.get_document_length(doc)) for doc in relevant]
+        relevant = np.flatnonzero(relevant)
 
-        return _sort_scores(scores)
+        return relevant, self._combine(relevant, scores[relevant] / term_dict.get_document_lengths(relevant))
+
+    def _combine(self, documents, cosine_scores):
+        """ Weighs the cosine scores of documents with their static scores, if a static weight is given """
+        if not self._static_weight:
+            return cosine_scores
+
+        term_dict = self._query.get_indexer().term_dict
+
+        return self._content_weight * cosine_scores + self._static_weight * term_dict.get_static_scores(documents)
+
+    def _top_tiers(self, k):
+        """
+        Finds the k highest combined scores by scoring documents one static tier at a time, from the highest static
+        scores down. A document is in a single tier, so its score is complete once its tier has been scored.
+        Scoring stops when the lowest score in the top k exceeds what any document in the remaining tiers can reach,
+        i.e. the highest normalized weights of the query terms plus the highest static score in the next tier.
+        The result is the same as scoring all postings.
+        """
+        term_dict = self._query.get_indexer().term_dict
+        num_documents = term_dict.get_num_documents()
+
+        # Postings are taken in the same term order as when accumulating, such that scores are summed identically
+        terms = [(term, term_dict.get_idf(term), term_dict.get_tiered_postings(term))
+                 for term in set(self._query.get_search_terms()) if term_dict.get_postings(term)]
+        content_bound = self._content_weight * sum(term_dict.get_max_score(term) for term, _, _ in terms)
+        tier_max_scores = term_dict.get_static_tier_max_scores()
+
+        scores = np.zeros(num_documents)
+        top_documents, top_scores = np.zeros(0, dtype=np.int64), np.zeros(0)
+
+        for tier in range(len(tier_max_scores)):
+            documents = list()
+            for term, idf, (doc_ids, tfs, offsets) in terms:
+                start, end = offsets[tier], offsets[tier + 1]
+                scores[doc_ids[start:end]] += tfs[start:end] + idf
+                documents.append(doc_ids[start:end])
+                self.postings_evaluated += end - start
+
+            # Postings of a single term hold unique documents, but documents may contain several query terms
+            if len(documents) > 1:
+                documents = np.unique(np.concatenate(documents))
+            else:
+                documents = documents[0] if documents else np.zeros(0, dtype=np.int64)
+
+            tier_scores = self._combine(documents, scores[documents] / term_dict.get_document_lengths(documents))
+            top_documents, top_scores = _select_top_k(np.concatenate((top_documents, documents)),
+                                                      np.concatenate((top_scores, tier_scores)), k)
+
+            # Stop if no document in the next tiers can score at least as high as the lowest in the top k
+            if tier + 1 < len(tier_max_scores) and 0 < len(top_scores) == k:
+                bound = content_bound + self._static_weight * tier_max_scores[tier + 1]
+                if bound * (1 + _BoundSlack) < top_scores[-1]:
+                    break
+
+        return list(zip(top_documents.tolist(), top_scores.tolist()))
+
+    def _top_max_score(self, k):
+        """
+        Finds the k highest cosine scores with block-max MaxScore. Terms are taken one at a time, and the lowest of the
+        k highest partial scores so far is a threshold that the final top k must reach, where the upper bound of the
+        weight of a term is the highest normalized weight in its postings or in a block of them.
+        Documents found so far are dropped once their partial score plus the highest weight of the term in the block
+        that may hold them and the bounds of the terms after it fall short, and the others are looked up by decoding
+        only the blocks holding them. A document not found so far can only reach the threshold if the highest weight
+        in its block plus the bounds after it do, so blocks are decoded in full from the highest weight down, raising
+        the threshold in between, until the next block falls short. Blocks are found through the skip entries, and the
+        remaining blocks of postings are never decoded.
+        The result is the same as scoring all postings, as scores are summed in the same order and ties favour lower
+        docIds.
+        """
+        term_dict = self._query.get_indexer().term_dict
+
+        # Terms are kept in the same order as when accumulating, such that scores are summed identically
+        terms = [(term_dict.get_postings(term), term_dict.get_idf(term), term_dict.get_block_max_scores(term))
+                 for term in set(self._query.get_search_terms()) if term_dict.get_postings(term)]
+        if not k or not terms:
+            return list()
+
+        # Terms are taken from the shortest postings list, such that the threshold is raised by the rare terms before
+        # the postings of frequent terms are decoded, along with the sum of the bounds of the terms left after each
+        bounds = np.array([np.max(block_max_scores) for _, _, block_max_scores in terms])
+        order = np.lexsort((-bounds, [len(postings) for postings, _, _ in terms]))
+        bounds_after = np.append(np.cumsum(bounds[order][::-1])[::-1], 0)[1:]
+
+        # Dense accumulators indexed by docId, as when accumulating, and the documents found so far in any order
+        weights = np.zeros((len(terms), term_dict.get_num_documents()))
+        partial_scores = np.zeros(term_dict.get_num_documents())
+        is_found = np.zeros(term_dict.get_num_documents(), dtype=bool)
+        documents = np.zeros(0, dtype=np.int64)
+
+        for term, bound_after in zip(order.tolist(), bounds_after.tolist()):
+            postings, idf, block_max_scores = terms[term]
+            threshold = _kth_highest(partial_scores[documents], k)
+
+            # Drop found documents which cannot reach the threshold, given the block of the term that may hold them
+            num_blocks = len(block_max_scores)
+            blocks = np.searchsorted(postings.block_last(), documents)
+            block_bounds = block_max_scores[np.minimum(blocks, num_blocks - 1)] * (blocks < num_blocks)
+            reachable = (partial_scores[documents] + block_bounds + bound_after) * (1 + _BoundSlack) >= threshold
+            is_found[documents[~reachable]] = False
+            documents = documents[reachable]
+
+            # Look up the other found documents in the blocks that may hold them
+            holding = np.zeros(num_blocks + 1, dtype=bool)
+            holding[blocks[reachable]] = True
+            documents = self._add_blocks(term_dict, postings, np.flatnonzero(holding[:-1]), idf, weights[term],
+                                         partial_scores, is_found, documents, found=True)
+
+            # Decode blocks that may hold new documents reaching the threshold, in batches of a growing number of blocks
+            # A new document with a score equal to the threshold may still enter the top k by a lower docId
+            open_blocks = np.argsort(-block_max_scores, kind='stable')
+            start, batch_size = 0, self.InitialBlockBatch
+            while start < len(open_blocks):
+                threshold = _kth_highest(partial_scores[documents], k)
+                batch = open_blocks[start:start + batch_size]
+                batch = batch[(block_max_scores[batch] + bound_after) * (1 + _BoundSlack) >= threshold]
+                if not len(batch):
+                    break
+
+                documents = self._add_blocks(term_dict, postings, np.sort(batch), idf, weights[term], partial_scores,
+                                             is_found, documents, found=False)
+                start, batch_size = start + batch_size, 2 * batch_size
+
+        # Weights are summed in the order of the terms, as when accumulating
+        scores = np.zeros(len(documents))
+        for term_weights in weights:
+            scores += term_weights[documents]
+
+        return _top_k(documents, scores / term_dict.get_document_lengths(documents), k)
+
+    def _add_blocks(self, term_dict, postings, blocks, idf, term_weights, partial_scores, is_found, documents, found):
+        """
+        Records the weights of a term in either the found or the new documents in the given blocks of its postings,
+        returns the documents found so far
+        """
+        doc_ids, tfs = postings.get_blocks(blocks)
+        selected = is_found[doc_ids] == found
+        doc_ids, tfs = doc_ids[selected], tfs[selected]
+
+        term_weights[doc_ids] = tfs + idf
+        partial_scores[doc_ids] += (tfs + idf) / term_dict.get_document_lengths(doc_ids)
+        self.postings_evaluated += len(doc_ids)
+
+        if found:
+            return documents
+
+        is_found[doc_ids] = True
+        return np.concatenate((documents, doc_ids))
 
     def top(self, n):
-        return self._rank_list[:n]
+        url = self._query.get_indexer().url_vocabulary.get
+
+        if self._pruning == self.WandPruning:
+            return [(url(doc), score) for doc, score in self._top_max_score(n)]
+
+        if self._pruning == self.TierPruning and self._query.get_indexer().term_dict.has_static_scores():
+            return [(url(doc), score) for doc, score in self._top_tiers(n)]
+
+        if self._scores is None:
+            self._relevant, self._scores = self._accumulate_cosine_scores()
+
+        return [(url(doc), score) for doc, score in _top_k(self._relevant, self._scores, n)]
@@ -1,44 +1,313 @@
+from array import array
 from random import randint
 
 import numpy as np
 from loguru import logger
 
+from shared.link_graph import LinkGraph
+
+
+def _sparse_step(indptr, indices, state, alpha):
+    """
+    Computes state * P_PageRank without materializing it, where P_PageRank = (1 - alpha) * P + alpha * U.
+    Teleportation (U) and dangling pages (zero rows of P, which are uniform) are rank-one corrections to the
+    sparse link matrix, so they only add a constant to every URL.
+    """
+    out_degree = np.diff(indptr)
+    dangling = out_degree == 0
+
+    # Each URL spreads its probability evenly over its outgoing links
+    shares = np.divide(state, out_degree, out=np.zeros(len(state)), where=~dangling)
+    linked = np.bincount(indices, weights=np.repeat(shares, out_degree), minlength=len(state))
+
+    # Dangling pages have equal probability of visiting any URL, and all pages may teleport to any URL
+    uniform = ((1 - alpha) * state[dangling].sum() + alpha * state.sum()) / len(state)
+
+    return (1 - alpha) * linked + uniform
+
+
+def _gauss_seidel(indptr, indices, state, alpha, max_iterations, tolerance, num_blocks):
+    """
+    Iterates towards state = state * P_PageRank from an initial state, where the residual of a URL is how much a power
+    iteration step would change its probability. URLs are split into blocks, and in each sweep every block in turn adds
+    its residuals to its probabilities and spreads them over the residuals of the URLs it links to, so later blocks
+    already build on the changes of earlier ones within the sweep. Blocks are taken by decreasing residual, such that
+    when starting from the scores of a slightly different graph, the URLs around the changed links go first.
+    Teleportation is proportional to the total probability, which only rescales the state, so it is normalized once
+    converged. Returns the state, the number of sweeps and the L1 residual, as that of a power iteration step.
+    """
+    out_degree = np.diff(indptr)
+    dangling = out_degree == 0
+    state = state.copy()
+    residual = _sparse_step(indptr, indices, state, alpha) - state
+    bounds = np.linspace(0, len(state), min(num_blocks, len(state)) + 1).astype(np.int64).tolist()
+
+    for iteration in range(max_iterations + 1):
+        total = float(np.abs(residual).sum()) / state.sum()
+        if total < tolerance or iteration == max_iterations:
+            return state / state.sum(), iteration, total
+
+        uniform = 0
+        for block in np.argsort(-np.add.reduceat(np.abs(residual), bounds[:-1])).tolist():
+            start, end = bounds[block], bounds[block + 1]
+            pushed = residual[start:end] + uniform
+            state[start:end] += pushed
+            residual[start:end] = -uniform
+
+            lengths = out_degree[start:end]
+            shares = np.divide(pushed, lengths, out=np.zeros(len(pushed)), where=lengths > 0)
+            linked = np.bincount(indices[indptr[start]:indptr[end]], weights=np.repeat(shares, lengths))
+            residual[:len(linked)] += (1 - alpha) * linked
+
+            # Dangling pages and teleportation spread evenly over all URLs, which is added once the sweep is done
+            uniform += ((1 - alpha) * pushed[dangling[start:end]].sum() + alpha * pushed.sum()) / len(state)
+
+        residual += uniform
+
 
 class PageRank:
+    # Number of blocks of URLs that sparse iteration updates in turn
+    GaussSeidelBlocks = 16
+
     def __init__(self, url_references):
+        """ Ranks the crawled URLs of a link graph, or of a dictionary from crawled URLs to the URLs they link to """
         self.url_references = url_references
 
-    def rank(self, alpha=0.15, max_iterations=100):
+        # URLs and scores of the previous run, used as the starting point of the next run
+        self._previous = None
+
+        # Graph of the previous sparse run as by construct_graph, which update extends rather than constructing it
+        # again, along with the node of each of its URLs and its links to URLs that are not crawled
+        self._graph = None
+        self._node_ids = None
+        self._uncrawled_links = None
+
+        # Links to URLs that are not crawled are keyed by URL ID in a link graph, and numbered here for a dictionary
+        self._uncrawled_ids = dict()
+
+        # Number of iterations and L1 residual of the last step in the previous run
+        self.iterations = 0
+        self.residual = None
+
+    def update(self, new_references, **kwargs):
+        """
+        Adds references found since the previous run, e.g. by further crawling, and ranks again from its result.
+        The graph of the previous run is extended by the new references rather than constructed again.
+        """
+        for url, references in new_references.items():
+            if isinstance(self.url_references, LinkGraph):
+                self.url_references.add_links(url, set(self.url_references.get_links(url) or ()).union(references))
+            else:
+                self.url_references.setdefault(url, set()).update(references)
+
+        if self._graph is None or kwargs.get('dense'):
+            return self.rank(**kwargs)
+
+        self._extend_graph(new_references)
+        return self._rank_graph(**kwargs)
+
+    def _initial_state(self, urls, warm_start):
+        # In initial state, equally probable to visit any other link
+        uniform = 1 / len(urls)
+        if not warm_start or self._previous is None:
+            return np.full(len(urls), uniform)
+
+        # Start from the previous scores, since a small change to the graph only changes them slightly
+        # New URLs start with the probability they would have initially, and the state is then renormalized
+        previous_urls, previous_state = self._previous
+        if previous_urls is urls:
+            state = np.concatenate((previous_state, np.full(len(urls) - len(previous_state), uniform)))
+        else:
+            previous_scores = dict(zip(previous_urls, previous_state.tolist()))
+            state = np.fromiter((previous_scores.get(url, uniform) for url in urls), dtype=np.float64,
+                                count=len(urls))
+
+        return state / state.sum()
+
+    def rank(self, alpha=0.15, max_iterations=100, tolerance=1e-6, dense=False, warm_start=True):
+        """
+        Ranks URLs by PageRank, iterating until the L1 residual is below tolerance. Blocks of URLs are updated in turn
+        over a sparse link graph, see _gauss_seidel, or with dense set, power iteration uses the full transition
+        probability matrix, requiring O(N^2) memory.
+        With warm_start set, iteration starts from the scores of the previous run rather than a uniform distribution.
+        """
         # Ensure that we have some URLs with references
-        if not self.url_references:
+        if not self._num_urls():
             return []
 
+        if not dense:
+            # Construct the link graph in CSR form, i.e. outgoing links of URL i are indices[indptr[i]:indptr[i + 1]]
+            indptr, indices, idx_to_url, *uncrawled_links = self.construct_graph(uncrawled_links=True)
+            self._graph = indptr, indices, list(idx_to_url.values())
+            self._node_ids, self._uncrawled_links = None, uncrawled_links
+
+            return self._rank_graph(alpha, max_iterations, tolerance, warm_start=warm_start)
+
         # Construct the transition probability matrix
         matrix, idx_to_url = self.construct_matrix(alpha=alpha)
-
-        # In initial state, equally probable to visit any other link
-        state = np.full(len(idx_to_url), 1 / len(idx_to_url))
+        urls = list(idx_to_url.values())
+        state = self._initial_state(urls, warm_start)
 
         # Iterate until convergence
         for i in range(max_iterations):
             old_state = state
             state = np.matmul(old_state, matrix)
+            self.iterations, self.residual = i + 1, float(np.abs(state - old_state).sum())
 
             # Check if state has reached a stationary position
-            if np.allclose(state, old_state):
-                logger.info(f'PageRank converged at iteration {i}')
-
+            if self.residual < tolerance:
                 break
 
-        top_indices = np.argsort(state)[::-1]
-        top_urls = [(idx_to_url[idx], state[idx]) for idx in top_indices]
+        self._graph = None
+        return self._result(urls, state, tolerance)
+
+    def _rank_graph(self, alpha=0.15, max_iterations=100, tolerance=1e-6, warm_start=True, dense=False):
+        """ Ranks the URLs of the sparse graph of the previous run """
+        indptr, indices, urls = self._graph
+        state, self.iterations, self.residual = _gauss_seidel(indptr, indices, self._initial_state(urls, warm_start),
+                                                              alpha, max_iterations, tolerance,
+                                                              self.GaussSeidelBlocks)
+
+        return self._result(urls, state, tolerance)
+
+    def _result(self, urls, state, tolerance):
+        """ Keeps the scores for the next run, and returns (URL, score) pairs by descending score """
+        if self.residual < tolerance:
+            logger.info(f'PageRank converged at iteration {self.iterations}, residual {self.residual:.2e}')
+        else:
+            logger.warning(f'PageRank did not converge in {self.iterations} iterations, residual {self.residual:.2e}')
+
+        self._previous = urls, state
+
+        top_indices = np.argsort(state)[::-1].tolist()
+        top_urls = list(zip([urls[idx] for idx in top_indices], state[top_indices].tolist()))
 
         return top_urls
 
+    def _links_of(self, url):
+        if isinstance(self.url_references, LinkGraph):
+            return self.url_references.get_links(url) or ()
+
+        return self.url_references.get(url, ())
+
+    def _uncrawled_id(self, url):
+        if isinstance(self.url_references, LinkGraph):
+            return self.url_references.get_id(url)
+
+        return self._uncrawled_ids.setdefault(url, len(self._uncrawled_ids))
+
+    def _extend_graph(self, new_references):
+        """
+        Extends the graph of the previous run by the links of URLs with new references, which replace their earlier
+        links, and by the links to URLs that have been crawled since. Those URLs are appended as nodes, so the other
+        nodes keep their index and previous scores.
+        """
+        indptr, indices, urls = self._graph
+        if self._node_ids is None:
+            self._node_ids = {url: node for node, url in enumerate(urls)}
+        node_ids = self._node_ids
+
+        crawled_ids = list()
+        for url in new_references:
+            if url not in node_ids:
+                crawled_ids.append(self._uncrawled_id(url))
+                node_ids[url] = len(urls)
+                urls.append(url)
+
+        # Links of the updated URLs, split by whether their target is crawled
+        changed = np.fromiter((node_ids[url] for url in new_references), dtype=np.int64, count=len(new_references))
+        sources, targets, uncrawled_sources, uncrawled_targets = array('i'), array('i'), array('i'), array('q')
+        for url, node in zip(new_references, changed.tolist()):
+            for reference in self._links_of(url):
+                target = node_ids.get(reference)
+                if target is None:
+                    uncrawled_sources.append(node)
+                    uncrawled_targets.append(self._uncrawled_id(reference))
+                else:
+                    sources.append(node)
+                    targets.append(target)
+
+        # Links from other URLs to the URLs crawled since are no longer left out of the graph
+        earlier_sources, earlier_targets = self._uncrawled_links
+        unchanged = ~np.isin(earlier_sources, changed)
+        crawled_ids = np.array(crawled_ids, dtype=np.int64)
+        order = np.argsort(crawled_ids)
+        crawled = unchanged & np.isin(earlier_targets, crawled_ids)
+        crawled_nodes = (len(urls) - len(crawled_ids) + order)[np.searchsorted(crawled_ids[order],
+                                                                               earlier_targets[crawled])]
+
+        sources = np.concatenate((np.frombuffer(sources, dtype=np.int32), earlier_sources[crawled]))
+        targets = np.concatenate((np.frombuffer(targets, dtype=np.int32), crawled_nodes.astype(np.int32)))
+        self._uncrawled_links = (
+            np.concatenate((earlier_sources[unchanged & ~crawled], np.frombuffer(uncrawled_sources, dtype=np.int32))),
+            np.concatenate((earlier_targets[unchanged & ~crawled], np.frombuffer(uncrawled_targets, dtype=np.int64))))
+
+        # Earlier links of the updated URLs are removed, and new links are inserted at the end of the run of their
+        # source, where the runs of the new nodes follow all others
+        lengths = np.diff(indptr)
+        removed = np.zeros(len(lengths), dtype=bool)
+        removed[changed[changed < len(lengths)]] = True
+        indices = indices[~np.repeat(removed, lengths)]
+        lengths = np.concatenate((np.where(removed, 0, lengths), np.zeros(len(urls) - len(lengths), dtype=np.int64)))
+
+        order = np.argsort(sources, kind='stable')
+        indices = np.insert(indices, np.cumsum(lengths)[sources[order]], targets[order])
+        lengths += np.bincount(sources, minlength=len(lengths))
+
+        self._graph = np.concatenate(([0], np.cumsum(lengths))), indices, urls
+
+    def _num_urls(self):
+        if isinstance(self.url_references, LinkGraph):
+            return self.url_references.num_crawled()
+
+        return len(self.url_references)
+
+    """ Constructs the link graph between URLs with references as CSR arrays, along with a mapping from index to URL.
+        With uncrawled_links set, links to URLs without references are returned as well, as arrays of source indices
+        and target keys, which are URL IDs in a link graph.
+    """
+    def construct_graph(self, uncrawled_links=False):
+        # A link graph already holds the arrays
+        if isinstance(self.url_references, LinkGraph):
+            indptr, indices, urls, *links = self.url_references.crawled_graph(uncrawled_links=uncrawled_links)
+
+            return (indptr, indices, dict(enumerate(urls)), *links)
+
+        # Maintain a mapping from URLs to their index
+        url_to_idx = {url: idx for idx, url in enumerate(self.url_references)}
+
+        # Only references to URLs that we have references for are part of the graph
+        indptr = array('q', [0])
+        indices = array('i')
+        uncrawled_sources, uncrawled_targets = array('i'), array('q')
+        for idx, references in enumerate(self.url_references.values()):
+            indices.extend(url_to_idx[ref_url] for ref_url in references if ref_url in url_to_idx)
+            indptr.append(len(indices))
+
+            if uncrawled_links and indptr[-1] - indptr[-2] < len(references):
+                for ref_url in references:
+                    if ref_url not in url_to_idx:
+                        uncrawled_sources.append(idx)
+                        uncrawled_targets.append(self._uncrawled_id(ref_url))
+
+        idx_to_url = dict(enumerate(url_to_idx))
+        graph = np.frombuffer(indptr, dtype=np.int64), np.frombuffer(indices, dtype=np.int32), idx_to_url
+
+        if uncrawled_links:
+            return graph + (np.frombuffer(uncrawled_sources, dtype=np.int32),
+                            np.frombuffer(uncrawled_targets, dtype=np.int64))
+
+        return graph
+
     """ Constructs the transition probability matrix """
     def construct_matrix(self, alpha):
+        # The dense matrix is only constructed for small graphs, so building sets from a link graph is affordable
+        url_references = self.url_references
+        if isinstance(url_references, LinkGraph):
+            url_references = url_references.to_references()
+
         # Get URLs that have been seen (not necessarily visited)
-        urls = self.url_references.keys()  # self.crawler.seen_urls
+        urls = url_references.keys()  # self.crawler.seen_urls
 
         # Maintain a mapping from URLs to their index
         url_to_idx = dict()
@@ -51,12 +320,12 @@ class PageRank:
         # For each URL, determine the possibility of transitioning and update the matrix
         for url in urls:
             # Ignore URLs which we do not have references for
-            if url not in self.url_references:
+            if url not in url_references:
                 continue
 
             # Get the references for this URL
             # Intersection used to get only references to URLs that we have visited
-            references = self.url_references[url].intersection(urls)
+            references = url_references[url].intersection(urls)
 
             # Row-wise construction depends on whether the page is dangling
             if not references:
@@ -0,0 +1,204 @@
+"""
+A document store holds the contents of crawled pages on disk, written as pages are fetched rather than kept in memory.
+Pages and the anchor text of links to them are appended as records to separate logs, each split into segments of
+bounded size. A directory holds:
+    pages-00000.seg, pages-00001.seg, ...       records of URL and page text
+    anchors-00000.seg, anchors-00001.seg, ...   records of URL and anchor text of a link to it
+A record is a header of the lengths of the URL and of the compressed text, followed by the URL and the text compressed
+with zlib. The offset of the latest page record of each URL is kept in memory, and is rebuilt from the headers when the
+store is reopened, such that a crawl can be resumed. A record cut short by a crash is discarded on reopening.
+"""
+
+import os
+import re
+import struct
+import threading
+import zlib
+
+_HEADER = struct.Struct('<II')
+
+
+class _RecordLog:
+    """ Append-only log of (URL, text) records, rotated into a new segment once a segment exceeds a size """
+    def __init__(self, path, prefix, segment_size, compression_level):
+        self.path = path
+        self.prefix = prefix
+        self.segment_size = segment_size
+        self.compression_level = compression_level
+
+        # Existing segments are appended to, starting from the last
+        pattern = re.compile(rf'{prefix}-(\d+)\.seg$')
+        segments = sorted(int(match.group(1)) for match in map(pattern.match, os.listdir(path)) if match)
+        self.num_segments = segments[-1] + 1 if segments else 1
+        self._file = None
+
+    def _segment_path(self, segment):
+        return os.path.join(self.path, f'{self.prefix}-{segment:05d}.seg')
+
+    def _open(self):
+        self._file = open(self._segment_path(self.num_segments - 1), 'ab')
+
+    def append(self, url, text):
+        """ Appends a record, returns the segment and offset it was written at """
+        if self._file is None:
+            self._open()
+        elif self._file.tell() >= self.segment_size:
+            self._file.close()
+            self.num_segments += 1
+            self._open()
+
+        url = url.encode()
+        compressed = zlib.compress(text.encode(), self.compression_level)
+        offset = self._file.tell()
+        self._file.write(_HEADER.pack(len(url), len(compressed)) + url + compressed)
+
+        return self.num_segments - 1, offset
+
+    def scan(self):
+        """ Yields the segment, offset and URL of every record, truncating a record cut short by a crash """
+        for segment in range(self.num_segments):
+            if not os.path.exists(self._segment_path(segment)):
+                continue
+
+            with open(self._segment_path(segment), 'r+b') as file:
+                size = os.fstat(file.fileno()).st_size
+                offset = 0
+                while offset < size:
+                    header = file.read(_HEADER.size)
+                    if len(header) < _HEADER.size:
+                        file.truncate(offset)
+                        break
+
+                    url_length, text_length = _HEADER.unpack(header)
+                    if offset + _HEADER.size + url_length + text_length > size:
+                        file.truncate(offset)
+                        break
+
+                    yield segment, offset, file.read(url_length).decode()
+                    file.seek(text_length, os.SEEK_CUR)
+                    offset = file.tell()
+
+    def records(self):
+        """ Yields the segment, offset, URL and text of every record in order, up to a record that is still written """
+        for segment in range(self.num_segments):
+            if not os.path.exists(self._segment_path(segment)):
+                continue
+
+            with open(self._segment_path(segment), 'rb') as file:
+                while True:
+                    offset = file.tell()
+                    header = file.read(_HEADER.size)
+                    if len(header) < _HEADER.size:
+                        break
+
+                    url_length, text_length = _HEADER.unpack(header)
+                    url, compressed = file.read(url_length), file.read(text_length)
+                    if len(compressed) < text_length:
+                        break
+
+                    yield segment, offset, url.decode(), zlib.decompress(compressed).decode()
+
+    def read(self, segment, offset):
+        with open(self._segment_path(segment), 'rb') as file:
+            file.seek(offset)
+            url_length, text_length = _HEADER.unpack(file.read(_HEADER.size))
+            file.seek(url_length, os.SEEK_CUR)
+
+            return zlib.decompress(file.read(text_length)).decode()
+
+    def flush(self):
+        if self._file:
+            self._file.flush()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+class DocumentStore:
+    # Default size in bytes at which a segment is closed and the next one started
+    DefaultSegmentSize = 64 * 1024 * 1024
+
+    # Compression is fast rather than small, as pages are written by crawler threads
+    DefaultCompressionLevel = 1
+
+    def __init__(self, path, segment_size=DefaultSegmentSize, compression_level=DefaultCompressionLevel):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+
+        # Pages and anchor texts are written by many crawler threads
+        self._lock = threading.Lock()
+        self._pages = _RecordLog(path, 'pages', segment_size, compression_level)
+        self._anchors = _RecordLog(path, 'anchors', segment_size, compression_level)
+
+        # Segment and offset of the latest page record of each URL, rebuilt from the records of a previous crawl
+        self._offsets = {url: (segment, offset) for segment, offset, url in self._pages.scan()}
+        self._num_anchors = sum(1 for _ in self._anchors.scan())
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __contains__(self, url):
+        return url in self._offsets
+
+    def __iter__(self):
+        return iter(list(self._offsets))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def add(self, url, contents):
+        """ Stores the contents of a page, replacing contents stored for the URL before """
+        with self._lock:
+            self._offsets[url] = self._pages.append(url, contents)
+
+    def add_anchor_text(self, url, anchor_text):
+        """ Stores the anchor text of a link to a URL, which becomes part of its contents """
+        with self._lock:
+            self._anchors.append(url, anchor_text)
+            self._num_anchors += 1
+
+    def get(self, url):
+        """ Returns the contents of a page, without the anchor text of links to it """
+        with self._lock:
+            self._pages.flush()
+            segment, offset = self._offsets[url]
+
+        return self._pages.read(segment, offset)
+
+    def items(self):
+        """
+        Yields pairs of URL and contents of every stored page, including the anchor text of links to it, in the order
+        that they were stored. Pages are read one at a time, while the anchor texts are read into memory beforehand.
+        """
+        self.flush()
+
+        anchor_texts = dict()
+        for _, _, url, anchor_text in self._anchors.records():
+            if url in self._offsets:
+                anchor_texts.setdefault(url, []).append(anchor_text)
+
+        for segment, offset, url, contents in self._pages.records():
+            # Skip contents that were replaced later
+            if self._offsets.get(url) != (segment, offset):
+                continue
+
+            yield url, ' '.join([contents] + anchor_texts.get(url, []))
+
+    def get_num_anchors(self):
+        return self._num_anchors
+
+    def flush(self):
+        """ Writes buffered records to disk """
+        with self._lock:
+            self._pages.flush()
+            self._anchors.flush()
+
+    def close(self):
+        with self._lock:
+            self._pages.close()
+            self._anchors.close()
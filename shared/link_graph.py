@@ -0,0 +1,229 @@
+"""
+A link graph stores the outgoing links of crawled URLs with URLs mapped to integer IDs.
+The outgoing links of a URL are a run of target IDs in a single append-only array, so recording links never creates
+per-URL containers. When saved, the graph is a directory holding:
+    urls.pkl        URLs, indexed by their ID
+    starts.npy      offset of the run of outgoing links of each URL into targets.npy, -1 if the URL is not crawled
+    ends.npy        end offset of the run of outgoing links of each URL
+    targets.npy     concatenated runs of target IDs
+Arrays are opened memory-mapped, so loading a graph does not rebuild Python containers for its links.
+"""
+
+import os
+import pickle
+import threading
+from array import array
+
+import numpy as np
+
+_URLS = 'urls.pkl'
+_STARTS = 'starts.npy'
+_ENDS = 'ends.npy'
+_TARGETS = 'targets.npy'
+
+
+def _current_runs(starts, ends):
+    """ Returns the IDs of crawled URLs, the length of their current runs and the positions of those runs' links """
+    crawled = np.flatnonzero(starts >= 0)
+    lengths = ends[crawled] - starts[crawled]
+
+    # Gather all runs at once rather than looping over URLs
+    run_offsets = np.cumsum(lengths) - lengths
+    positions = np.repeat(starts[crawled] - run_offsets, lengths) + np.arange(lengths.sum())
+
+    return crawled, lengths, positions
+
+
+class LinkGraph:
+    def __init__(self):
+        # URLs are assigned IDs densely from 0, both when crawled and when only linked to
+        self._urls = list()
+        self._url_ids = dict()
+
+        # Run of outgoing links for each URL ID
+        self._starts = array('q')
+        self._ends = array('q')
+        self._targets = array('i')
+
+        # Number of crawled URLs linking to each URL ID, maintained as links are recorded
+        self._in_degrees = array('i')
+        self._num_crawled = 0
+
+        # Links are recorded by many crawler threads
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._urls)
+
+    def __contains__(self, url):
+        return url in self._url_ids
+
+    def _add(self, url):
+        url_id = self._url_ids.get(url)
+        if url_id is None:
+            url_id = len(self._urls)
+            self._urls.append(url)
+            self._url_ids[url] = url_id
+            self._starts.append(-1)
+            self._ends.append(-1)
+            self._in_degrees.append(0)
+
+        return url_id
+
+    def _make_appendable(self):
+        # Memory-mapped arrays of a loaded graph are copied into arrays once links are recorded again
+        if not isinstance(self._targets, array):
+            self._starts = array('q', self._starts.tolist())
+            self._ends = array('q', self._ends.tolist())
+            self._targets = array('i', self._targets.tolist())
+            self._in_degrees = array('i', self._in_degrees.tolist())
+
+    def add_links(self, url, references):
+        """ Records the outgoing links of a crawled URL, replacing links recorded for it earlier """
+        with self._lock:
+            self._make_appendable()
+            url_id = self._add(url)
+            target_ids = [self._add(reference) for reference in references]
+
+            # The earlier run is left in place, but no longer counts towards in-degrees
+            if self._starts[url_id] < 0:
+                self._num_crawled += 1
+            else:
+                for target_id in self._targets[self._starts[url_id]:self._ends[url_id]]:
+                    self._in_degrees[target_id] -= 1
+
+            self._starts[url_id] = len(self._targets)
+            self._targets.extend(target_ids)
+            self._ends[url_id] = len(self._targets)
+
+            for target_id in target_ids:
+                self._in_degrees[target_id] += 1
+
+    def get(self, url_id):
+        return self._urls[url_id]
+
+    def get_id(self, url):
+        return self._url_ids.get(url)
+
+    def get_urls(self):
+        """ Get a list of all URLs, indexed by their ID """
+        return list(self._urls)
+
+    def num_crawled(self):
+        return self._num_crawled
+
+    def is_crawled(self, url):
+        url_id = self._url_ids.get(url)
+
+        return url_id is not None and self._starts[url_id] >= 0
+
+    def get_links(self, url):
+        """ Returns the URLs linked to by a crawled URL, None if it has not been crawled """
+        url_id = self._url_ids.get(url)
+        if url_id is None or self._starts[url_id] < 0:
+            return None
+
+        return [self._urls[target_id] for target_id in self._targets[self._starts[url_id]:self._ends[url_id]]]
+
+    def get_in_degree(self, url):
+        """ Returns the number of crawled URLs that link to a URL """
+        url_id = self._url_ids.get(url)
+
+        return 0 if url_id is None else int(self._in_degrees[url_id])
+
+    def to_references(self):
+        """ Returns a dictionary from crawled URLs to the set of URLs they link to """
+        return {url: set(self.get_links(url)) for url in self._urls if self.is_crawled(url)}
+
+    def _copy_runs(self):
+        """ Returns the current runs of crawled URLs as by _current_runs, along with the targets and the URLs """
+        # Arrays are copied, since other threads may resize them while recording links
+        with self._lock:
+            starts = np.array(self._starts, dtype=np.int64)
+            ends = np.array(self._ends, dtype=np.int64)
+            targets = np.array(self._targets, dtype=np.int32)
+            urls = list(self._urls)
+
+        return _current_runs(starts, ends) + (targets, urls)
+
+    def links(self):
+        """
+        Returns the current links as arrays of source and target URL IDs, grouped by source, along with the URL of each
+        ID. Unlike crawled_graph, links to URLs that are not crawled are included.
+        """
+        crawled, lengths, positions, targets, urls = self._copy_runs()
+
+        return np.repeat(crawled.astype(np.int32), lengths), targets[positions], urls
+
+    def crawled_graph(self, uncrawled_links=False):
+        """
+        Returns the graph between crawled URLs in CSR form, i.e. the outgoing links of node i are
+        indices[indptr[i]:indptr[i + 1]], along with the URL of each node.
+        Links to URLs that are not crawled are left out. With uncrawled_links set, those links are returned as well, as
+        arrays of source nodes and target URL IDs.
+        """
+        crawled, lengths, positions, targets, urls = self._copy_runs()
+
+        # Number crawled URLs densely, in order of their URL ID
+        node_ids = np.full(len(urls), -1, dtype=np.int32)
+        node_ids[crawled] = np.arange(len(crawled), dtype=np.int32)
+
+        sources = np.repeat(np.arange(len(crawled)), lengths)
+        nodes = node_ids[targets[positions]]
+
+        # Runs stay grouped by source, so removing links to uncrawled URLs keeps the CSR order
+        linked = nodes >= 0
+        indptr = np.concatenate(([0], np.cumsum(np.bincount(sources[linked], minlength=len(crawled)))))
+        graph = indptr, nodes[linked], [urls[url_id] for url_id in crawled.tolist()]
+
+        if uncrawled_links:
+            return graph + (sources[~linked].astype(np.int32), targets[positions][~linked])
+
+        return graph
+
+    def save(self, path):
+        """ Writes the graph to a directory at the given path """
+        os.makedirs(path, exist_ok=True)
+
+        # Arrays are copied under the lock and written outside it, such that links can be recorded meanwhile
+        with self._lock:
+            urls = list(self._urls)
+            starts = np.array(self._starts, dtype=np.int64)
+            ends = np.array(self._ends, dtype=np.int64)
+            targets = np.array(self._targets, dtype=np.int32)
+
+        with open(os.path.join(path, _URLS), 'wb') as file:
+            pickle.dump(urls, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+        np.save(os.path.join(path, _STARTS), starts)
+        np.save(os.path.join(path, _ENDS), ends)
+        np.save(os.path.join(path, _TARGETS), targets)
+
+    @classmethod
+    def load(cls, path):
+        """ Opens a graph previously saved to path """
+        graph = cls()
+
+        with open(os.path.join(path, _URLS), 'rb') as file:
+            graph._urls = pickle.load(file)
+        graph._url_ids = {url: url_id for url_id, url in enumerate(graph._urls)}
+
+        graph._starts = np.load(os.path.join(path, _STARTS), mmap_mode='r')
+        graph._ends = np.load(os.path.join(path, _ENDS), mmap_mode='r')
+        graph._targets = np.load(os.path.join(path, _TARGETS), mmap_mode='r')
+
+        # In-degrees only count the current run of each crawled URL
+        crawled, _, positions = _current_runs(graph._starts, graph._ends)
+        graph._in_degrees = np.bincount(graph._targets[positions], minlength=len(graph._urls)).astype(np.int32)
+        graph._num_crawled = len(crawled)
+
+        return graph
+
+    @classmethod
+    def from_references(cls, url_references):
+        """ Builds a graph from a dictionary from crawled URLs to the set of URLs they link to """
+        graph = cls()
+        for url, references in url_references.items():
+            graph.add_links(url, references)
+
+        return graph
@@ -0,0 +1,121 @@
+import asyncio
+import threading
+from tempfile import TemporaryDirectory
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase
+
+from webcrawling.async_crawler import AsyncCrawler
+
+
+class SiteHandler(BaseHTTPRequestHandler):
+    """ Serves pages 0 to 19 linking to the next two pages, on whichever host they are requested from """
+    Pages = 20
+    Robots = 'User-agent: *\nDisallow: /private\n'
+
+    def do_GET(self):
+        if self.path == '/robots.txt':
+            self.respond(self.Robots, 'text/plain')
+        elif self.path.startswith('/page'):
+            page = int(self.path[len('/page'):])
+            links = ''.join(f'<a href="/page{target}">page {target}</a>' for target in (2 * page + 1, 2 * page + 2)
+                            if target < self.Pages)
+            self.respond(f'<html><body><p>contents of {page}</p>{links}<a href="/private">private</a></body></html>',
+                         'text/html')
+        else:
+            self.send_error(404)
+
+    def respond(self, body, content_type):
+        body = body.encode()
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class AsyncCrawlerTests(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), SiteHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        # The same site is served under two hosts
+        port = self.server.server_address[1]
+        self.hosts = [f'127.0.0.1:{port}', f'localhost:{port}']
+        self.documents_directory = TemporaryDirectory()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.documents_directory.cleanup()
+
+    def crawl(self, seeds, max_pages):
+        crawler = AsyncCrawler(concurrency=10, delay=0, documents_path=self.documents_directory.name)
+        asyncio.run(asyncio.wait_for(crawler.crawl(seeds, max_pages=max_pages), timeout=30))
+
+        return crawler
+
+    def test_crawls_site(self):
+        crawler = self.crawl([f'http://{self.hosts[0]}/page0'], SiteHandler.Pages)
+
+        self.assertEqual(SiteHandler.Pages, crawler.num_fetched)
+        self.assertIn('contents of 19', crawler.documents.get(f'http://{self.hosts[0]}/page19'))
+        self.assertEqual({f'http://{self.hosts[0]}/{page}' for page in ('page1', 'page2', 'private')},
+                         set(crawler.link_graph.get_links(f'http://{self.hosts[0]}/page0')))
+
+    def test_respects_robots(self):
+        crawler = self.crawl([f'http://{self.hosts[0]}/page0'], SiteHandler.Pages)
+
+        self.assertNotIn(f'http://{self.hosts[0]}/private', crawler.documents)
+        self.assertFalse(crawler.link_graph.is_crawled(f'http://{self.hosts[0]}/private'))
+
+    def test_multiple_hosts(self):
+        crawler = self.crawl([f'http://{host}/page0' for host in self.hosts], 2 * SiteHandler.Pages)
+
+        for host in self.hosts:
+            self.assertTrue(crawler.link_graph.is_crawled(f'http://{host}/page19'))
+
+    def test_push_host_from_thread(self):
+        crawler = AsyncCrawler(concurrency=1, delay=0, documents_path=self.documents_directory.name)
+        releasing_threads = []
+
+        class Semaphore(asyncio.Semaphore):
+            def release(self):
+                releasing_threads.append(threading.current_thread())
+                super().release()
+
+        async def push():
+            loop = asyncio.get_running_loop()
+            crawler._loop = loop
+            crawler._hosts_in_heap = Semaphore(0)
+
+            await loop.run_in_executor(None, crawler.push_host, self.hosts[0])
+            await asyncio.wait_for(crawler._hosts_in_heap.acquire(), timeout=5)
+
+        # Hosts pushed by other threads release the semaphore on the event loop
+        asyncio.run(push())
+        self.assertEqual([threading.main_thread()], releasing_threads)
+
+    def test_empty_heap(self):
+        crawler = AsyncCrawler(concurrency=1, delay=0, documents_path=self.documents_directory.name)
+
+        async def crawl():
+            crawler.crawling = True
+            crawler._loop = asyncio.get_running_loop()
+
+            # The semaphore counts a host which is not on the heap
+            crawler._hosts_in_heap = asyncio.Semaphore(1)
+            worker = asyncio.ensure_future(crawler._crawl())
+            await asyncio.sleep(AsyncCrawler.StopCheckInterval * 3)
+            stopped = worker.done()
+
+            crawler.crawling = False
+            worker.cancel()
+            await asyncio.gather(worker, return_exceptions=True)
+
+            return stopped, crawler._hosts_in_heap.locked()
+
+        # The worker keeps waiting for hosts, and gives back the slot it acquired
+        self.assertEqual((False, False), asyncio.run(crawl()))
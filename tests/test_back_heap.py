@@ -1,3 +1,5 @@
+import threading
+import time
 import unittest
 
 from webcrawling.back_heap import BackHeap
@@ -24,3 +26,47 @@ class BackHeapTests(unittest.TestCase):
     def test_pop_empty(self):
         heap = BackHeap()
         self.assertIsNone(heap.pop_host())
+
+    def test_membership(self):
+        heap = BackHeap()
+        heap.push_host(self.SampleHost)
+        self.assertIn(self.SampleHost, heap)
+        self.assertEqual(1, len(heap))
+
+        heap.pop_host()
+        self.assertNotIn(self.SampleHost, heap)
+        self.assertIn(self.SampleHost, heap.history)
+
+    def test_blocking_pop(self):
+        heap = BackHeap()
+        threading.Timer(0.05, heap.push_host, args=(self.SampleHost, False)).start()
+        self.assertEqual((0, self.SampleHost), heap.pop_host(block=True, timeout=5))
+
+    def test_blocking_pop_timeout(self):
+        heap = BackHeap()
+        start = time.monotonic()
+        self.assertIsNone(heap.pop_host(block=True, timeout=0.05))
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+
+    def test_crawl_delay(self):
+        heap = BackHeap(delay=1000)
+        heap.set_crawl_delay(self.SampleHost, 5)
+        self.assertEqual(5000, heap.get_delay(self.SampleHost))
+        self.assertEqual(1000, heap.get_delay('other.com'))
+
+        heap.push_host(self.SampleHost)
+        self.assertGreater(heap.pop_host()[0], 4)
+
+    def test_response_time_delay(self):
+        heap = BackHeap(delay=1000, response_time_factor=10, max_response_delay=20000)
+
+        # Fast responses do not lower the delay below the default
+        heap.record_response(self.SampleHost, 0.01)
+        self.assertEqual(1000, heap.get_delay(self.SampleHost))
+
+        # The delay follows a moving average of response times
+        heap.record_response(self.SampleHost, 1.01)
+        self.assertAlmostEqual(3100, heap.get_delay(self.SampleHost))
+
+        heap.record_response(self.SampleHost, 100)
+        self.assertEqual(20000, heap.get_delay(self.SampleHost))
@@ -0,0 +1,129 @@
+import asyncio
+import os
+import threading
+import time
+from collections import Counter
+from http.server import ThreadingHTTPServer
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from tests.test_async_crawler import SiteHandler
+from webcrawling.async_crawler import AsyncCrawler
+
+
+class CountingSiteHandler(SiteHandler):
+    """ Serves the same site, counting requests by path """
+    Requests = Counter()
+
+    def do_GET(self):
+        self.Requests[self.path] += 1
+        super().do_GET()
+
+
+class CheckpointTests(TestCase):
+    def setUp(self):
+        CountingSiteHandler.Requests.clear()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), CountingSiteHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.host = f'127.0.0.1:{self.server.server_address[1]}'
+
+        self.directory = TemporaryDirectory()
+        self.documents_path = os.path.join(self.directory.name, 'documents')
+        self.checkpoint_path = os.path.join(self.directory.name, 'checkpoint')
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.directory.cleanup()
+
+    def crawler(self):
+        return AsyncCrawler(concurrency=1, delay=0, documents_path=self.documents_path)
+
+    def crawl(self, crawler, seeds, max_pages):
+        asyncio.run(asyncio.wait_for(crawler.crawl(seeds, max_pages=max_pages), timeout=30))
+
+    def test_resume(self):
+        crawler = self.crawler()
+        self.crawl(crawler, [f'http://{self.host}/page0'], 8)
+        crawler.save_checkpoint(self.checkpoint_path)
+        crawler.documents.close()
+
+        resumed = self.crawler()
+        self.assertTrue(resumed.load_checkpoint(self.checkpoint_path))
+        self.assertEqual(8, resumed.link_graph.num_crawled())
+        self.assertIn(f'http://{self.host}/page0', resumed.seen_urls)
+        self.assertEqual(crawler.num_requests, resumed.num_requests)
+
+        self.crawl(resumed, [], SiteHandler.Pages - 8)
+
+        # Every page is stored, and neither pages nor robots.txt were fetched again after resuming
+        self.assertEqual(SiteHandler.Pages, len(resumed.documents))
+        self.assertEqual(SiteHandler.Pages, resumed.link_graph.num_crawled())
+        self.assertEqual(1, CountingSiteHandler.Requests['/robots.txt'])
+        self.assertEqual({1}, {count for path, count in CountingSiteHandler.Requests.items() if path != '/robots.txt'})
+
+    def test_resume_waiting_for_robots(self):
+        crawler = self.crawler()
+        release = threading.Event()
+        crawler.robots.fetch = lambda host: release.wait(timeout=5) and None
+
+        # The seed waits for robots.txt when the checkpoint is taken
+        crawler.queue_raw_url(f'http://{self.host}/page0')
+        crawler.save_checkpoint(self.checkpoint_path)
+        release.set()
+        crawler.robots.close()
+        crawler.documents.close()
+
+        # Robots.txt is fetched again by a thread of the cache, which pushes the host once crawling has started
+        resumed = self.crawler()
+        fetch_robots = resumed.robots.fetch
+
+        def fetch(host):
+            time.sleep(0.5)
+            return fetch_robots(host)
+
+        resumed.robots.fetch = fetch
+        self.assertTrue(resumed.load_checkpoint(self.checkpoint_path))
+        self.crawl(resumed, [], SiteHandler.Pages)
+
+        self.assertEqual(SiteHandler.Pages, len(resumed.documents))
+        self.assertFalse(resumed.fetching)
+
+    def test_spilled_front_queues(self):
+        crawler = self.crawler()
+        for queue in crawler.front_queues.values():
+            queue.segment_size = 2
+
+        urls = {f'http://{self.host}/page{i}' for i in range(20)}
+        for url in urls:
+            crawler.add_to_frontier(url)
+        crawler.save_checkpoint(self.checkpoint_path)
+        crawler.documents.close()
+
+        # Spilled segments are kept in the checkpoint, and every URL is restored from them
+        front_queues_path = os.path.join(self.checkpoint_path, AsyncCrawler.FrontQueuesDirectory)
+        self.assertTrue(any(os.listdir(os.path.join(front_queues_path, priority))
+                            for priority in os.listdir(front_queues_path)))
+
+        resumed = self.crawler()
+        self.assertTrue(resumed.load_checkpoint(self.checkpoint_path))
+        self.assertEqual(urls, {resumed.pick_from_front() for _ in range(20)})
+        self.assertIsNone(resumed.pick_from_front())
+
+    def test_replace_checkpoint(self):
+        crawler = self.crawler()
+        self.crawl(crawler, [f'http://{self.host}/page0'], 4)
+        crawler.save_checkpoint(self.checkpoint_path)
+
+        # The number of pages to stop at counts those fetched before
+        self.crawl(crawler, [], 8)
+        crawler.save_checkpoint(self.checkpoint_path)
+
+        self.assertEqual({'checkpoint', 'documents'}, set(os.listdir(self.directory.name)))
+
+        resumed = self.crawler()
+        self.assertTrue(resumed.load_checkpoint(self.checkpoint_path))
+        self.assertEqual(8, resumed.link_graph.num_crawled())
+
+    def test_no_checkpoint(self):
+        self.assertFalse(self.crawler().load_checkpoint(self.checkpoint_path))
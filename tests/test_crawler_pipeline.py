@@ -0,0 +1,73 @@
+import threading
+import time
+from http.server import ThreadingHTTPServer
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from tests.test_async_crawler import SiteHandler
+from webcrawling.back_heap import BackHeap
+from webcrawling.crawler import Crawler
+
+
+class CrawlerPipelineTests(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), SiteHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.host = f'127.0.0.1:{self.server.server_address[1]}'
+        self.documents_directory = TemporaryDirectory()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.documents_directory.cleanup()
+
+    def crawler(self, **kwargs):
+        crawler = Crawler(threads=4, documents_path=self.documents_directory.name, **kwargs)
+        crawler.back_heap = BackHeap(delay=0)
+
+        return crawler
+
+    def test_crawls_site(self):
+        crawler = self.crawler(parsers=1, parse_queue_size=2)
+        crawler.queue_raw_url(f'http://{self.host}/page0')
+        crawler.start_crawlers()
+        try:
+            deadline = time.monotonic() + 30
+            while (crawler.num_parsed < SiteHandler.Pages or crawler.fetching) and time.monotonic() < deadline:
+                time.sleep(0.1)
+        finally:
+            crawler.stop_crawlers()
+
+        # Every page went through both stages, and was saved by the parsing stage
+        self.assertEqual(SiteHandler.Pages, crawler.num_fetched)
+        self.assertEqual(SiteHandler.Pages, crawler.num_parsed)
+        self.assertEqual(SiteHandler.Pages, len(crawler.documents))
+        self.assertIn('contents of 19', crawler.documents.get(f'http://{self.host}/page19'))
+        self.assertFalse(crawler.fetching)
+
+        fetch_rate, parse_rate, num_waiting, _ = crawler.get_stage_stats()
+        self.assertGreater(fetch_rate, 0)
+        self.assertGreater(parse_rate, 0)
+        self.assertEqual(0, num_waiting)
+
+    def test_backpressure(self):
+        crawler = self.crawler(parsers=0, parse_queue_size=1)
+        crawler.crawling = True
+
+        # Fetching waits while the parse queue is full, and hands the page over once there is room
+        self.assertTrue(crawler.fetch_url(f'http://{self.host}/page0'))
+        fetcher = threading.Thread(target=crawler.fetch_url, args=(f'http://{self.host}/page1',))
+        fetcher.start()
+
+        fetcher.join(timeout=1.5)
+        self.assertTrue(fetcher.is_alive())
+        self.assertEqual(2, crawler.num_fetched)
+
+        url, _, _ = crawler.parse_queue.get()
+        fetcher.join(timeout=5)
+        self.assertFalse(fetcher.is_alive())
+        self.assertEqual(f'http://{self.host}/page0', url)
+        self.assertEqual(f'http://{self.host}/page1', crawler.parse_queue.get()[0])
+        self.assertGreater(crawler.get_stage_stats()[3], 1)
+
+        crawler.stop_crawlers()
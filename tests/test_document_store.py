@@ -0,0 +1,84 @@
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from shared.document_store import DocumentStore
+
+
+class DocumentStoreTests(TestCase):
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.path = self.directory.name
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_add(self):
+        with DocumentStore(self.path) as store:
+            store.add('a', 'contents of a')
+            store.add('b', 'contents of b')
+
+            self.assertEqual(2, len(store))
+            self.assertIn('a', store)
+            self.assertNotIn('c', store)
+            self.assertEqual('contents of b', store.get('b'))
+            self.assertEqual([('a', 'contents of a'), ('b', 'contents of b')], list(store.items()))
+
+    def test_anchor_text(self):
+        with DocumentStore(self.path) as store:
+            store.add('a', 'contents of a')
+            store.add_anchor_text('a', 'link to a')
+            store.add_anchor_text('c', 'link to c')
+
+            # Anchor text of links to pages that are not stored is not part of any contents
+            self.assertEqual([('a', 'contents of a link to a')], list(store.items()))
+            self.assertEqual('contents of a', store.get('a'))
+
+    def test_replace(self):
+        with DocumentStore(self.path) as store:
+            store.add('a', 'old contents')
+            store.add('b', 'contents of b')
+            store.add('a', 'new contents')
+
+            self.assertEqual([('b', 'contents of b'), ('a', 'new contents')], list(store.items()))
+
+    def test_segments(self):
+        with DocumentStore(self.path, segment_size=100) as store:
+            for i in range(50):
+                store.add(f'page{i}', f'contents of page {i} ' * 10)
+
+            self.assertGreater(len([name for name in os.listdir(self.path) if name.startswith('pages')]), 1)
+            self.assertEqual([(f'page{i}', f'contents of page {i} ' * 10) for i in range(50)], list(store.items()))
+            self.assertEqual('contents of page 49 ' * 10, store.get('page49'))
+
+    def test_resume(self):
+        with DocumentStore(self.path, segment_size=100) as store:
+            for i in range(10):
+                store.add(f'page{i}', f'contents of page {i}')
+            store.add_anchor_text('page0', 'link')
+
+        with DocumentStore(self.path, segment_size=100) as store:
+            self.assertEqual(10, len(store))
+            self.assertEqual(1, store.get_num_anchors())
+            store.add('page10', 'contents of page 10')
+            store.add('page0', 'new contents of page 0')
+
+            documents = dict(store.items())
+            self.assertEqual(11, len(documents))
+            self.assertEqual('new contents of page 0 link', documents['page0'])
+
+    def test_truncated_record(self):
+        with DocumentStore(self.path) as store:
+            store.add('a', 'contents of a')
+            store.add('b', 'contents of b')
+
+        # A crash while writing the last record leaves it cut short
+        segment = os.path.join(self.path, 'pages-00000.seg')
+        with open(segment, 'r+b') as file:
+            file.truncate(os.path.getsize(segment) - 3)
+
+        with DocumentStore(self.path) as store:
+            self.assertEqual([('a', 'contents of a')], list(store.items()))
+
+            store.add('b', 'contents of b')
+            self.assertEqual([('a', 'contents of a'), ('b', 'contents of b')], list(store.items()))
@@ -0,0 +1,102 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase
+
+from webcrawling.http_client import HttpClient
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    """ Serves a page with an ETag over persistent HTTP/1.1 connections """
+    protocol_version = 'HTTP/1.1'
+    ETag = '"version1"'
+
+    def do_GET(self):
+        if self.headers.get('If-None-Match') == self.ETag:
+            self.send_response(304)
+            self.send_header('ETag', self.ETag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+            return
+
+        body = b'<html><body>page</body></html>'
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        if self.path != '/unversioned':
+            self.send_header('ETag', self.ETag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class HttpClientTests(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_reuses_connections(self):
+        client = HttpClient()
+        for page in range(10):
+            self.assertEqual(200, client.get(f'{self.base_url}/page{page}').status_code)
+
+        num_requests, num_connections, reuse_ratio, median_latency, _ = client.get_stats()
+        self.assertEqual(10, num_requests)
+        self.assertEqual(1, num_connections)
+        self.assertAlmostEqual(0.9, reuse_ratio)
+        self.assertIsNotNone(median_latency)
+
+    def test_shared_between_threads(self):
+        client = HttpClient()
+        client.get(f'{self.base_url}/first')
+
+        # A host visited by another thread later still uses the kept-alive connection
+        thread = threading.Thread(target=client.get, args=(f'{self.base_url}/second',))
+        thread.start()
+        thread.join()
+
+        self.assertEqual(1, client.get_stats()[1])
+
+    def test_conditional_get(self):
+        client = HttpClient(max_validators=10)
+
+        self.assertEqual(200, client.get(f'{self.base_url}/page').status_code)
+        self.assertEqual(304, client.get(f'{self.base_url}/page').status_code)
+        self.assertEqual(200, client.get(f'{self.base_url}/unversioned').status_code)
+        self.assertEqual(200, client.get(f'{self.base_url}/unversioned').status_code)
+        self.assertEqual(1, client.get_stats()[4])
+
+    def test_validators_bounded(self):
+        # Without a bound nothing is kept, as pages are not fetched again
+        client = HttpClient()
+        client.get(f'{self.base_url}/page')
+        self.assertEqual(200, client.get(f'{self.base_url}/page').status_code)
+
+        # The least recently fetched URL is forgotten first
+        client = HttpClient(max_validators=1)
+        client.get(f'{self.base_url}/page')
+        client.get(f'{self.base_url}/other')
+        self.assertEqual(200, client.get(f'{self.base_url}/page').status_code)
+        self.assertEqual(304, client.get(f'{self.base_url}/page').status_code)
+
+    def test_idle_eviction(self):
+        client = HttpClient(idle_timeout=0.1)
+        client.get(f'{self.base_url}/page')
+        time.sleep(0.2)
+
+        # Visiting another host closes the connection to the idle one, so visiting that again opens a new connection
+        client.get(f'http://localhost:{self.server.server_address[1]}/page')
+        client.get(f'{self.base_url}/unversioned')
+
+        # The counts of the closed connection are kept
+        num_requests, num_connections, _, _, _ = client.get_stats()
+        self.assertEqual(3, num_requests)
+        self.assertEqual(3, num_connections)
@@ -1,6 +1,9 @@
+import math
+import os
+from tempfile import TemporaryDirectory
 from unittest import TestCase
 
-from indexing.indexer import Indexer
+from indexing.indexer import Indexer, UrlVocabulary
 from querying.boolean.boolean_query import BooleanQuery
 
 
@@ -14,6 +17,10 @@ class IndexerTests(TestCase):
     def test_frequency_null(self):
         self.assertEqual(2, self.indexer.term_dict.get_tf("test", 0))
 
+    def test_registered(self):
+        self.assertEqual({0, 1}, self.indexer.url_vocabulary.get_document_ids())
+        self.assertAlmostEqual(math.log10(2), self.indexer.term_dict.get_idf('ander'))
+
     def test_and(self):
         self.assertIn(0, BooleanQuery(self.indexer, 'anders AND langballe').get_matches())
 
@@ -31,3 +38,215 @@ class IndexerTests(TestCase):
 
     def test_contradiction(self):
         self.assertEqual(0, len(BooleanQuery(self.indexer, "anders AND NOT anders").get_matches()))
+
+
+class SegmentTests(TestCase):
+    def setUp(self):
+        self.indexer = Indexer()
+        self.indexer.index_corpus({'a': 'My name is Anders Langballe Jakobsen. This is a test, test.',
+                                   'b': 'This is a unit test for my reverse index implementation'})
+        self.indexer.term_dict.update_champions(r=1)
+
+        self.directory = TemporaryDirectory()
+        self.indexer.save(self.directory.name)
+        self.loaded = Indexer.load(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_frequency(self):
+        self.assertEqual(2, self.loaded.term_dict.get_tf('test', 0))
+
+    def test_unseen_word(self):
+        self.assertEqual(0, self.loaded.term_dict.get_tf('unseen', 0))
+
+    def test_documents(self):
+        self.assertEqual({0, 1}, self.loaded.term_dict.get_documents_with_term('test'))
+
+    def test_urls(self):
+        self.assertEqual('b', self.loaded.url_vocabulary.get(1))
+
+    def test_document_lengths(self):
+        for document in range(2):
+            self.assertAlmostEqual(self.indexer.term_dict.get_document_length(document),
+                                   self.loaded.term_dict.get_document_length(document))
+
+    def test_champions(self):
+        self.assertEqual(self.indexer.term_dict.get_champions('test'), self.loaded.term_dict.get_champions('test'))
+
+    def test_index_text(self):
+        self.loaded.index_text('Another test of a loaded index', 2, url='c')
+
+        self.assertEqual({0, 1, 2}, self.loaded.term_dict.get_documents_with_term('test'))
+        self.assertEqual(1, self.loaded.term_dict.get_tf('anoth', 2))
+        self.assertEqual(2, self.loaded.url_vocabulary.get_id('c'))
+        self.assertEqual(0, self.loaded.term_dict.get_idf('test'))
+        self.assertGreater(self.loaded.term_dict.get_document_length(2), 0)
+
+        # The segment is unchanged until the index is saved again
+        self.assertEqual({0, 1}, Indexer.load(self.directory.name).term_dict.get_documents_with_term('test'))
+
+
+class SpimiTests(TestCase):
+    Corpus = {'a': 'My name is Anders Langballe Jakobsen. This is a test, test.',
+              'b': 'This is a unit test for my reverse index implementation',
+              'c': 'Another test of the index, which is flushed to disk in small blocks'}
+
+    def setUp(self):
+        self.in_memory = Indexer()
+        self.in_memory.index_corpus(self.Corpus)
+
+        # A tiny budget makes every document its own block
+        self.flushed = Indexer()
+        self.flushed.index_corpus(iter(self.Corpus.items()), memory_budget=1)
+
+    def test_same_postings(self):
+        for term in ['test', 'index', 'anders', 'block']:
+            self.assertEqual(self.in_memory.term_dict.get_documents_with_term(term),
+                             self.flushed.term_dict.get_documents_with_term(term))
+
+    def test_frequency(self):
+        self.assertEqual(2, self.flushed.term_dict.get_tf('test', 0))
+
+    def test_document_lengths(self):
+        for document in range(3):
+            self.assertAlmostEqual(self.in_memory.term_dict.get_document_length(document),
+                                   self.flushed.term_dict.get_document_length(document))
+
+    def test_streamed_to_segment(self):
+        # Enough documents for several blocks of postings per term
+        corpus = {f'doc{i}': ' '.join(['test'] * (i % 4 + 1) + ['index'] * (i % 3) + [f'word{i % 7}'])
+                  for i in range(300)}
+        in_memory = Indexer()
+        in_memory.index_corpus(corpus)
+
+        with TemporaryDirectory() as directory:
+            streamed = Indexer()
+            streamed.index_corpus(corpus, memory_budget=1000, path=directory)
+
+            for term in ['test', 'index', 'word3']:
+                self.assertEqual(in_memory.term_dict.get_documents_with_term(term),
+                                 streamed.term_dict.get_documents_with_term(term))
+                self.assertEqual(in_memory.term_dict.get_idf(term), streamed.term_dict.get_idf(term))
+                self.assertEqual(list(in_memory.term_dict.get_block_max_scores(term)),
+                                 list(streamed.term_dict.get_block_max_scores(term)))
+
+            for document in range(300):
+                self.assertEqual(in_memory.term_dict.get_document_length(document),
+                                 streamed.term_dict.get_document_length(document))
+
+            # The segment opens the same way as a saved one
+            self.assertEqual(in_memory.term_dict.get_documents_with_term('word3'),
+                             Indexer.load(directory).term_dict.get_documents_with_term('word3'))
+
+
+class ParallelIndexingTests(TestCase):
+    def test_identical_to_serial(self):
+        serial = Indexer()
+        serial.index_corpus(SpimiTests.Corpus)
+
+        parallel = Indexer()
+        parallel.index_corpus(SpimiTests.Corpus, workers=2, shard_size=1)
+
+        for term in ['test', 'index', 'anders', 'block']:
+            self.assertEqual(serial.term_dict.get_documents_with_term(term),
+                             parallel.term_dict.get_documents_with_term(term))
+
+        for document in range(3):
+            self.assertEqual(serial.term_dict.get_document_length(document),
+                             parallel.term_dict.get_document_length(document))
+
+
+class UrlVocabularyTests(TestCase):
+    def setUp(self):
+        self.vocabulary = UrlVocabulary()
+        self.vocabulary.add('a')
+        self.vocabulary.add('b')
+
+    def test_existing(self):
+        self.assertEqual(0, self.vocabulary.add('a'))
+        self.assertEqual(2, len(self.vocabulary))
+
+    def test_lookup(self):
+        self.assertEqual('b', self.vocabulary.get(1))
+        self.assertEqual(1, self.vocabulary.get_id('b'))
+        self.assertIsNone(self.vocabulary.get(2))
+
+    def test_document_ids(self):
+        self.assertEqual({0, 1}, self.vocabulary.get_document_ids())
+        self.vocabulary.add('c')
+        self.assertEqual({0, 1, 2}, self.vocabulary.get_document_ids())
+
+    def test_register(self):
+        self.vocabulary.register(3, 'd')
+        self.assertEqual(['a', 'b', None, 'd'], self.vocabulary.get_urls())
+
+        # A replaced URL no longer maps to the document ID, and a URL cannot be registered for two document IDs
+        self.vocabulary.register(1, 'c')
+        self.assertIsNone(self.vocabulary.get_id('b'))
+        self.assertEqual(1, self.vocabulary.get_id('c'))
+        self.assertRaises(ValueError, self.vocabulary.register, 2, 'a')
+        self.assertIsNone(self.vocabulary.get(2))
+
+    def test_save_load(self):
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'urls.pkl')
+            self.vocabulary.save(path)
+
+            loaded = UrlVocabulary()
+            loaded.load(path)
+
+        self.assertEqual(['a', 'b'], loaded.get_urls())
+        self.assertEqual(1, loaded.get_id('b'))
+
+
+class ChampionTests(TestCase):
+    def setUp(self):
+        self.indexer = Indexer()
+        self.indexer.index_corpus({'a': 'test', 'b': 'test test test', 'c': 'test test', 'd': 'test test'})
+        self.indexer.term_dict.update_champions(r=3)
+
+    def test_order(self):
+        self.assertEqual([1, 2, 3], self.indexer.term_dict.get_champions('test'))
+
+    def test_shorter(self):
+        self.indexer.term_dict.update_champions(r=2)
+        self.assertEqual([1, 2], self.indexer.term_dict.get_champions('test'))
+
+    def test_longer(self):
+        self.indexer.term_dict.update_champions(r=2)
+        self.indexer.term_dict.update_champions(r=10)
+        self.assertEqual([1, 2, 3, 0], self.indexer.term_dict.get_champions('test'))
+
+    def test_saved(self):
+        with TemporaryDirectory() as directory:
+            self.indexer.save(directory)
+            loaded = Indexer.load(directory)
+            loaded.term_dict.update_champions(r=1)
+
+            self.assertEqual([1], loaded.term_dict.get_champions('test'))
+
+
+class StaticScoreTests(TestCase):
+    def setUp(self):
+        self.indexer = Indexer()
+        self.indexer.index_corpus({'a': 'test', 'b': 'test test', 'c': 'test', 'd': 'other'})
+        self.indexer.set_static_scores({'a': 0.1, 'b': 0.4, 'c': 0.2, 'unknown': 0.3}, num_tiers=2)
+
+    def test_scores(self):
+        self.assertEqual([0.25, 1, 0.5, 0], self.indexer.term_dict.get_static_scores([0, 1, 2, 3]).tolist())
+
+    def test_tiered_postings(self):
+        doc_ids, tfs, offsets = self.indexer.term_dict.get_tiered_postings('test')
+
+        self.assertEqual([1, 2, 0], doc_ids.tolist())
+        self.assertEqual([2, 1, 1], tfs.tolist())
+        self.assertEqual([0, 2, 3], offsets.tolist())
+
+    def test_saved(self):
+        with TemporaryDirectory() as directory:
+            self.indexer.save(directory)
+            loaded = Indexer.load(directory)
+
+            self.assertEqual([0.25, 1, 0.5, 0], loaded.term_dict.get_static_scores([0, 1, 2, 3]).tolist())
+            self.assertEqual([1, 2, 0], loaded.term_dict.get_tiered_postings('test')[0].tolist())
@@ -0,0 +1,73 @@
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from shared.link_graph import LinkGraph
+
+
+class LinkGraphTests(TestCase):
+    References = {'a': {'b', 'c'},
+                  'b': {'c', 'unseen'},
+                  'c': {'a'},
+                  'd': set()}
+
+    def test_links(self):
+        graph = LinkGraph.from_references(self.References)
+
+        self.assertEqual(set(graph.get_links('a')), {'b', 'c'})
+        self.assertEqual(graph.get_links('d'), [])
+        self.assertIsNone(graph.get_links('unseen'))
+
+    def test_crawled(self):
+        graph = LinkGraph.from_references(self.References)
+
+        self.assertEqual(len(graph), 5)
+        self.assertEqual(graph.num_crawled(), 4)
+        self.assertTrue(graph.is_crawled('d'))
+        self.assertFalse(graph.is_crawled('unseen'))
+        self.assertIn('unseen', graph)
+
+    def test_in_degree(self):
+        graph = LinkGraph.from_references(self.References)
+
+        self.assertEqual(graph.get_in_degree('c'), 2)
+        self.assertEqual(graph.get_in_degree('unseen'), 1)
+        self.assertEqual(graph.get_in_degree('d'), 0)
+        self.assertEqual(graph.get_in_degree('unknown'), 0)
+
+    def test_replace_links(self):
+        graph = LinkGraph.from_references(self.References)
+        graph.add_links('a', {'d'})
+
+        self.assertEqual(graph.get_links('a'), ['d'])
+        self.assertEqual(graph.get_in_degree('c'), 1)
+        self.assertEqual(graph.get_in_degree('d'), 1)
+        self.assertEqual(graph.to_references(), {**self.References, 'a': {'d'}})
+
+    def test_crawled_graph(self):
+        graph = LinkGraph.from_references(self.References)
+        indptr, indices, urls = graph.crawled_graph()
+
+        # Links to URLs that are not crawled are left out
+        self.assertEqual(len(urls), 4)
+        self.assertEqual(len(indptr), 5)
+        self.assertEqual({urls[idx]: {urls[target] for target in indices[indptr[idx]:indptr[idx + 1]]}
+                          for idx in range(len(urls))},
+                         {**self.References, 'b': {'c'}})
+
+    def test_save_load(self):
+        graph = LinkGraph.from_references(self.References)
+        graph.add_links('a', {'d'})
+
+        with TemporaryDirectory() as path:
+            graph.save(path)
+            loaded = LinkGraph.load(path)
+
+            self.assertEqual(loaded.to_references(), graph.to_references())
+            self.assertEqual(loaded.get_in_degree('d'), 1)
+            self.assertEqual(loaded.num_crawled(), 4)
+
+            # Links can be recorded after loading
+            loaded.add_links('e', {'a'})
+            self.assertEqual(loaded.get_links('e'), ['a'])
+            self.assertEqual(loaded.get_in_degree('a'), 2)
+            del loaded
@@ -0,0 +1,78 @@
+from unittest import TestCase
+
+from ranking.pagerank import PageRank
+from shared.link_graph import LinkGraph
+
+
+class PageRankTests(TestCase):
+    References = {'a': {'b', 'c'},
+                  'b': {'c'},
+                  'c': {'a', 'unseen'},
+                  'd': {'c'},
+                  'e': set()}
+
+    def test_sparse_matches_dense(self):
+        # Sparse and dense iteration take different steps, so both converge closely to compare them
+        sparse = dict(PageRank(self.References).rank(tolerance=1e-10))
+        dense = dict(PageRank(self.References).rank(dense=True, tolerance=1e-10))
+
+        self.assertEqual(sparse.keys(), dense.keys())
+        for url in dense:
+            self.assertAlmostEqual(sparse[url], dense[url])
+
+    def test_link_graph(self):
+        references = dict(PageRank(self.References).rank())
+        graph = dict(PageRank(LinkGraph.from_references(self.References)).rank())
+
+        self.assertEqual(references.keys(), graph.keys())
+        for url in references:
+            self.assertAlmostEqual(references[url], graph[url])
+
+    def test_distribution(self):
+        ranks = PageRank(self.References).rank()
+
+        self.assertAlmostEqual(sum(score for _, score in ranks), 1)
+        self.assertEqual(ranks[0][0], 'c')
+
+    def test_unknown_references_ignored(self):
+        self.assertNotIn('unseen', dict(PageRank(self.References).rank()))
+
+    def test_empty(self):
+        self.assertEqual(PageRank(dict()).rank(), [])
+
+    def test_warm_start(self):
+        page_rank = PageRank({url: set(references) for url, references in self.References.items()})
+        page_rank.rank()
+        cold_iterations = page_rank.iterations
+
+        # Ranking an unchanged graph again starts at its stationary distribution
+        page_rank.rank()
+        self.assertLess(page_rank.iterations, cold_iterations)
+        self.assertLess(page_rank.residual, 1e-6)
+
+    def test_update(self):
+        page_rank = PageRank({url: set(references) for url, references in self.References.items()})
+        page_rank.rank()
+        updated = dict(page_rank.update({'f': {'a'}, 'e': {'f'}}))
+
+        references = {url: set(references) for url, references in self.References.items()}
+        references.update({'f': {'a'}, 'e': {'f'}})
+        recomputed = dict(PageRank(references).rank())
+
+        self.assertEqual(updated.keys(), recomputed.keys())
+        for url in recomputed:
+            self.assertAlmostEqual(updated[url], recomputed[url], places=5)
+
+    def test_update_extends_graph(self):
+        references = {url: set(references) for url, references in self.References.items()}
+        for url_references in (references, LinkGraph.from_references(references)):
+            page_rank = PageRank(url_references)
+            page_rank.rank(tolerance=1e-10)
+
+            # 'unseen' was linked to before being crawled, and 'b' gets another link
+            updated = dict(page_rank.update({'unseen': {'d'}, 'b': {'e'}}, tolerance=1e-10))
+            recomputed = dict(PageRank(url_references).rank(tolerance=1e-10))
+
+            self.assertEqual(updated.keys(), recomputed.keys())
+            for url in recomputed:
+                self.assertAlmostEqual(updated[url], recomputed[url])
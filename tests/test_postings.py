@@ -0,0 +1,54 @@
+from unittest import TestCase
+
+from indexing.postings import BlockSize, CompressedPostings, vbyte_decode, vbyte_encode
+
+
+class VariableByteTests(TestCase):
+    def test_round_trip(self):
+        values = [0, 1, 127, 128, 16383, 16384, 2 ** 31]
+        self.assertEqual(values, vbyte_decode(vbyte_encode(values)).tolist())
+
+    def test_long_round_trip(self):
+        values = list(range(0, 100000, 97))
+        self.assertEqual(values, vbyte_decode(vbyte_encode(values)).tolist())
+
+    def test_single_byte(self):
+        self.assertEqual(3, len(vbyte_encode([0, 5, 127])))
+
+
+class CompressedPostingsTests(TestCase):
+    def setUp(self):
+        # Spans several blocks such that skipping is used
+        self.doc_ids = list(range(3, BlockSize * 5, 2))
+        self.tfs = [doc % 7 + 1 for doc in self.doc_ids]
+        self.postings = CompressedPostings(self.doc_ids, self.tfs)
+
+    def test_length(self):
+        self.assertEqual(len(self.doc_ids), len(self.postings))
+
+    def test_arrays(self):
+        self.assertEqual(self.doc_ids, self.postings.doc_ids().tolist())
+        self.assertEqual(self.tfs, self.postings.tfs().tolist())
+
+    def test_lookup(self):
+        for doc, tf in zip(self.doc_ids, self.tfs):
+            self.assertEqual(tf, self.postings[doc])
+
+    def test_missing(self):
+        self.assertNotIn(0, self.postings)
+        self.assertNotIn(4, self.postings)
+        self.assertNotIn(BlockSize * 5, self.postings)
+        self.assertEqual(0, self.postings.get(4, 0))
+
+    def test_blocks(self):
+        self.assertEqual(self.doc_ids[BlockSize - 1::BlockSize] + self.doc_ids[-1:], self.postings.block_last().tolist())
+
+        # Only the selected blocks are decoded, with document IDs relative to the blocks before them
+        doc_ids, tfs = self.postings.get_blocks([0, 2])
+        self.assertEqual(self.doc_ids[:BlockSize] + self.doc_ids[2 * BlockSize:3 * BlockSize], doc_ids.tolist())
+        self.assertEqual(self.tfs[:BlockSize] + self.tfs[2 * BlockSize:3 * BlockSize], tfs.tolist())
+
+    def test_from_dict(self):
+        postings = CompressedPostings.from_dict({9: 1, 2: 4})
+        self.assertEqual([2, 9], list(postings))
+        self.assertEqual(4, postings[2])
@@ -0,0 +1,96 @@
+import os
+from collections import Counter
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from shared.link_graph import LinkGraph
+from webcrawling.crawler import Crawler
+from webcrawling.prioritizer import Prioritizer
+
+
+class PrioritizerTests(TestCase):
+    def test_signals(self):
+        prioritizer = Prioritizer(8)
+        url = 'http://example.com/a/b'
+
+        self.assertGreater(prioritizer.get_score(url, in_degree=20), prioritizer.get_score(url, in_degree=2))
+        self.assertGreater(prioritizer.get_score(url, anchor_text='annual report'), prioritizer.get_score(url))
+        self.assertGreater(prioritizer.get_score('http://example.com/'), prioritizer.get_score(url))
+
+        prioritizer.host_ranks = {'example.com': 1}
+        self.assertGreater(prioritizer.get_score(url), prioritizer.get_score('http://other.com/a/b'))
+
+    def test_priority(self):
+        prioritizer = Prioritizer(4)
+
+        self.assertEqual(3, prioritizer.get_priority('http://example.com/', in_degree=1000, anchor_text='a b c d e f'))
+        self.assertEqual(0, prioritizer.get_priority('http://example.com/a/b/c/d/e/f/g'))
+
+    def test_rank_hosts(self):
+        graph = LinkGraph.from_references({'http://a.com/': {'http://b.com/', 'http://a.com/x'},
+                                           'http://a.com/x': {'http://b.com/y'},
+                                           'http://c.com/': {'http://b.com/'},
+                                           'http://b.com/': {'http://d.com/'}})
+        prioritizer = Prioritizer(8)
+        prioritizer.rank_hosts(graph)
+
+        # Hosts linked to by other hosts rank highest, including hosts that are not crawled
+        self.assertEqual({'a.com', 'b.com', 'c.com', 'd.com'}, set(prioritizer.host_ranks))
+        self.assertEqual(1, max(prioritizer.host_ranks.values()))
+        self.assertGreater(prioritizer.host_ranks['b.com'], prioritizer.host_ranks['a.com'])
+        self.assertGreater(prioritizer.host_ranks['d.com'], prioritizer.host_ranks['c.com'])
+
+    def test_rank_hosts_again(self):
+        graph = LinkGraph.from_references({'http://a.com/': {'http://b.com/'}})
+        prioritizer = Prioritizer(8)
+        prioritizer.rank_hosts(graph)
+        self.assertGreater(prioritizer.host_ranks['b.com'], prioritizer.host_ranks['a.com'])
+
+        # Links found since the last ranking are included, as are the hosts of the new URLs
+        graph.add_links('http://b.com/', {'http://c.com/x', 'http://c.com/y', 'http://b.com/z'})
+        graph.add_links('http://d.com/', {'http://c.com/'})
+        prioritizer.rank_hosts(graph)
+        self.assertEqual({'a.com', 'b.com', 'c.com', 'd.com'}, set(prioritizer.host_ranks))
+        self.assertEqual(1, prioritizer.host_ranks['c.com'])
+
+        # A replaced graph is ranked from scratch
+        prioritizer.rank_hosts(LinkGraph.from_references({'http://e.com/': {'http://f.com/'}}))
+        self.assertEqual({'e.com', 'f.com'}, set(prioritizer.host_ranks))
+
+
+class FrontQueueTests(TestCase):
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        self.crawler = Crawler(threads=1, num_front_queues=4,
+                               documents_path=os.path.join(self.directory.name, 'documents'))
+
+    def tearDown(self):
+        self.crawler.documents.close()
+        self.directory.cleanup()
+
+    def test_empty(self):
+        self.assertIsNone(self.crawler.pick_from_front())
+
+    def test_valuable_first(self):
+        valuable = {f'http://valuable.com/{i}' for i in range(100)}
+        deep = {f'http://example.com/a/b/c/d/e/f/{i}' for i in range(100)}
+
+        # Valuable URLs are on a highly ranked host and linked to by many crawled pages, while deep URLs are not
+        self.crawler.prioritizer.host_ranks = {'valuable.com': 1}
+        for i in range(100):
+            self.crawler.link_graph.add_links(f'http://other.com/{i}', valuable)
+
+        for url in deep:
+            self.crawler.add_to_frontier(url)
+        for url in valuable:
+            self.crawler.add_to_frontier(url, anchor_text='front page of the site')
+
+        # Valuable URLs are mostly picked first, but deep URLs are not starved
+        picked = [self.crawler.pick_from_front() for _ in range(100)]
+        counts = Counter('valuable' if url in valuable else 'deep' for url in picked)
+        self.assertGreater(counts['valuable'], 75)  # 8 to 1 odds of the highest and lowest priority
+        self.assertGreater(counts['deep'], 0)
+
+        picked += [self.crawler.pick_from_front() for _ in range(100)]
+        self.assertEqual(valuable | deep, set(picked))
+        self.assertIsNone(self.crawler.pick_from_front())
@@ -1,17 +1,20 @@
+from collections import Counter
 from unittest import TestCase
 
 from indexing.indexer import Indexer
 from querying.boolean.boolean_query import BooleanQuery
+from querying.free_text_query import FreeTextQuery
 from ranking.content_ranker import ContentRanker
+from shared.tokenizer import tokenize
 
 
 class RankerTests(TestCase):
     def setUp(self):
-        indexer = Indexer()
+        self.indexer = indexer = Indexer()
 
         # Add "URLs" to vocabulary
-        for _ in range(3):
-            indexer.url_vocabulary.add(None)
+        for url in ('twice', 'thrice', 'once'):
+            indexer.url_vocabulary.add(url)
 
         indexer.index_text("This text mentions iPhone twice. iPhone.", 0)
         indexer.index_text("This text mentions iPhone thrice. iPhone, iphone! It should have the highest rank.", 1)
@@ -20,8 +23,112 @@ class RankerTests(TestCase):
         self.query = BooleanQuery(indexer, "iphone")
 
     def test_simple_order(self):
-        rank_iterator = ContentRanker(self.query).top(3)
+        rank_iterator = iter(ContentRanker(self.query).top(3))
+        url_id = self.indexer.url_vocabulary.get_id
 
-        self.assertEqual(1, next(rank_iterator))
-        self.assertEqual(0, next(rank_iterator))
-        self.assertEqual(2, next(rank_iterator))
+        # Scores are normalized by document length, where rare terms weigh most. Document 2 only has terms found in
+        # every document, while "thrice", "highest" and "rank" of document 1 and "twice" of document 0 lengthen those,
+        # so the share of iPhone in document 2 is the largest
+        self.assertEqual(2, url_id(next(rank_iterator)[0]))
+        self.assertEqual(1, url_id(next(rank_iterator)[0]))
+        self.assertEqual(0, url_id(next(rank_iterator)[0]))
+
+    def test_document_without_url(self):
+        # Documents added to the term dictionary directly have a docId beyond the URL vocabulary
+        self.indexer.term_dict.add_document(3, Counter(tokenize('iPhone')))
+
+        self.assertEqual(4, len(ContentRanker(self.query).top(4)))
+        self.assertIn(None, [url for url, _ in ContentRanker(self.query, pruning=None).top(4)])
+
+
+class WandTests(TestCase):
+    def setUp(self):
+        self.indexer = Indexer()
+        self.indexer.index_corpus({f'doc{i}': ' '.join(['iphone'] * (i % 5 + 1) + ['android'] * (i % 3) + ['phone'] * i)
+                                   for i in range(300)})
+
+    def assert_same_top(self, query, k):
+        exhaustive = ContentRanker(FreeTextQuery(self.indexer, query), pruning=None).top(k)
+        wand = ContentRanker(FreeTextQuery(self.indexer, query), pruning=ContentRanker.WandPruning)
+        self.assertEqual(exhaustive, wand.top(k))
+
+        return wand
+
+    def test_single_term(self):
+        self.assert_same_top('android', 10)
+
+    def test_multiple_terms(self):
+        self.assert_same_top('iphone android phone', 10)
+
+    def test_all_documents(self):
+        self.assert_same_top('iphone android', 1000)
+
+    def test_skips_postings(self):
+        wand = self.assert_same_top('iphone android phone', 5)
+        self.assertLess(wand.postings_evaluated, 3 * 300)
+
+
+class ChampionTests(TestCase):
+    def setUp(self):
+        self.indexer = Indexer()
+        self.indexer.index_corpus({f'doc{i}': ' '.join(['iphone'] * (i % 5 + 1) + ['android'] * (i % 3) + ['phone'] * i)
+                                   for i in range(300)})
+        self.indexer.term_dict.update_champions(r=10)
+
+    def test_only_champions_scored(self):
+        ranker = ContentRanker(FreeTextQuery(self.indexer, 'iphone android'), pruning=ContentRanker.ChampionPruning)
+        champions = {self.indexer.url_vocabulary.get(doc)
+                     for term in ('iphon', 'android') for doc in self.indexer.term_dict.get_champions(term)}
+
+        # Only the postings of the champions of each term are scored
+        top = ranker.top(100)
+        self.assertEqual(20, ranker.postings_evaluated)
+        self.assertEqual(champions, {url for url, _ in top})
+
+    def test_without_champions(self):
+        self.indexer.term_dict.set_champions(dict(), 0)
+        ranker = ContentRanker(FreeTextQuery(self.indexer, 'android'), pruning=ContentRanker.ChampionPruning)
+
+        self.assertEqual(ContentRanker(FreeTextQuery(self.indexer, 'android'), pruning=None).top(10), ranker.top(10))
+
+
+class StaticScoreTests(TestCase):
+    def setUp(self):
+        self.indexer = Indexer()
+        self.indexer.index_corpus({f'doc{i}': ' '.join(['iphone'] * (i % 5 + 1) + ['android'] * (i % 3) + ['phone'] * i)
+                                   for i in range(300)})
+
+        # Static scores favour later documents, which the cosine score does not
+        self.indexer.set_static_scores({f'doc{i}': i * i for i in range(300)})
+
+    def rank(self, query, k, pruning, static_weight=0.5):
+        ranker = ContentRanker(FreeTextQuery(self.indexer, query), pruning=pruning, content_weight=1 - static_weight,
+                               static_weight=static_weight)
+
+        return ranker, ranker.top(k)
+
+    def test_scaled(self):
+        self.assertEqual(1, self.indexer.term_dict.get_static_scores([299])[0])
+
+    def test_combined(self):
+        _, top = self.rank('android', 3, None)
+        cosine = dict(ContentRanker(FreeTextQuery(self.indexer, 'android'), pruning=None).top(300))
+
+        for url, score in top:
+            static = int(url[3:]) ** 2 / 299 ** 2
+            self.assertAlmostEqual(score, 0.5 * cosine[url] + 0.5 * static)
+
+    def test_tiers_same_top(self):
+        for query, k in (('android', 10), ('iphone android phone', 10), ('iphone android', 1000)):
+            for static_weight in (0.5, 0.8):
+                self.assertEqual(self.rank(query, k, None, static_weight)[1],
+                                 self.rank(query, k, ContentRanker.TierPruning, static_weight)[1])
+
+    def test_tiers_stop_early(self):
+        ranker, _ = self.rank('iphone android phone', 5, ContentRanker.TierPruning, static_weight=0.8)
+        self.assertLess(ranker.postings_evaluated,
+                        sum(len(self.indexer.term_dict.get_postings(term)) for term in ('iphon', 'android', 'phone')))
+
+    def test_wand_rejected(self):
+        with self.assertRaises(ValueError):
+            ContentRanker(FreeTextQuery(self.indexer, 'android'), pruning=ContentRanker.WandPruning, static_weight=0.5)
@@ -0,0 +1,95 @@
+import threading
+import time
+from unittest import TestCase
+
+from webcrawling.robots_cache import RobotsCache
+
+
+class RobotsCacheTests(TestCase):
+    Robots = 'User-agent: *\nDisallow: /private\n'
+
+    def setUp(self):
+        self.fetched_hosts = []
+        self.queued = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def fetch(self, host):
+        self.release.wait()
+        self.fetched_hosts.append(host)
+
+        return self.Robots
+
+    def on_fetched(self, host, parser, urls):
+        self.queued.extend((host, url, parser.can_access(url)) for url in urls)
+
+    def test_fetches_once(self):
+        cache = RobotsCache(self.fetch, on_fetched=self.on_fetched)
+        self.release.clear()
+
+        # Every thread finding the host has its URL wait for the same fetch
+        threads = [threading.Thread(target=cache.request, args=('host', f'/page{i}')) for i in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertIsNone(cache.get('host'))
+        self.release.set()
+
+        self.assertFalse(cache.wait('host').can_access('/private'))
+        self.assertEqual(['host'], self.fetched_hosts)
+        self.assertEqual({('host', f'/page{i}', True) for i in range(20)}, set(self.queued))
+
+    def test_cached(self):
+        cache = RobotsCache(self.fetch, on_fetched=self.on_fetched)
+        cache.wait('host')
+
+        self.assertFalse(cache.request('host', '/private').can_access('/private'))
+        self.assertEqual(['host'], self.fetched_hosts)
+        self.assertEqual([], self.queued)
+
+    def test_expiry(self):
+        cache = RobotsCache(self.fetch, ttl=0.05)
+        parser = cache.wait('host')
+        time.sleep(0.1)
+
+        # The expired parser is used while it is fetched again
+        self.assertIsNone(cache.get('host'))
+        self.assertIs(parser, cache.request('host'))
+
+        while cache.get('host') is None:
+            time.sleep(0.01)
+
+        self.assertEqual(['host', 'host'], self.fetched_hosts)
+
+    def test_eviction(self):
+        cache = RobotsCache(self.fetch, max_hosts=2)
+        cache.put('first', None)
+        cache.put('second', None)
+
+        # The first host has been looked up since it was added, so the second is evicted instead
+        cache.get('first')
+        cache.put('third', None)
+
+        self.assertEqual(2, len(cache))
+        self.assertIn('first', cache)
+        self.assertNotIn('second', cache)
+
+    def test_failed_fetch(self):
+        def fetch(host):
+            raise ConnectionError(host)
+
+        self.assertTrue(RobotsCache(fetch).wait('host').can_access('/private'))
+
+    def test_lock(self):
+        lock = threading.Lock()
+        locked = []
+        cache = RobotsCache(self.fetch, on_fetched=lambda host, parser, urls: locked.append(lock.locked()), lock=lock)
+
+        # The waiting URLs are passed on while holding the lock of the caller
+        cache.request('host', '/page')
+        while not locked:
+            time.sleep(0.01)
+
+        self.assertEqual([True], locked)
@@ -0,0 +1,84 @@
+from unittest import TestCase
+
+from webcrawling.parser.robots_parser import RobotsParser, get_robots_path
+
+robots = '''
+# Comments are ignored
+User-agent: *
+Disallow: /private
+Allow: /private/public
+Disallow: /*.pdf$
+Disallow: /search*q=
+Allow: /page
+Disallow: /page
+Crawl-delay: 2.5
+
+User-agent: Googlebot
+User-agent: Bingbot
+Disallow: /ajax/  # Trailing comment
+Allow: /ajax/allowed
+
+user-agent: strictbot
+disallow: /
+allow: /*.html$
+'''
+
+parser = RobotsParser(robots)
+
+
+class RobotsParserTests(TestCase):
+    def test_disallow_prefix(self):
+        self.assertFalse(parser.can_access('/private'))
+        self.assertFalse(parser.can_access('/private/page'))
+        self.assertTrue(parser.can_access('/public'))
+        self.assertTrue(parser.can_access(''))
+
+    def test_longest_match(self):
+        self.assertTrue(parser.can_access('/private/public/page'))
+        self.assertFalse(parser.can_access('/private/publi'))
+
+    def test_allow_wins_tie(self):
+        self.assertTrue(parser.can_access('/page/1'))
+
+    def test_wildcards(self):
+        self.assertFalse(parser.can_access('/files/report.pdf'))
+        self.assertTrue(parser.can_access('/files/report.pdf.html'))
+        self.assertFalse(parser.can_access('/search?lang=en&q=robots'))
+        self.assertTrue(parser.can_access('/search?lang=en'))
+
+    def test_query_strings(self):
+        query_parser = RobotsParser('User-agent: *\nDisallow: /*?sort=\nDisallow: /*.php$\n')
+
+        # Rules are matched against the path and query of a URL
+        self.assertEqual('/list?sort=asc', get_robots_path('http://example.com/list?sort=asc#top'))
+        self.assertEqual('', get_robots_path('http://example.com'))
+        self.assertFalse(query_parser.can_access(get_robots_path('http://example.com/list?sort=asc')))
+        self.assertTrue(query_parser.can_access(get_robots_path('http://example.com/list')))
+        self.assertTrue(query_parser.can_access(get_robots_path('http://example.com/a.php?id=1')))
+        self.assertFalse(query_parser.can_access(get_robots_path('http://example.com/a.php')))
+
+    def test_wildcard_and_plain_rules(self):
+        self.assertTrue(parser.can_access('/private/public/report.pdf'))
+        self.assertTrue(parser.can_access('/index.html', 'strictbot'))
+        self.assertFalse(parser.can_access('/index.htm', 'strictbot'))
+
+    def test_group_of_agents(self):
+        for agent in ('Googlebot', 'bingbot'):
+            self.assertFalse(parser.can_access('/ajax/call', agent))
+            self.assertTrue(parser.can_access('/ajax/allowed', agent))
+
+            # An agent with its own group does not follow the rules of any agent
+            self.assertTrue(parser.can_access('/private', agent))
+
+    def test_unknown_agent(self):
+        self.assertFalse(parser.can_access('/private', 'Friendly Crawler'))
+
+    def test_crawl_delay(self):
+        self.assertEqual(2.5, parser.get_crawl_delay())
+        self.assertEqual(2.5, parser.get_crawl_delay('Friendly Crawler'))
+        self.assertIsNone(parser.get_crawl_delay('Googlebot'))
+
+    def test_empty(self):
+        self.assertTrue(RobotsParser().can_access('/private'))
+        self.assertTrue(RobotsParser('User-agent: *\nDisallow:\n').can_access('/private'))
+        self.assertIsNone(RobotsParser().get_crawl_delay())
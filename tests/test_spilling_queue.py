@@ -0,0 +1,103 @@
+import os
+import threading
+from queue import Empty
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from webcrawling.spilling_queue import SpillingQueue
+
+
+class SpillingQueueTests(TestCase):
+    def test_order(self):
+        queue = SpillingQueue(segment_size=10)
+        for item in range(95):
+            queue.put(item)
+        self.assertEqual(95, queue.qsize())
+
+        # Interleaving puts and gets keeps the order of every item
+        taken = [queue.get() for _ in range(50)]
+        for item in range(95, 120):
+            queue.put(item)
+        taken += [queue.get() for _ in range(70)]
+
+        self.assertEqual(list(range(120)), taken)
+        self.assertTrue(queue.empty())
+
+    def test_spills(self):
+        with TemporaryDirectory() as path:
+            queue = SpillingQueue(path=path, segment_size=10)
+            for item in range(100):
+                queue.put(item)
+
+            # The head and the tail stay in memory, the rest is in segments on disk
+            self.assertEqual(9, len(os.listdir(path)))
+            self.assertLessEqual(len(queue._head) + len(queue._tail), 20)
+
+            with queue.mutex:
+                self.assertEqual(list(range(100)), queue.items())
+
+            for item in range(100):
+                self.assertEqual(item, queue.get_nowait())
+            self.assertEqual([], os.listdir(path))
+
+    def test_prefetch(self):
+        queue = SpillingQueue(segment_size=10)
+        for item in range(30):
+            queue.put(item)
+
+        # The oldest segment is read once half of the head is taken, and used when the head runs empty
+        taken = [queue.get_nowait() for _ in range(5)]
+        self.assertEqual(list(range(10, 20)), queue._prefetch[1].result())
+
+        taken += [queue.get_nowait() for _ in range(25)]
+        self.assertEqual(list(range(30)), taken)
+        self.assertIsNone(queue._prefetch)
+
+    def test_empty(self):
+        queue = SpillingQueue(segment_size=10)
+        self.assertRaises(Empty, queue.get_nowait)
+        self.assertRaises(Empty, queue.get, timeout=0.01)
+
+    def test_blocking_get(self):
+        queue = SpillingQueue(segment_size=10)
+        threading.Timer(0.05, queue.put, args=('url',)).start()
+        self.assertEqual('url', queue.get(timeout=5))
+
+    def test_checkpoint(self):
+        with TemporaryDirectory() as path:
+            queue = SpillingQueue(segment_size=10)
+            for item in range(95):
+                queue.put(item)
+            queue.get()
+
+            # Spilled segments are linked rather than read, and stay in the checkpoint once the queue removes them
+            state = queue.checkpoint(path)
+            self.assertEqual(8, len(os.listdir(path)))
+            self.assertEqual(list(range(1, 10)), state['head'])
+            self.assertEqual(list(range(90, 95)), state['tail'])
+
+            for _ in range(94):
+                queue.get()
+            self.assertEqual(8, len(os.listdir(path)))
+
+            # Restored items are appended after those already queued
+            restored = SpillingQueue(segment_size=10)
+            for item in range(3):
+                restored.put(item)
+            restored.restore(path, state)
+            restored.put(95)
+
+            self.assertEqual(98, restored.qsize())
+            self.assertEqual(list(range(3)) + list(range(1, 96)), [restored.get_nowait() for _ in range(98)])
+            self.assertTrue(restored.empty())
+            self.assertEqual(8, len(os.listdir(path)))
+
+    def test_stale_segments(self):
+        with TemporaryDirectory() as path:
+            queue = SpillingQueue(path=path, segment_size=10)
+            for item in range(30):
+                queue.put(item)
+
+            # A queue starting from the same path does not read the segments left there
+            self.assertTrue(SpillingQueue(path=path, segment_size=10).empty())
+            self.assertEqual([], os.listdir(path))
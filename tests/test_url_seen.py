@@ -0,0 +1,64 @@
+import threading
+from unittest import TestCase
+
+from webcrawling.url_seen import UrlBloomFilter, UrlSeenSet
+
+
+class UrlSeenSetTests(TestCase):
+    def test_add(self):
+        seen = UrlSeenSet()
+        self.assertTrue(seen.add('http://a.com/page'))
+        self.assertFalse(seen.add('http://a.com/page'))
+        self.assertTrue(seen.add('http://a.com/other'))
+
+        self.assertIn('http://a.com/page', seen)
+        self.assertNotIn('http://b.com/page', seen)
+        self.assertEqual(2, len(seen))
+
+    def test_grow(self):
+        seen = UrlSeenSet()
+        urls = [f'http://host{i % 100}.com/{i}' for i in range(3 * UrlSeenSet.InitialSlots)]
+        for url in urls:
+            self.assertTrue(seen.add(url))
+
+        self.assertEqual(len(urls), len(seen))
+        self.assertTrue(all(url in seen for url in urls))
+        self.assertFalse(any(seen.add(url) for url in urls))
+        self.assertLess(seen.get_memory_usage() / len(urls), 8 / UrlSeenSet.MaxLoad * 2)
+
+    def test_concurrent_add(self):
+        seen = UrlSeenSet()
+        added = []
+
+        # Every thread adds the same URLs, which must each be reported as new exactly once
+        def add_all():
+            added.extend(url for url in (f'http://a.com/{i}' for i in range(20000)) if seen.add(url))
+
+        threads = [threading.Thread(target=add_all) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(20000, len(added))
+        self.assertEqual(20000, len(set(added)))
+
+
+class UrlBloomFilterTests(TestCase):
+    def test_add(self):
+        seen = UrlBloomFilter(1000)
+        self.assertTrue(seen.add('http://a.com/page'))
+        self.assertFalse(seen.add('http://a.com/page'))
+        self.assertIn('http://a.com/page', seen)
+        self.assertEqual(1, len(seen))
+
+    def test_false_positive_rate(self):
+        seen = UrlBloomFilter(10000, false_positive_rate=0.01)
+        for i in range(10000):
+            seen.add(f'http://a.com/{i}')
+
+        # No false negatives, and false positives near the rate the filter was sized for
+        self.assertTrue(all(f'http://a.com/{i}' in seen for i in range(10000)))
+        false_positives = sum(f'http://b.com/{i}' in seen for i in range(10000))
+        self.assertLess(false_positives, 200)
+        self.assertLess(seen.get_memory_usage(), 10000 * 1.5)
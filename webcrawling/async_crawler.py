@@ -0,0 +1,243 @@
+import asyncio
+import time
+from urllib.parse import urlparse
+
+import aiohttp
+from loguru import logger
+
+from webcrawling.back_heap import BackHeap
+from webcrawling.crawler import Crawler, normalize_url, parse_page
+from webcrawling.parser.robots_parser import get_robots_path
+
+
+class AsyncCrawler(Crawler):
+    """
+    Crawler which multiplexes fetches on a single asyncio event loop, rather than blocking a thread per fetch.
+    URLs go through the same front queues, back queues and back heap as with the threaded crawler, so each host is
+    still only visited by one worker at a time and with the same delay between visits.
+    """
+    # Seconds between checks of whether crawling has been stopped, e.g. by stop_crawlers from another thread
+    StopCheckInterval = 0.1
+
+    # Connections are kept alive between the visits of a host, which are at least the politeness delay apart
+    ConnectionsPerHost = 2
+    KeepAliveTimeout = 30
+
+    def __init__(self, concurrency=1000, num_front_queues=Crawler.DefaultFrontQueues, delay=3000, timeout=5,
+                 documents_path='documents', prioritizer=None, parsers=Crawler.DefaultParsers):
+        super().__init__(threads=concurrency, num_front_queues=num_front_queues, documents_path=documents_path,
+                         prioritizer=prioritizer, parsers=parsers)
+        self.back_heap = BackHeap(delay=delay)
+        self.timeout = timeout
+
+        # Pending fetches of robots.txt by host, such that concurrent workers finding a new host only fetch it once
+        self._robots_fetches = dict()
+
+        # The session holding the connection pool, and the number of hosts in the back heap, which only exist while
+        # crawling. Workers wait on the latter rather than polling the back heap when other workers hold every host
+        self._session = None
+        self._loop = None
+        self._hosts_in_heap = None
+
+        # Number of parsed pages at which to stop crawling
+        self.max_pages = None
+
+    async def request_url_async(self, url):
+        start = asyncio.get_running_loop().time()
+        async with self._session.get(url) as response:
+            # The delay before the host is visited again adapts to how long it took to respond
+            self.back_heap.record_response(urlparse(url).netloc, asyncio.get_running_loop().time() - start)
+
+            # If we were redirected, we can also say that this URL has been crawled
+            self.seen_urls.add(normalize_url(str(response.url)))
+
+            if response.status != 200:
+                return None, str(response.url)
+
+            # Check if content is text/html
+            content_type = response.headers.get('Content-Type', None)
+            if not content_type or 'text' not in content_type:
+                return None, str(response.url)
+
+            return await response.text(errors='replace'), str(response.url)
+
+    async def get_robots_parser_async(self, host):
+        parser = self.robots.get(host)
+        if parser:
+            return parser
+
+        fetch = self._robots_fetches.get(host)
+        if fetch is None:
+            fetch = self._robots_fetches[host] = asyncio.ensure_future(self._fetch_robots(host))
+
+        return await fetch
+
+    async def _fetch_robots(self, host):
+        try:
+            response, _ = await self.request_url_async(f'http://{host}/robots.txt')
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            response = None
+
+        # Robots.txt is fetched on the event loop, so the cache only stores it rather than fetching it in threads
+        parser = self.robots.put(host, response)
+        del self._robots_fetches[host]
+
+        crawl_delay = parser.get_crawl_delay(self.UserAgent)
+        if crawl_delay is not None:
+            self.back_heap.set_crawl_delay(host, crawl_delay)
+
+        return parser
+
+    async def queue_raw_url_async(self, url, anchor_text=''):
+        # If we have seen this URL, discard it
+        if url in self.seen_urls:
+            return
+
+        host = urlparse(url).netloc
+
+        # Check if we can visit this URL, without blocking other workers while robots.txt is fetched
+        robots_parser = await self.get_robots_parser_async(host)
+
+        # The URL is only marked as seen once robots.txt is fetched, and at once with queueing it, such that a
+        # snapshot taken meanwhile does not find it seen but in no queue
+        with self.lock:
+            if self.mark_seen(url) and robots_parser.can_access(get_robots_path(url), user_agent=self.UserAgent):
+                self.queue_allowed_url(url, host, anchor_text)
+
+    async def queue_urls(self, urls):
+        """ Queues URLs, or a dictionary from URLs to anchor text, fetching robots.txt of their hosts concurrently """
+        anchor_texts = urls if isinstance(urls, dict) else dict.fromkeys(urls, '')
+        await asyncio.gather(*(self.queue_raw_url_async(url, anchor_text) for url, anchor_text in anchor_texts.items()))
+
+    async def fetch_url_async(self, url):
+        """ Fetches a URL, performs parsing of it, passes to indexer and saves outgoing links """
+        try:
+            self.num_requests += 1
+
+            # Get contents of extracted URL
+            text, url = await self.request_url_async(url)
+            if not text or not url:
+                logger.error(f'Failed to get {url}')
+
+                return False
+
+            self.num_fetched += 1
+
+            # Parsing is CPU bound, so it is done by the parser processes to keep the event loop serving other fetches
+            # Workers wait for their page to be parsed, so at most one page per worker waits for the parsers
+            page = await asyncio.get_running_loop().run_in_executor(self.parse_pool, parse_page, text, url)
+            if not page:
+                logger.error(f'Could not parse {url}')
+
+                return False
+
+            hyperlinks, contents = page
+            self.record_page(url, hyperlinks, contents)
+            self.num_parsed += 1
+
+            # Add hyperlinks to URL frontier
+            await self.queue_urls(hyperlinks)
+        except Exception as e:
+            logger.error(f'Worker exception: {e}')
+            return False
+
+        return True
+
+    def push_host(self, host):
+        pushed = super().push_host(host)
+
+        # The semaphore must be released on the event loop, while hosts are also pushed by threads of the robots.txt
+        # cache, e.g. when URLs restored from a checkpoint waited for robots.txt
+        hosts_in_heap = self._hosts_in_heap
+        if pushed and hosts_in_heap:
+            if self._in_loop():
+                hosts_in_heap.release()
+            else:
+                self._loop.call_soon_threadsafe(hosts_in_heap.release)
+
+        return pushed
+
+    def _in_loop(self):
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    async def _crawl(self):
+        try:
+            await self._crawl_hosts()
+        except Exception:
+            # Workers are only awaited once crawling stops, so an exception would otherwise go unnoticed until then
+            logger.exception('Worker stopped by an exception')
+            raise
+
+    async def _crawl_hosts(self):
+        while self.crawling:
+            # Get next host to crawl and time we need to wait
+            # Every host pushed to the heap releases the semaphore, so a host is usually on the heap once acquired
+            await self._hosts_in_heap.acquire()
+            popped = self.back_heap.pop_host()
+
+            # The heap may still be empty, e.g. if the host was taken by another thread, so the slot is given back for
+            # the host that will be pushed, waiting a moment rather than acquiring it again at once
+            if popped is None:
+                self._hosts_in_heap.release()
+                await asyncio.sleep(self.StopCheckInterval)
+                continue
+
+            wait_time, host = popped
+
+            # If a wait time is specified, wait for that amount without blocking other workers
+            if wait_time:
+                await asyncio.sleep(wait_time)
+
+            # Pull URL from back queue associated with host and fetch its contents
+            # It is kept as being fetched until stored, such that a checkpoint taken meanwhile does not lose it
+            back_queue = self.host_queue_map[host]
+            url = self.take_from_back_queue(back_queue)
+            if url:
+                await self.fetch_url_async(url)
+                self.fetching.discard(url)
+
+            if self.max_pages and self.num_parsed >= self.max_pages:
+                self.crawling = False
+
+            # Add entry to heap
+            self.push_host(self.refill_back_queue(host, back_queue))
+
+    async def crawl(self, seeds=(), max_pages=None):
+        """ Crawls from the seed URLs until stop_crawlers is called, or until max_pages pages have been fetched """
+        self.crawling = True
+        self.started = time.monotonic()
+        self.max_pages = max_pages
+
+        # Hosts pushed meanwhile by other threads are counted by the semaphore, as they push while holding the lock
+        with self.lock:
+            self._loop = asyncio.get_running_loop()
+            self._hosts_in_heap = asyncio.Semaphore(len(self.back_heap))
+
+        connector = aiohttp.TCPConnector(limit=self.threads, limit_per_host=self.ConnectionsPerHost,
+                                         keepalive_timeout=self.KeepAliveTimeout)
+        async with aiohttp.ClientSession(connector=connector, headers=Crawler.BaseHeaders,
+                                         timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
+            self._session = session
+            await self.queue_urls(seeds)
+
+            workers = [asyncio.ensure_future(self._crawl()) for _ in range(self.threads)]
+            try:
+                # Workers may be waiting for a host indefinitely, so they are cancelled once crawling stops
+                while self.crawling:
+                    await asyncio.sleep(self.StopCheckInterval)
+            finally:
+                for worker in workers:
+                    worker.cancel()
+
+                await asyncio.gather(*workers, return_exceptions=True)
+
+                self._session = None
+                self._loop = None
+                self._hosts_in_heap = None
+
+    def start_crawlers(self, seeds=()):
+        """ Runs the crawler on an event loop in the calling thread, until stop_crawlers is called """
+        asyncio.run(self.crawl(seeds))
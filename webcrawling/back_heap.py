@@ -10,24 +10,47 @@ def _current_time_millis():
 
 
 class BackHeap:
-    def __init__(self, delay=3000):
+    # Default multiple of the response time of a host to wait before visiting it again, such that slow hosts are
+    # visited less often
+    ResponseTimeFactor = 10
+
+    # Weight of the latest response time in the moving average of response times of a host
+    ResponseTimeSmoothing = 0.3
+
+    # Default upper bound in milliseconds of the delay derived from response times, robots crawl delays are not bounded
+    MaxResponseDelay = 60000
+
+    def __init__(self, delay=3000, response_time_factor=ResponseTimeFactor, max_response_delay=MaxResponseDelay):
+        # Pushing a host notifies a thread waiting for the heap to be non-empty
         self.lock = threading.Lock()
+        self.not_empty = threading.Condition(self.lock)
         self.heap = []
         self.delay = delay
+        self.response_time_factor = response_time_factor
+        self.max_response_delay = max_response_delay
+
+        # The hosts on the heap, and all hosts that have ever been pushed
+        self.hosts = set()
         self.history = set()
 
+        # Crawl delays from robots and moving averages of response times, both in seconds, by host
+        self.crawl_delays = dict()
+        self.response_times = dict()
+
     '''
     The heap consists of pairs (time, host) where time specifies when the host can be crawled again.
     Pop host returns a tuple (time_to_wait, host) where time to wait indicates how many seconds before
-    the host can be crawled again, allowing the caller to sleep for that duration.
+    the host can be crawled again, allowing the caller to sleep for that duration. If block is specified, it waits
+    until a host is pushed if the heap is empty, returning None if none is before the timeout in seconds.
     '''
-    def pop_host(self):
+    def pop_host(self, block=False, timeout=None):
         with self.lock:
-            # If heap is empty, return None
-            if not self.heap:
+            # If heap is empty, return None or wait for a host
+            if not self.heap and (not block or not self.not_empty.wait_for(lambda: self.heap, timeout)):
                 return None
 
             next_time, host = heapq.heappop(self.heap)
+            self.hosts.remove(host)
 
             # Max is used here to avoid sleeping for a negative duration
             return max(next_time - _current_time_millis(), 0) / 1000, host
@@ -37,22 +60,76 @@ class BackHeap:
     when the host can be visited again.
     '''
     def push_host(self, new_host, delay=True):
-        if new_host not in self.history:
+        with self.lock:
             self.history.add(new_host)
 
-        with self.lock:
             # If host is already in heap, do not push it
-            if new_host in self.get_hosts():
+            if new_host in self.hosts:
                 logger.error(f'Attempted to push host {new_host} when already in heap')
 
                 return False
 
-            heapq.heappush(self.heap, (_current_time_millis() + self.delay if delay else 0, new_host))
+            heapq.heappush(self.heap, (_current_time_millis() + self._get_delay(new_host) if delay else 0, new_host))
+            self.hosts.add(new_host)
+            self.not_empty.notify()
 
             return True
 
+    def set_crawl_delay(self, host, crawl_delay):
+        """ Sets the number of seconds that robots of a host asks to wait between visits """
+        with self.lock:
+            self.crawl_delays[host] = crawl_delay
+
+    def record_response(self, host, response_time):
+        """ Records the number of seconds a host took to respond, which the delay before the next visit adapts to """
+        with self.lock:
+            previous = self.response_times.get(host)
+            if previous is not None:
+                response_time = self.ResponseTimeSmoothing * response_time + (1 - self.ResponseTimeSmoothing) * previous
+
+            self.response_times[host] = response_time
+
+    def get_delay(self, host):
+        """ Returns the number of milliseconds to wait between visits to a host """
+        with self.lock:
+            return self._get_delay(host)
+
+    def _get_delay(self, host):
+        delay = self.delay
+
+        response_time = self.response_times.get(host)
+        if response_time is not None:
+            delay = max(delay, min(self.response_time_factor * response_time * 1000, self.max_response_delay))
+
+        crawl_delay = self.crawl_delays.get(host)
+        if crawl_delay is not None:
+            delay = max(delay, crawl_delay * 1000)
+
+        return delay
+
+    def snapshot(self):
+        """ Returns copies of the heap, the hosts pushed so far and the delays of hosts, to restore after a restart """
+        with self.lock:
+            return list(self.heap), set(self.history), dict(self.crawl_delays), dict(self.response_times)
+
+    def restore(self, state):
+        """ Restores a snapshot, the times at which hosts can be visited again stay the same """
+        heap, history, crawl_delays, response_times = state
+
+        with self.lock:
+            self.heap = list(heap)
+            heapq.heapify(self.heap)
+            self.hosts = {host for _, host in self.heap}
+            self.history = set(history)
+            self.crawl_delays = dict(crawl_delays)
+            self.response_times = dict(response_times)
+            self.not_empty.notify_all()
+
     def get_hosts(self):
-        return [item[1] for item in self.heap]
+        return list(self.hosts)
 
     def __contains__(self, item):
-        return item in self.get_hosts()
+        return item in self.hosts
+
+    def __len__(self):
+        return len(self.hosts)
@@ -1,16 +1,91 @@
 import functools
+import multiprocessing
+import os
+import pickle
 import random
+import shutil
 import threading
 import time
-from queue import Queue, Empty
+from concurrent.futures import ProcessPoolExecutor
+from queue import Queue, Empty, Full
 from urllib.parse import urlparse, urljoin, unquote, urlsplit
 
-import requests
 from bs4 import BeautifulSoup
 from loguru import logger
 
+from shared.document_store import DocumentStore
+from shared.link_graph import LinkGraph
 from webcrawling.back_heap import BackHeap
-from webcrawling.parser.robots_parser import RobotsParser
+from webcrawling.http_client import HttpClient
+from webcrawling.parser.robots_parser import get_robots_path
+from webcrawling.prioritizer import Prioritizer
+from webcrawling.robots_cache import RobotsCache
+from webcrawling.spilling_queue import SpillingQueue
+from webcrawling.url_seen import UrlSeenSet
+
+
+def normalize_url(url, referer=None):
+    """ Normalizes URL, expands relative URLs to absolute ones """
+    # Expand relative links
+    if referer:
+        url = urljoin(referer, url)
+
+    # Converts protocol and host to lower case
+    url = urlsplit(url).geturl()
+
+    # Decode percent-encoded octets of unreserved characters
+    url = unquote(url)
+
+    # Remove anchor scrolling
+    if '#' in url:
+        url = url.split('#')[0]
+
+    # Remove trailing slash if any
+    url = url.rstrip('/')
+
+    return url
+
+
+def get_hyperlinks(soup, referer):
+    hyperlinks = dict()
+    illegal_starts = {'mailto:', 'javascript:', '#', 'tel:'}
+
+    for tag in soup.find_all('a', href=True):
+        href = tag['href']
+
+        for start in illegal_starts:
+            if href.startswith(start):
+                break
+        else:
+            hyperlinks[normalize_url(href, referer)] = tag.text
+
+    return hyperlinks
+
+
+def parse_page(text, url):
+    """
+    Parses the contents of a fetched page, returns its hyperlinks (a dictionary from URL to anchor text) and its text.
+    Returns None if the page could not be parsed. Kept at module level such that any crawler engine can use it.
+    """
+    # Parse with BS4
+    soup = BeautifulSoup(text, 'lxml')
+    if not soup:
+        return None
+
+    # Get hyperlink from contents
+    hyperlinks = get_hyperlinks(soup, url)
+
+    # Remove irrelevant tags
+    for tag in soup(["script", "style"]):
+        tag.extract()
+
+    return hyperlinks, soup.text
+
+
+def _queued(queue):
+    """ Returns a copy of the items of a queue """
+    with queue.mutex:
+        return list(queue.queue)
 
 
 def log_on_failure(func):
@@ -28,60 +103,124 @@ class Crawler:
     UserAgent = 'Friendly Crawler'
     BaseHeaders = {'User-Agent': UserAgent}
 
-    def normalize_url(self, url, referer=None):
-        """ Normalizes URL, expands relative URLs to absolute ones """
-        # Expand relative links
-        if referer:
-            url = urljoin(referer, url)
-
-        # Converts protocol and host to lower case
-        url = urlsplit(url).geturl()
+    # Seconds that a worker waits for a host to be pushed to the back heap before checking if crawling has stopped
+    PopTimeout = 1
 
-        # Decode percent-encoded octets of unreserved characters
-        url = unquote(url)
+    # Default number of front queues, i.e. priorities, and the base of the weight of a front queue by its priority
+    DefaultFrontQueues = 8
+    SelectionBase = 2
 
-        # Remove anchor scrolling
-        if '#' in url:
-            url = url.split('#')[0]
+    # Default number of parser processes, and of fetched pages that may wait for them before fetching blocks
+    # A core is left to the fetching threads, so with a single core pages are parsed by threads of this process
+    # Each process is fed by a few threads, such that it parses the next page while a thread saves the last
+    DefaultParsers = max((os.cpu_count() or 1) - 1, 0)
+    DefaultParseQueueSize = 100
+    ParseThreadsPerProcess = 2
 
-        # Remove trailing slash if any
-        url = url.rstrip('/')
-
-        return url
+    # Default seconds between checkpoints, and the files of a checkpoint
+    CheckpointInterval = 300
+    FrontierFile = 'frontier.pkl'
+    FrontQueuesDirectory = 'front_queues'
+    LinksDirectory = 'links'
 
     def pick_from_front(self):
-        # Randomly select which a front queue
-        priority = random.randint(0, self.num_front_queues - 1)
-        selected_queue = self.front_queues[priority]
+        """
+        Takes a URL from a front queue that is not empty, or returns None if all are empty. Queues are selected with
+        probability proportional to SelectionBase ** priority, so valuable URLs are fetched first without starving
+        the others.
+        """
+        while True:
+            priorities = [priority for priority, queue in self.front_queues.items() if not queue.empty()]
+            if not priorities:
+                return None
+
+            weights = [self.SelectionBase ** priority for priority in priorities]
+            priority = random.choices(priorities, weights=weights)[0]
+
+            # Extract URL from queue, unless another worker emptied it meanwhile
+            try:
+                return self.front_queues[priority].get_nowait()
+            except Empty:
+                continue
+
+    def add_to_frontier(self, url, anchor_text=''):
+        # Add the URL to the front queue of its priority, which is not revised as in-links to it are found later
+        priority = self.prioritizer.get_priority(url, in_degree=self.link_graph.get_in_degree(url),
+                                                 anchor_text=anchor_text)
+        self.front_queues[priority].put(url)
 
-        # Extract URL from queue
-        try:
-            url = selected_queue.get()
-        except Empty:
-            return False
+    def refill_back_queue(self, host, back_queue):
+        """ Refills an empty back queue from the front queues, returns the host that the back queue now belongs to """
+        while back_queue.empty():
+            # Moving a URL from a front queue to a back queue is atomic, such that a snapshot finds it in either
+            with self.lock:
+                # Pull a URL from a prioritised front queue, if all are empty the host keeps the queue until URLs arrive
+                url = self.pick_from_front()
+                if url is None:
+                    return host
+
+                new_host = urlparse(url).netloc
+
+                # Check if the new host has an existing back queue
+                existing = self.host_queue_map.get(new_host)
+
+                if existing:
+                    # The URL selected from a front queue already has a queue
+                    existing.put(url)
+                else:
+                    # The current back queue is transferred to the new host
+                    del self.host_queue_map[host]
+                    host = new_host
+                    self.host_queue_map[host] = back_queue
+                    back_queue.put(url)
+
+        return host
+
+    def take_from_back_queue(self, back_queue):
+        """ Takes a URL from a back queue and marks it as being fetched, returns None if the queue is empty """
+        # Both happen at once, such that a snapshot finds the URL in either
+        with self.lock:
+            try:
+                url = back_queue.get_nowait()
+            except Empty:
+                return None
+
+            self.fetching.add(url)
 
         return url
 
-    def add_to_frontier(self, url):
-        # Add the URL to a random front queue
-        priority = random.randint(0, self.num_front_queues - 1)
-        self.front_queues[priority].put(url)
+    def mark_seen(self, url):
+        """ Marks a URL as seen, returns False if it had already been seen """
+        return self.seen_urls.add(url)
 
-    def queue_raw_url(self, url):
-        # If we have seen this URL, discard it
+    def queue_raw_url(self, url, anchor_text=''):
+        host = urlparse(url).netloc
+
+        # A URL is marked as seen and queued or left waiting for robots.txt at once, such that a snapshot taken
+        # meanwhile does not find it seen but in no queue
         with self.lock:
-            if url in self.seen_urls:
+            # If we have seen this URL, discard it
+            if not self.mark_seen(url):
                 return
-            else:
-                self.seen_urls.add(url)
 
-        parsed_url = urlparse(url)
-        host = parsed_url.netloc
+            # Check if we can visit this URL, if robots.txt of the host has not been fetched the URL is queued once it
+            # has. The URL waits along with its anchor text, which its priority depends on
+            robots_parser = self.robots.request(host, (url, anchor_text))
+            if robots_parser and robots_parser.can_access(get_robots_path(url), user_agent=self.UserAgent):
+                self.queue_allowed_url(url, host, anchor_text)
+
+    def on_robots_fetched(self, host, robots_parser, urls):
+        """ Applies the crawl delay of a fetched robots.txt, and queues the URLs that waited for it """
+        crawl_delay = robots_parser.get_crawl_delay(self.UserAgent)
+        if crawl_delay is not None:
+            self.back_heap.set_crawl_delay(host, crawl_delay)
 
-        # Check if we can visit this URL
-        if not self.get_robots_parser(host).can_access(parsed_url.path, user_agent=self.UserAgent):
-            return
+        for url, anchor_text in urls:
+            if robots_parser.can_access(get_robots_path(url), user_agent=self.UserAgent):
+                self.queue_allowed_url(url, host, anchor_text)
 
+    def queue_allowed_url(self, url, host, anchor_text=''):
+        """ Places a URL which robots allow us to visit in a back queue or the frontier """
         # For initial hosts, create a back queue and heap entry for them
         with self.lock:
             if len(self.back_queues) < self.num_back_queues and host not in self.back_heap.history:
@@ -91,47 +230,37 @@ class Crawler:
                 queue.put(url)
                 self.host_queue_map[host] = queue
                 self.back_queues.add(queue)
-                self.back_heap.push_host(host, delay=True)
-            else:
-                self.add_to_frontier(url)
-
-    def get_hyperlinks(self, soup, referer):
-        hyperlinks = dict()
-        illegal_starts = {'mailto:', 'javascript:', '#', 'tel:'}
-
-        for tag in soup.find_all('a', href=True):
-            href = tag['href']
-
-            for start in illegal_starts:
-                if href.startswith(start):
-                    break
+                self.push_host(host)
             else:
-                hyperlinks[self.normalize_url(href, referer)] = tag.text
+                self.add_to_frontier(url, anchor_text)
 
-        return hyperlinks
+    def push_host(self, host):
+        """ Adds a host to the back heap, such that it is visited once the politeness delay has passed """
+        return self.back_heap.push_host(host, delay=True)
 
     def get_robots_parser(self, host):
-        if host in self.host_robots:
-            return self.host_robots[host]
+        """ Returns the parser of robots.txt of a host, waiting for it to be fetched if necessary """
+        return self.robots.wait(host)
 
-        response, _ = self.request_url(f'http://{host}/robots.txt')
-        if response:
-            self.host_robots[host] = RobotsParser(robot_text=response)
-        else:
-            # If robots could not be accessed, an empty parser is used which allows anything
-            self.host_robots[host] = RobotsParser()
+    def fetch_robots(self, host):
+        # The cached parser is replaced when robots.txt is fetched again, so the response must not be 304
+        response, _ = self.request_url(f'http://{host}/robots.txt', conditional=False)
 
-        return self.host_robots[host]
+        return response
 
-    def request_url(self, url):
-        response = requests.get(url, headers=Crawler.BaseHeaders, timeout=5)
+    def request_url(self, url, conditional=True):
+        response = self.http.get(url, conditional=conditional)
+
+        # The delay before the host is visited again adapts to how long it took to respond
+        self.back_heap.record_response(urlparse(url).netloc, response.elapsed.total_seconds())
 
         # If we were redirected, we can also say that this URL has been crawled
-        self.seen_urls.add(response.url)
+        self.seen_urls.add(normalize_url(response.url))
 
         if response.status_code != 200:
             # logger.error(f'{url} returned {response.status_code}')
 
+            # This includes 304, i.e. the page has not changed since it was last fetched
             return None, response.url
         else:
             # Check if content is text/html
@@ -141,79 +270,108 @@ class Crawler:
 
             return response.text, response.url
 
-    def add_contents(self, url, contents):
-        contents = contents.strip()
-        if not contents:
-            return
-
-        self.url_contents[url] = f'{contents} {self.url_contents.get(url, "")}'.strip()
-
     def fetch_url(self, url):
-        """ Fetches a URL, performs parsing of it, passes to indexer and saves outgoing links """
+        """ Fetches a URL and queues its contents for the parsers, returns False if nothing was queued """
         try:
             self.num_requests += 1
 
             # Get contents of extracted URL
-            text, url = self.request_url(url)
-            if not text or not url:
-                logger.error(f'Failed to get {url}')
+            text, fetched_url = self.request_url(url)
+            if not text or not fetched_url:
+                logger.error(f'Failed to get {fetched_url}')
 
                 return False
+        except Exception as e:
+            logger.error(f'Worker exception: {e}')
+            return False
 
-            # Parse with BS4
-            soup = BeautifulSoup(text, 'lxml')
-            if not soup:
-                logger.error(f'Could not parse {url}')
+        self.num_fetched += 1
 
-                return False
+        # If the parsers fall behind, the queue fills up and fetching waits for room, unless crawling stops meanwhile
+        started = time.monotonic()
+        try:
+            while self.crawling:
+                try:
+                    self.parse_queue.put((url, fetched_url, text), timeout=self.PopTimeout)
+                    return True
+                except Full:
+                    continue
+        finally:
+            self.fetch_wait_time += time.monotonic() - started
 
-            # Get hyperlink from contents
-            hyperlinks = self.get_hyperlinks(soup, url)
+        return False
 
-            # Set outgoing links for current URL
-            # Update contents of referenced URLs to include anchor text
-            references = set()
-            for hyperlink, anchor_text in hyperlinks.items():
-                if hyperlink in self.url_contents:
-                    self.add_contents(hyperlink, anchor_text)
+    def parse_fetched(self, url, text):
+        """ Parses a fetched page in a parser process, saves it and adds its hyperlinks to the frontier """
+        try:
+            # Without parser processes, pages are parsed by the parsing threads themselves
+            page = self.parse_pool.submit(parse_page, text, url).result() if self.parse_pool else parse_page(text, url)
+            if not page:
+                logger.error(f'Could not parse {url}')
 
-                if hyperlink != url:
-                    references.add(hyperlink)
+                return False
 
-            # Only add references that are not referenced by the same host
-            self.url_references[url] = references
+            hyperlinks, contents = page
+            self.record_page(url, hyperlinks, contents)
+            self.num_parsed += 1
 
             # Add hyperlinks to URL frontier
-            for hyperlink in hyperlinks:
-                self.queue_raw_url(hyperlink)
-
-            # Remove irrelevant tags
-            for tag in soup(["script", "style"]):
-                tag.extract()
-
-            # Add to dictionary of URL contents
-            self.add_contents(url, soup.text)
+            for hyperlink, anchor_text in hyperlinks.items():
+                self.queue_raw_url(hyperlink, anchor_text)
         except Exception as e:
-            logger.error(f'Worker exception: {e}')
+            logger.error(f'Parser exception: {e}')
             return False
 
         return True
 
+    def get_stage_stats(self):
+        """
+        Returns the number of pages fetched and parsed per second since crawling started, the number of fetched pages
+        waiting to be parsed, and the seconds that fetching has waited for room in the parse queue
+        """
+        elapsed = max(time.monotonic() - self.started, 1e-9) if self.started else None
+        fetch_rate = self.num_fetched / elapsed if elapsed else 0
+        parse_rate = self.num_parsed / elapsed if elapsed else 0
+
+        return fetch_rate, parse_rate, self.parse_queue.qsize(), self.fetch_wait_time
+
+    def record_page(self, url, hyperlinks, contents):
+        """ Saves the outgoing links and contents of a parsed page """
+        # Set outgoing links for current URL
+        # Update contents of referenced URLs to include anchor text
+        references = set()
+        for hyperlink, anchor_text in hyperlinks.items():
+            anchor_text = anchor_text.strip()
+            if anchor_text and hyperlink in self.documents:
+                self.documents.add_anchor_text(hyperlink, anchor_text)
+
+            if hyperlink != url:
+                references.add(hyperlink)
+
+        # Only add references that are not referenced by the same host
+        self.link_graph.add_links(url, references)
+
+        # Append to the stored contents
+        contents = contents.strip()
+        if contents:
+            self.documents.add(url, contents)
+
     def start_crawlers(self):
-        """ Runs a number of crawlers which will run indefinitely. """
+        """
+        Runs a number of crawlers which will run indefinitely, as a pipeline of threads fetching pages and threads
+        handing the fetched pages to parser processes.
+        """
         self.crawling = True
+        self.started = time.monotonic()
 
         # Could principally not be a nested function, but it's nested to discourage calling from main thread
         @log_on_failure
         def _crawl():
             while self.crawling:
                 # Get next host to crawl and time we need to wait
-                heap_pair = self.back_heap.pop_host()
-
-                # It should not occur that there are no hosts on the heap, but in that case wait and try again
+                # If there are no hosts on the heap, wait until one is pushed, periodically checking if we should stop
+                heap_pair = self.back_heap.pop_host(block=True, timeout=self.PopTimeout)
                 if not heap_pair:
-                    time.sleep(1)
-
                     continue
 
                 # We can then extract values from the pair, given that it is not None
@@ -226,69 +384,217 @@ class Crawler:
                 # Look up back queue associated with host
                 back_queue = self.host_queue_map[host]
 
-                # Pull URL from back queue and fetch its contents
-                self.fetch_url(back_queue.get())
-
-                # Refill the back queue if necessary
-                while back_queue.empty():
-                    # Pull a URl from a prioritised front queue
-                    url = self.pick_from_front()
-                    new_host = urlparse(url).netloc
+                # Pull URL from back queue and fetch its contents, the queue is empty if the frontier was
+                # It is kept as being fetched until parsed and stored, such that a checkpoint taken meanwhile does not
+                # lose it, which includes while it waits in the parse queue
+                url = self.take_from_back_queue(back_queue)
+                if url:
+                    if not self.fetch_url(url):
+                        self.fetching.discard(url)
 
-                    # Check if the new host has an existing back queue
-                    with self.lock:
-                        existing = self.host_queue_map.get(new_host)
+                # Refill the back queue if necessary and add entry to heap
+                self.push_host(self.refill_back_queue(host, back_queue))
 
-                        if existing:
-                            # The URL selected from a front queue already has a queue
-                            existing.put(url)
-                        else:
-                            # The current back queue is transferred to the new host
-                            host = new_host
-                            self.host_queue_map[host] = back_queue
-                            back_queue.put(url)
+        @log_on_failure
+        def _parse():
+            while self.crawling:
+                try:
+                    url, fetched_url, text = self.parse_queue.get(timeout=self.PopTimeout)
+                except Empty:
+                    continue
 
-                # Add entry to heap
-                self.back_heap.push_host(host, delay=True)
+                self.parse_fetched(fetched_url, text)
+                self.fetching.discard(url)
 
         # Start the designated number of threads
         for _ in range(self.threads):
             thread = threading.Thread(target=_crawl)
             thread.start()
 
+        for _ in range(max(self.parsers, 1) * self.ParseThreadsPerProcess):
+            thread = threading.Thread(target=_parse)
+            thread.start()
+
+    def snapshot(self, path):
+        """
+        Copies the state of the frontier, i.e. the front and back queues, the back heap, seen URLs and robots.txt of
+        hosts. Workers moving URLs are paused meanwhile, so the copies are written to disk afterwards, except for the
+        spilled segments of front queues which are linked into the directory at path rather than read.
+        """
+        front_queues_path = os.path.join(path, self.FrontQueuesDirectory)
+
+        with self.lock:
+            back_queues = list(self.back_queues)
+            back_queue_indices = {id(back_queue): index for index, back_queue in enumerate(back_queues)}
+
+            return {
+                'seen_urls': self.seen_urls.copy(),
+                'front_queues': {priority: queue.checkpoint(os.path.join(front_queues_path, str(priority)))
+                                 for priority, queue in self.front_queues.items()},
+                'back_queues': [_queued(back_queue) for back_queue in back_queues],
+                'host_queues': {host: back_queue_indices[id(back_queue)]
+                                for host, back_queue in self.host_queue_map.items()},
+                'fetching': list(self.fetching),
+                'back_heap': self.back_heap.snapshot(),
+                'robots': self.robots.snapshot(),
+                'num_requests': self.num_requests,
+            }
+
+    def save_checkpoint(self, path):
+        """
+        Writes a checkpoint of the crawl to a directory at the given path, holding the frontier and the link graph,
+        while contents are already on disk in the document store. The previous checkpoint is only replaced once the
+        new one has been written in full.
+        """
+        temporary_path = f'{path}.tmp'
+        shutil.rmtree(temporary_path, ignore_errors=True)
+        os.makedirs(temporary_path)
+
+        state = self.snapshot(temporary_path)
+
+        with open(os.path.join(temporary_path, self.FrontierFile), 'wb') as file:
+            pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+        self.link_graph.save(os.path.join(temporary_path, self.LinksDirectory))
+        self.documents.flush()
+
+        # If the process dies between the renames, the previous checkpoint is left at the old path
+        old_path = f'{path}.old'
+        if os.path.isdir(path):
+            shutil.rmtree(old_path, ignore_errors=True)
+            os.replace(path, old_path)
+
+        os.replace(temporary_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    def load_checkpoint(self, path):
+        """ Resumes the crawl from a checkpoint written by save_checkpoint, returns False if there is none """
+        if not os.path.isdir(path):
+            path = f'{path}.old'
+            if not os.path.isdir(path):
+                return False
+
+        with open(os.path.join(path, self.FrontierFile), 'rb') as file:
+            state = pickle.load(file)
+
+        self.link_graph = LinkGraph.load(os.path.join(path, self.LinksDirectory))
+        self.seen_urls = state['seen_urls']
+        self.num_requests = state['num_requests']
+
+        with self.lock:
+            for priority, queue_state in state['front_queues'].items():
+                self.front_queues[priority % self.num_front_queues].restore(
+                    os.path.join(path, self.FrontQueuesDirectory, str(priority)), queue_state)
+
+            # URLs that were being fetched are fetched again, unless their contents were stored
+            for url in state['fetching']:
+                if url not in self.documents:
+                    self.add_to_frontier(url)
+
+            back_queues = [Queue() for _ in state['back_queues']]
+            for back_queue, urls in zip(back_queues, state['back_queues']):
+                for url in urls:
+                    back_queue.put(url)
+
+            self.back_queues = set(back_queues)
+            self.host_queue_map = {host: back_queues[index] for host, index in state['host_queues'].items()}
+
+        # Hosts that were being visited were not on the heap
+        self.back_heap.restore(state['back_heap'])
+        for host in self.host_queue_map:
+            if host not in self.back_heap:
+                self.back_heap.push_host(host, delay=False)
+
+        self.robots.restore(*state['robots'])
+
+        return True
+
+    def start_checkpoints(self, path, interval=CheckpointInterval):
+        """ Saves a checkpoint every interval seconds while crawling, from a background thread """
+        @log_on_failure
+        def _checkpoint():
+            while True:
+                time.sleep(interval)
+                if not self.crawling:
+                    return
+
+                self.save_checkpoint(path)
+                logger.info(f'Saved checkpoint to {path}')
+
+        thread = threading.Thread(target=_checkpoint, daemon=True)
+        thread.start()
+
     def stop_crawlers(self):
         self.crawling = False
+        self.robots.close()
+        self.documents.flush()
+
+        # Pages waiting to be parsed are still marked as being fetched, so they are fetched again from a checkpoint
+        if self.parse_pool:
+            self.parse_pool.shutdown(wait=False, cancel_futures=True)
 
-    def __init__(self, threads=100, num_front_queues=1):
+    def __init__(self, threads=100, num_front_queues=DefaultFrontQueues, documents_path='documents', frontier_path=None,
+                 prioritizer=None, parsers=DefaultParsers, parse_queue_size=DefaultParseQueueSize):
         self.crawling = False
         self.threads = threads
 
-        # Maintains a dictionary from URLs to their contents
-        self.url_contents = dict()
+        # Contents of pages are written to disk as they are fetched, appending to those of a previous crawl
+        self.documents = DocumentStore(documents_path)
 
-        # Maintain a dictionary from URLs to their referenced URLs
-        self.url_references = dict()
+        # Maintain a graph from URLs to their referenced URLs
+        self.link_graph = LinkGraph()
 
         # Maintain a counter of requests made
         self.num_requests = 0
 
-        # For certain operations (e.g. the set of seen URLs) a lock is used to avoid conflicts
-        self.lock = threading.Lock()
-
-        # Maintain a map of hosts and their parsed robot file
-        self.host_robots = dict()
+        # Fetched pages are parsed in separate processes, as parsing is CPU bound and would otherwise hold the GIL
+        # from the fetching threads. The processes are spawned rather than forked, as forking copies held locks of
+        # the running threads. Fetched pages wait in a bounded queue, which holds back fetching if parsing lags
+        self.parsers = parsers
+        self.parse_pool = None
+        if parsers:
+            self.parse_pool = ProcessPoolExecutor(parsers, mp_context=multiprocessing.get_context('spawn'))
+        self.parse_queue = Queue(maxsize=parse_queue_size)
+
+        # Counters of pages passing the fetching and parsing stages, and the seconds fetching waited for parsing
+        self.started = None
+        self.num_fetched = 0
+        self.num_parsed = 0
+        self.fetch_wait_time = 0
+
+        # Pages and robots.txt files are fetched over connections kept alive per host and shared between threads
+        self.http = HttpClient(headers=Crawler.BaseHeaders, timeout=5)
+
+        # URLs move between the seen URLs, robots.txt fetches, front queues, back queues and being fetched while
+        # holding the lock, such that a snapshot holding it finds each URL somewhere. It is reentrant, as moving a URL
+        # may take several steps that each hold it
+        self.lock = threading.RLock()
+
+        # Maintain a cache of hosts and their parsed robot file, which is filled in the background
+        # The URLs waiting for a fetch are queued while holding the lock too
+        self.robots = RobotsCache(self.fetch_robots, on_fetched=self.on_robots_fetched, lock=self.lock)
 
         # Back heap
         self.back_heap = BackHeap()
 
-        # Maintain a set of seen URLs to avoid redundant crawling
-        self.seen_urls = set()
+        # URLs taken from back queues whose contents have not been stored yet
+        self.fetching = set()
+
+        # Maintain a set of seen URLs to avoid redundant crawling, as fingerprints since there are millions of them
+        # It can be replaced by a UrlBloomFilter to use less memory, at the cost of skipping some unseen URLs
+        self.seen_urls = UrlSeenSet()
+
+        # URLs are assigned to front queues by their priority
+        self.prioritizer = prioritizer or Prioritizer(num_front_queues)
 
         # Maintain a mapping of prioritised front queues
+        # The frontier grows to millions of URLs, so front queues only keep their head and tail in memory, spilling
+        # the rest to temporary directories unless a path is given. It is resumed from checkpoints, not from there
         self.num_front_queues = num_front_queues
         self.front_queues = dict()
         for priority in range(num_front_queues):
-            self.front_queues[priority] = Queue()
+            self.front_queues[priority] = SpillingQueue(path=os.path.join(frontier_path, str(priority))
+                                                        if frontier_path else None)
 
         # Maintain a mapping from hosts to their back queue
         self.host_queue_map = dict()
@@ -0,0 +1,155 @@
+import statistics
+import threading
+import time
+from collections import OrderedDict, deque
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+class HttpClient:
+    """
+    Fetches URLs over kept-alive connections, pooled per host and shared by all threads.
+    Each thread has its own session, since sessions are not thread-safe, but they all use the same adapter whose
+    connection pools are. A host is usually visited by a different thread than the one that visited it before.
+    """
+    # Default number of hosts to keep connections to, the least recently used host's connections are closed first
+    DefaultPoolHosts = 1000
+
+    # Default number of connections kept to a single host
+    DefaultConnectionsPerHost = 2
+
+    # Default number of seconds after which the connections to a host that has not been visited are closed
+    DefaultIdleTimeout = 60
+
+    # Number of fetch latencies kept for computing the median
+    LatencySamples = 1000
+
+    def __init__(self, headers=None, timeout=5, pool_hosts=DefaultPoolHosts,
+                 connections_per_host=DefaultConnectionsPerHost, idle_timeout=DefaultIdleTimeout, max_validators=0):
+        """
+        With max_validators set, the ETag and Last-Modified of up to that many recently fetched URLs are kept, such
+        that fetching them again is conditional. They are only of use to a client that fetches pages again.
+        """
+        self.headers = headers or dict()
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.max_validators = max_validators
+
+        # Connections beyond the bound of a host are closed after use rather than waited for
+        self._adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=connections_per_host, pool_block=False)
+        self._adapter.poolmanager.pools.dispose_func = self._dispose_pool
+        self._local = threading.local()
+
+        # Time that each host was last visited, and when idle hosts were last looked for
+        self._lock = threading.Lock()
+        self._last_used = dict()
+        self._last_eviction = time.monotonic()
+
+        # ETag and Last-Modified of fetched URLs, used to only download pages again if they have changed
+        # The least recently fetched URL is forgotten first
+        self._validators = OrderedDict()
+
+        # Connections and requests of closed pools, since the counters of a pool are lost with it
+        self._closed_connections = 0
+        self._closed_requests = 0
+        self._not_modified = 0
+        self._latencies = deque(maxlen=self.LatencySamples)
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            session.headers.update(self.headers)
+            session.mount('http://', self._adapter)
+            session.mount('https://', self._adapter)
+
+        return session
+
+    def _dispose_pool(self, pool):
+        with self._lock:
+            self._closed_connections += pool.num_connections
+            self._closed_requests += pool.num_requests
+
+        pool.close()
+
+    def _evict_idle(self, now):
+        """ Closes the connections to hosts that have not been visited within the idle timeout """
+        with self._lock:
+            if now - self._last_eviction < self.idle_timeout / 2:
+                return
+
+            self._last_eviction = now
+            idle = {key for key, last_used in self._last_used.items() if now - last_used > self.idle_timeout}
+            for key in idle:
+                del self._last_used[key]
+
+        # Removing a pool disposes of it, which closes its connections
+        # The pool may have been evicted by another thread in the meantime, hence the default
+        pools = self._adapter.poolmanager.pools
+        for pool_key in pools.keys():
+            if (pool_key.key_scheme, pool_key.key_host, pool_key.key_port) in idle:
+                pools.pop(pool_key, None)
+
+    def get(self, url, conditional=True):
+        """
+        Fetches a URL. If it has been fetched before with an ETag or Last-Modified header that is still kept, the
+        request is conditional, such that the response is 304 without a body if the page has not changed, unless
+        conditional is False.
+        """
+        now = time.monotonic()
+        parsed_url = urlsplit(url)
+        with self._lock:
+            self._last_used[(parsed_url.scheme, parsed_url.hostname,
+                             parsed_url.port or _DEFAULT_PORTS.get(parsed_url.scheme))] = now
+            validators = self._validators.get(url) if conditional else None
+
+        self._evict_idle(now)
+
+        headers = dict()
+        if validators:
+            etag, last_modified = validators
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+
+        response = self._session().get(url, headers=headers, timeout=self.timeout)
+        etag, last_modified = response.headers.get('ETag'), response.headers.get('Last-Modified')
+
+        with self._lock:
+            self._latencies.append(response.elapsed.total_seconds())
+
+            if response.status_code == 304:
+                self._not_modified += 1
+                if url in self._validators:
+                    self._validators.move_to_end(url)
+            elif conditional and self.max_validators and response.status_code == 200 and (etag or last_modified):
+                self._validators[url] = (etag, last_modified)
+                self._validators.move_to_end(url)
+                if len(self._validators) > self.max_validators:
+                    self._validators.popitem(last=False)
+
+        return response
+
+    def get_stats(self):
+        """
+        Returns the number of requests, the number of connections opened, the fraction of requests that reused a
+        connection, the median latency in seconds until response headers arrived, and the number of 304 responses
+        """
+        # The pool container cannot be iterated, as that is not thread-safe, so pools are looked up by key
+        pools = self._adapter.poolmanager.pools
+        pools = [pool for pool in map(pools.get, pools.keys()) if pool]
+
+        with self._lock:
+            num_connections = self._closed_connections + sum(pool.num_connections for pool in pools)
+            num_requests = self._closed_requests + sum(pool.num_requests for pool in pools)
+            median_latency = statistics.median(self._latencies) if self._latencies else None
+            not_modified = self._not_modified
+
+        reuse_ratio = 1 - num_connections / num_requests if num_requests else 0
+
+        return num_requests, num_connections, reuse_ratio, median_latency, not_modified
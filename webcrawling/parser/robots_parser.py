@@ -1,56 +1,159 @@
 import re
+from urllib.parse import urlsplit
+
+# Key of a trie node under which the rule ending at that node is stored, whether it allows the path
+_RULE = None
+
+
+def _compile_pattern(pattern):
+    """ Compiles a rule with * wildcards and an optional $ end anchor into a regular expression """
+    anchored = pattern.endswith('$')
+    if anchored:
+        pattern = pattern[:-1]
+
+    return re.compile('.*'.join(re.escape(part) for part in pattern.split('*')) + ('$' if anchored else ''))
+
+
+class RuleMatcher:
+    """
+    The rules of a user agent compiled for matching a path against all of them at once. The longest rule matching the
+    path decides whether it can be accessed, and if an Allow and a Disallow rule are equally long, Allow wins.
+    """
+    def __init__(self, rules):
+        # Plain rules are stored in a trie of their characters, such that matching walks the path once
+        # Rules with wildcards are few, and are matched one by one from the longest
+        self._trie = dict()
+        self._wildcard_rules = []
+
+        for pattern, allow in rules:
+            # An empty rule matches nothing
+            if not pattern:
+                continue
+
+            if '*' in pattern or pattern.endswith('$'):
+                self._wildcard_rules.append((len(pattern), allow, _compile_pattern(pattern)))
+            else:
+                node = self._trie
+                for char in pattern:
+                    node = node.setdefault(char, dict())
+
+                node[_RULE] = node.get(_RULE, False) or allow
+
+        self._wildcard_rules.sort(key=lambda rule: (-rule[0], not rule[1]))
+
+        # Most paths match no wildcard rule, which a single expression combining them finds out at once
+        self._any_wildcard = None
+        if self._wildcard_rules:
+            self._any_wildcard = re.compile('|'.join(f'(?:{regex.pattern})' for _, _, regex in self._wildcard_rules))
+
+    def can_access(self, path):
+        # Length and verdict of the longest plain rule matching the path, paths not matching any rule are allowed
+        length, allow = 0, True
+        node = self._trie
+        for depth, char in enumerate(path, 1):
+            node = node.get(char)
+            if node is None:
+                break
+
+            rule = node.get(_RULE)
+            if rule is not None:
+                length, allow = depth, rule
+
+        if self._any_wildcard is None or not self._any_wildcard.match(path):
+            return allow
+
+        for pattern_length, rule_allow, regex in self._wildcard_rules:
+            if pattern_length < length:
+                break
+
+            # An equally long Disallow rule does not override a plain Allow rule
+            if (pattern_length > length or rule_allow) and regex.match(path):
+                return rule_allow
+
+        return allow
+
+
+def get_robots_path(url):
+    """ Returns the part of a URL that robots.txt rules are matched against, which is its path and query """
+    parsed_url = urlsplit(url)
+
+    return parsed_url.path + (f'?{parsed_url.query}' if parsed_url.query else '')
 
 
 class RobotsParser:
     AnyUserAgent = '*'
-    AgentRegex = re.compile("User-[aA]gent: (.*)")
-    DisallowRegex = re.compile("Disallow: (.*)")
+    LineRegex = re.compile(r'\s*([A-Za-z-]+)\s*:\s*(.*?)\s*$')
 
     def __init__(self, robot_text=None):
-        self.disallowed_pages = dict()
+        # Rules as pairs (pattern, allow) and crawl delays in seconds, by lower case user agent
+        self.rules = dict()
+        self.crawl_delays = dict()
+        self._matchers = dict()
 
         if robot_text:
             self.parse(robot_text)
 
     def parse(self, robot_text):
-        lines = robot_text.split('\n')
+        # Consecutive User-agent lines form a group that the following rules apply to
+        group_agents = []
+        in_rules = False
+
+        for line in robot_text.split('\n'):
+            # Remove comments, and skip lines that are not fields
+            match = self.LineRegex.match(line.split('#', 1)[0])
+            if not match:
+                continue
 
-        current_user_agent = None
-        for line in lines:
-            # Attempt to match user-agent signature
-            agent_match = self.AgentRegex.match(line)
-            if agent_match:
-                current_user_agent = agent_match.group(1)
+            field, value = match.group(1).lower(), match.group(2)
 
-                # Initialize set of disallowed pages for this agent if not previous initialized
-                if current_user_agent not in self.disallowed_pages:
-                    self.disallowed_pages[current_user_agent] = set()
+            if field == 'user-agent':
+                # A User-agent line after rules starts a new group
+                if in_rules:
+                    group_agents = []
+                    in_rules = False
 
-                continue
+                # Initialize rules for this agent if not previously initialized, rules of repeated groups are merged
+                agent = value.lower()
+                group_agents.append(agent)
+                self.rules.setdefault(agent, [])
+            elif field in ('allow', 'disallow'):
+                in_rules = True
+                for agent in group_agents:
+                    self.rules[agent].append((value, field == 'allow'))
+            elif field == 'crawl-delay':
+                in_rules = True
+                try:
+                    delay = float(value)
+                except ValueError:
+                    continue
 
-            # If no current user agent has been specified, no point in trying to parse disallowed pages
-            if not current_user_agent:
-                continue
+                for agent in group_agents:
+                    self.crawl_delays[agent] = delay
+
+        self._matchers = {agent: RuleMatcher(rules) for agent, rules in self.rules.items()}
+
+    def __getstate__(self):
+        # Only the rules are pickled, as the tries of compiled matchers are deeply nested
+        return self.rules, self.crawl_delays
+
+    def __setstate__(self, state):
+        self.rules, self.crawl_delays = state
+        self._matchers = {agent: RuleMatcher(rules) for agent, rules in self.rules.items()}
+
+    def _agent(self, user_agent, agents):
+        """ Returns the user agent whose rules apply, which is any user agent if there are none for the given one """
+        user_agent = user_agent.lower()
 
-            # Attempt to match disallow signature
-            disallow_match = self.DisallowRegex.match(line)
-            if disallow_match:
-                self.disallowed_pages[current_user_agent].add(disallow_match.group(1))
+        return user_agent if user_agent in agents else self.AnyUserAgent
 
     def can_access(self, page, user_agent=AnyUserAgent):
         if not page:
             page = '/'
 
-        if user_agent in self.disallowed_pages:
-            for disallowed_page in self.disallowed_pages[user_agent]:
-                # If the disallowed page is empty, all pages can be accessed
-                if not disallowed_page:
-                    return True
+        matcher = self._matchers.get(self._agent(user_agent, self._matchers))
 
-                if page.startswith(disallowed_page):
-                    return False
-        else:
-            if user_agent != self.AnyUserAgent:
-                return self.can_access(page)
+        return matcher.can_access(page) if matcher else True
 
-        return True
+    def get_crawl_delay(self, user_agent=AnyUserAgent):
+        """ Returns the number of seconds to wait between visits to the host, or None if robots does not specify it """
+        return self.crawl_delays.get(self._agent(user_agent, self.rules))
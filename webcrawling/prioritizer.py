@@ -0,0 +1,107 @@
+import math
+from array import array
+from urllib.parse import urlparse
+
+import numpy as np
+
+from ranking.pagerank import PageRank
+
+
+class _HostRank(PageRank):
+    """ PageRank of the graph of links between hosts in CSR form, which is replaced between runs """
+    def __init__(self):
+        super().__init__(None)
+        self.graph = None
+
+    def _num_urls(self):
+        return len(self.graph[2])
+
+    def construct_graph(self, uncrawled_links=False):
+        indptr, indices, hosts = self.graph
+        graph = indptr, indices, dict(enumerate(hosts))
+
+        # All hosts are nodes of the graph
+        if uncrawled_links:
+            return graph + (np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int64))
+
+        return graph
+
+
+class Prioritizer:
+    """
+    Assigns URLs to front queues by how valuable they are likely to be, from signals the crawler has when the URL is
+    found: the number of crawled pages linking to it, its anchor text, the PageRank of its host in the graph of links
+    between hosts, and the depth of its path. Each signal is scaled to [0, 1] and weighted, and the combined score is
+    split into num_levels priorities, where a higher priority is more valuable.
+    A URL is prioritized once, when it is first found, so its in-links are mostly those of the page it was found on.
+    Queued URLs are not prioritized again as in-links accumulate, since most of the frontier is spilled to disk, so
+    the signal mainly favours URLs found on pages that are crawled late.
+    Any object with get_priority(url, in_degree, anchor_text) can be used by the crawler in its place.
+    """
+    # Number of in-links and of anchor text words at which those signals are at their highest
+    InLinkCap = 100
+    AnchorWordCap = 5
+
+    DefaultWeights = {'in_links': 0.4, 'anchor_text': 0.2, 'host_rank': 0.25, 'depth': 0.15}
+
+    def __init__(self, num_levels, weights=None):
+        self.num_levels = num_levels
+        self.weights = weights or self.DefaultWeights
+
+        # PageRank of hosts scaled such that the highest is 1, hosts not ranked yet have 0
+        self.host_ranks = dict()
+
+        # Hosts are numbered as they are found, and the host of each URL ID of the ranked link graph is kept, such
+        # that only URLs found since the last ranking are parsed. Iteration starts from the previous ranks
+        self._link_graph = None
+        self._host_ids = dict()
+        self._url_hosts = array('i')
+        self._host_rank = _HostRank()
+
+    def get_score(self, url, in_degree=0, anchor_text=''):
+        """ Returns the value of a URL between 0 and 1 """
+        parsed_url = urlparse(url)
+        depth = len([segment for segment in parsed_url.path.split('/') if segment])
+
+        signals = {
+            'in_links': min(math.log1p(in_degree) / math.log1p(self.InLinkCap), 1),
+            'anchor_text': min(len(anchor_text.split()) / self.AnchorWordCap, 1),
+            'host_rank': self.host_ranks.get(parsed_url.netloc, 0),
+            'depth': 1 / (1 + depth),
+        }
+
+        return sum(weight * signals[signal] for signal, weight in self.weights.items()) / sum(self.weights.values())
+
+    def get_priority(self, url, in_degree=0, anchor_text=''):
+        """ Returns the front queue of a URL, from 0 to num_levels - 1 where the last is the most valuable """
+        return min(int(self.get_score(url, in_degree, anchor_text) * self.num_levels), self.num_levels - 1)
+
+    def rank_hosts(self, link_graph):
+        """ Ranks hosts by PageRank of the graph of links between hosts, including hosts that are not crawled yet """
+        sources, targets, urls = link_graph.links()
+        if not len(sources):
+            return
+
+        # URL IDs are only appended, unless the graph was replaced, e.g. by resuming from a checkpoint
+        if link_graph is not self._link_graph:
+            self._link_graph = link_graph
+            self._host_ids = dict()
+            self._url_hosts = array('i')
+
+        for url in urls[len(self._url_hosts):]:
+            self._url_hosts.append(self._host_ids.setdefault(urlparse(url).netloc, len(self._host_ids)))
+
+        url_hosts = np.frombuffer(self._url_hosts, dtype=np.int32)
+        source_hosts, target_hosts = url_hosts[sources].astype(np.int64), url_hosts[targets].astype(np.int64)
+
+        # Links within a host do not make it more valuable, and links between the same hosts count once
+        num_hosts = len(self._host_ids)
+        between = source_hosts != target_hosts
+        host_links = np.unique(source_hosts[between] * num_hosts + target_hosts[between])
+        indptr = np.concatenate(([0], np.cumsum(np.bincount(host_links // num_hosts, minlength=num_hosts))))
+
+        self._host_rank.graph = indptr, (host_links % num_hosts).astype(np.int32), list(self._host_ids)
+        host_ranks = self._host_rank.rank()
+
+        highest_rank = max(rank for _, rank in host_ranks)
+        self.host_ranks = {host: rank / highest_rank for host, rank in host_ranks}
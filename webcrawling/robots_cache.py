@@ -0,0 +1,202 @@
+import contextlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from loguru import logger
+
+from webcrawling.parser.robots_parser import RobotsParser
+
+
+class _RobotsEntry:
+    __slots__ = ('parser', 'expires', 'referenced')
+
+    def __init__(self, parser, expires):
+        self.parser = parser
+        self.expires = expires
+
+        # Set by lookups without taking the lock, and cleared when eviction passes over the entry
+        self.referenced = False
+
+
+class RobotsCache:
+    """
+    Caches the parsed robots.txt of hosts. Lookups do not take a lock, and a host missing from the cache is fetched
+    once in the background however many threads ask for it, while the URLs that asked wait in the cache rather than
+    blocking their threads. Entries expire after a TTL and the cache is bounded, evicting hosts that were not looked
+    up recently first (by the clock approximation of LRU, such that lookups need not reorder anything).
+    """
+    # Default number of seconds before the robots.txt of a host is fetched again
+    DefaultTTL = 24 * 60 * 60
+
+    # Default number of hosts to keep robots.txt of
+    DefaultMaxHosts = 100000
+
+    # Default number of threads fetching robots.txt
+    DefaultWorkers = 16
+
+    def __init__(self, fetch, on_fetched=None, ttl=DefaultTTL, max_hosts=DefaultMaxHosts, workers=DefaultWorkers,
+                 lock=None):
+        # Function from a host to the text of its robots.txt, or None if it could not be fetched
+        self.fetch = fetch
+
+        # Function called with a host, its parser and the URLs that waited for it (if any), when robots.txt is fetched
+        # If a lock is given, it is held from taking the waiting URLs until on_fetched returns, such that a snapshot
+        # of the caller holding it finds the URLs either waiting or passed on
+        self.on_fetched = on_fetched
+        self._fetched_lock = lock or contextlib.nullcontext()
+
+        self.ttl = ttl
+        self.max_hosts = max_hosts
+
+        # The lock is only taken to modify the entries, or the fetches and the URLs waiting for them
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._fetches = dict()
+        self._waiting_urls = dict()
+
+        # Threads are only started once robots.txt is fetched
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='robots')
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, host):
+        return host in self._entries
+
+    def get(self, host):
+        """ Returns the parser of a host if it is cached and has not expired, without fetching it """
+        entry = self._entries.get(host)
+        if not entry or entry.expires <= time.monotonic():
+            return None
+
+        entry.referenced = True
+
+        return entry.parser
+
+    def put(self, host, robot_text):
+        """ Caches the robots.txt of a host, where None means that it could not be fetched """
+        # If robots could not be accessed, an empty parser is used which allows anything
+        parser = RobotsParser(robot_text=robot_text) if robot_text else RobotsParser()
+
+        with self._lock:
+            self._store(host, parser)
+
+        return parser
+
+    def request(self, host, url=None):
+        """
+        Returns the parser of a host, or None if it has not been fetched yet. In that case it is fetched in the
+        background, and the URL is passed to on_fetched along with the parser once it has been. If the entry has
+        expired, the old parser is returned while it is fetched again.
+        """
+        entry = self._entries.get(host)
+        if entry:
+            entry.referenced = True
+
+            if entry.expires <= time.monotonic():
+                self._start_fetch(host)
+
+            return entry.parser
+
+        with self._lock:
+            # The fetch may have completed since the entry was looked up
+            entry = self._entries.get(host)
+            if entry:
+                return entry.parser
+
+            if url is not None:
+                self._waiting_urls.setdefault(host, []).append(url)
+
+            self._start_fetch_locked(host)
+
+        return None
+
+    def wait(self, host):
+        """ Returns the parser of a host, waiting for it to be fetched if it is not cached """
+        while True:
+            parser = self.request(host)
+            if parser:
+                return parser
+
+            with self._lock:
+                fetch = self._fetches.get(host)
+
+            if fetch:
+                fetch.result()
+
+    def snapshot(self):
+        """
+        Returns the cached parsers as tuples (host, parser, seconds until it expires), and the URLs waiting for a fetch
+        by host, e.g. to restore them after a restart
+        """
+        now = time.monotonic()
+        with self._lock:
+            entries = [(host, entry.parser, entry.expires - now) for host, entry in self._entries.items()]
+            waiting_urls = {host: list(urls) for host, urls in self._waiting_urls.items()}
+
+        return entries, waiting_urls
+
+    def restore(self, entries, waiting_urls):
+        """ Restores parsers and waiting URLs from a snapshot, fetching robots.txt of hosts that URLs wait for """
+        now = time.monotonic()
+        with self._lock:
+            for host, parser, expires_in in entries:
+                self._store(host, parser)
+                self._entries[host].expires = now + expires_in
+
+        for host, urls in waiting_urls.items():
+            for url in urls:
+                with self._fetched_lock:
+                    parser = self.request(host, url)
+                    if parser and self.on_fetched:
+                        self.on_fetched(host, parser, [url])
+
+    def close(self):
+        """ Stops fetching, URLs waiting for a fetch that has not started are dropped """
+        self._executor.shutdown(wait=False)
+
+    def _start_fetch(self, host):
+        with self._lock:
+            self._start_fetch_locked(host)
+
+    def _start_fetch_locked(self, host):
+        if host not in self._fetches:
+            self._fetches[host] = self._executor.submit(self._fetch, host)
+
+    def _fetch(self, host):
+        try:
+            robot_text = self.fetch(host)
+        except Exception as e:
+            logger.error(f'Could not fetch robots.txt of {host}: {e}')
+            robot_text = None
+
+        parser = RobotsParser(robot_text=robot_text) if robot_text else RobotsParser()
+
+        with self._fetched_lock:
+            # Storing the entry and taking the waiting URLs happens at once, such that no URL is left waiting
+            with self._lock:
+                self._store(host, parser)
+                del self._fetches[host]
+                urls = self._waiting_urls.pop(host, [])
+
+            if self.on_fetched:
+                try:
+                    self.on_fetched(host, parser, urls)
+                except Exception as e:
+                    logger.error(f'Could not queue URLs of {host}: {e}')
+
+    def _store(self, host, parser):
+        """ Stores an entry, evicting others if the cache is full. Must be called with the lock held """
+        self._entries[host] = _RobotsEntry(parser, time.monotonic() + self.ttl)
+        self._entries.move_to_end(host)
+
+        # Entries looked up since eviction last passed them get a second chance by being moved to the back
+        while len(self._entries) > self.max_hosts:
+            oldest_host, oldest = next(iter(self._entries.items()))
+            if oldest.referenced:
+                oldest.referenced = False
+                self._entries.move_to_end(oldest_host)
+            else:
+                del self._entries[oldest_host]
@@ -0,0 +1,170 @@
+import os
+import pickle
+import shutil
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
+from tempfile import TemporaryDirectory
+
+
+def _link(source, destination):
+    """ Hard links a file, or copies it if links are not supported, e.g. since the paths are on other file systems """
+    try:
+        os.link(source, destination)
+    except FileExistsError:
+        raise
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+class SpillingQueue(Queue):
+    """
+    FIFO queue which only keeps the items at its head and tail in memory, and spills the items between them to disk.
+    Items put after the head is full are collected in the tail, which is written to a segment file once it holds
+    segment_size items. When the head runs empty it is refilled by the oldest segment, or from the tail if nothing
+    was spilled, so disk is only read and written a segment at a time. The oldest segment is read in the background
+    once the head runs low, such that a get holding the locks of callers does not wait for the disk or unpickling.
+    Blocking and timeouts are those of Queue.
+    """
+    # Default number of items in a segment, at most three times this number of items are in memory
+    DefaultSegmentSize = 100000
+
+    # Fraction of a segment left in the head when the next segment starts being read
+    PrefetchFraction = 0.5
+
+    def __init__(self, maxsize=0, path=None, segment_size=DefaultSegmentSize):
+        # Segments are written to a temporary directory that is removed with the queue, unless a path is given
+        self._directory = TemporaryDirectory(prefix='frontier') if path is None else None
+        self.path = self._directory.name if path is None else path
+        os.makedirs(self.path, exist_ok=True)
+
+        # The queue starts empty, so segments left in the path by a previous run are removed. They may be linked to
+        # by a checkpoint, so they are never written to again
+        for name in os.listdir(self.path):
+            if name.endswith('.pkl'):
+                os.remove(os.path.join(self.path, name))
+
+        self.segment_size = segment_size
+
+        # Segments are read by a single thread, which is only started once the first segment is read
+        self._reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix='segment-reader')
+
+        super().__init__(maxsize)
+
+    def _init(self, maxsize):
+        self._head = deque()
+        self._tail = []
+
+        # Numbers of the spilled segments from the oldest, and the total number of items in them
+        self._segments = deque()
+        self._next_segment = 0
+        self._num_spilled = 0
+
+        # The oldest segment and the future of its items, once it is being read
+        self._prefetch = None
+
+    def _qsize(self):
+        return len(self._head) + self._num_spilled + len(self._tail)
+
+    def _put(self, item):
+        # Items may only skip the tail while nothing is queued behind the head
+        if not self._tail and not self._segments and len(self._head) < self.segment_size:
+            self._head.append(item)
+        else:
+            self._tail.append(item)
+            if len(self._tail) >= self.segment_size:
+                self._spill()
+
+    def _get(self):
+        if not self._head:
+            self._refill()
+
+        item = self._head.popleft()
+
+        # Start reading the oldest segment, while the head still holds items to be taken in the meantime
+        if self._segments and self._prefetch is None and len(self._head) <= self.segment_size * self.PrefetchFraction:
+            segment = self._segments[0]
+            self._prefetch = segment, self._reader.submit(self._read_segment, segment)
+
+        return item
+
+    def _segment_path(self, segment):
+        return os.path.join(self.path, f'{segment:08d}.pkl')
+
+    def _spill(self):
+        with open(self._segment_path(self._next_segment), 'wb') as file:
+            pickle.dump(self._tail, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+        self._segments.append(self._next_segment)
+        self._next_segment += 1
+        self._num_spilled += len(self._tail)
+        self._tail = []
+
+    def _read_segment(self, segment):
+        with open(self._segment_path(segment), 'rb') as file:
+            return pickle.load(file)
+
+    def _refill(self):
+        if self._segments:
+            # The segment has usually been read in the background already
+            segment = self._segments.popleft()
+            if self._prefetch is not None and self._prefetch[0] == segment:
+                items = self._prefetch[1].result()
+            else:
+                items = self._read_segment(segment)
+            self._prefetch = None
+
+            os.remove(self._segment_path(segment))
+            self._num_spilled -= len(items)
+        else:
+            items, self._tail = self._tail, []
+
+        self._head.extend(items)
+
+    def checkpoint(self, path):
+        """
+        Links the spilled segments into a directory, rather than reading them, and returns the items in memory and the
+        names of the linked segments, which restore appends to a queue. Segments are never written after spilling, so
+        the links stay valid after the queue removes them.
+        """
+        os.makedirs(path, exist_ok=True)
+
+        with self.mutex:
+            names = []
+            for segment in self._segments:
+                name = os.path.basename(self._segment_path(segment))
+                _link(self._segment_path(segment), os.path.join(path, name))
+                names.append(name)
+
+            return {'head': list(self._head), 'segments': names, 'num_spilled': self._num_spilled,
+                    'tail': list(self._tail)}
+
+    def restore(self, path, state):
+        """ Appends the items of a checkpoint taken by checkpoint, linking its segments from the directory at path """
+        with self.mutex:
+            for item in state['head']:
+                self._put(item)
+
+            if state['segments']:
+                # The items queued so far are spilled first, such that they stay ahead of the linked segments
+                if self._tail:
+                    self._spill()
+
+                for name in state['segments']:
+                    _link(os.path.join(path, name), self._segment_path(self._next_segment))
+                    self._segments.append(self._next_segment)
+                    self._next_segment += 1
+                self._num_spilled += state['num_spilled']
+
+            for item in state['tail']:
+                self._put(item)
+
+            self.not_empty.notify_all()
+
+    def items(self):
+        """ Returns a copy of all items in order, reading the spilled ones. Must be called holding the mutex """
+        items = list(self._head)
+        for segment in self._segments:
+            items.extend(self._read_segment(segment))
+
+        return items + self._tail
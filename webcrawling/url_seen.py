@@ -0,0 +1,172 @@
+import math
+import threading
+from array import array
+from hashlib import blake2b
+
+
+def fingerprint(url):
+    """ Returns a 64-bit fingerprint of a URL, which is never 0 as that marks an empty slot """
+    return int.from_bytes(blake2b(url.encode(), digest_size=8).digest(), 'little') or 1
+
+
+class UrlSeenSet:
+    """
+    Set of seen URLs which stores 64-bit fingerprints rather than the URLs, in an open addressing hash table.
+    Two URLs sharing a fingerprint is unlikely enough (about one in 10^7 at a million URLs) to be ignored.
+    """
+    # Number of slots that the table starts with, which is always a power of two
+    InitialSlots = 1 << 16
+
+    # Fraction of slots in use at which the table doubles
+    MaxLoad = 0.7
+
+    def __init__(self, capacity=0):
+        slots = self.InitialSlots
+        while slots * self.MaxLoad < capacity:
+            slots *= 2
+
+        self._lock = threading.Lock()
+        self._slots = array('Q', bytes(8 * slots))
+        self._size = 0
+
+    def add(self, url):
+        """ Adds a URL, returns False if it had already been seen """
+        url_fingerprint = fingerprint(url)
+
+        with self._lock:
+            if not self._insert(self._slots, url_fingerprint):
+                return False
+
+            self._size += 1
+            if self._size > len(self._slots) * self.MaxLoad:
+                self._grow()
+
+            return True
+
+    def _insert(self, slots, url_fingerprint):
+        # Linear probing from the slot of the fingerprint, until it or an empty slot is found
+        mask = len(slots) - 1
+        slot = url_fingerprint & mask
+        while True:
+            current = slots[slot]
+            if current == url_fingerprint:
+                return False
+
+            if not current:
+                slots[slot] = url_fingerprint
+
+                return True
+
+            slot = (slot + 1) & mask
+
+    def _grow(self):
+        slots = array('Q', bytes(16 * len(self._slots)))
+        for url_fingerprint in self._slots:
+            if url_fingerprint:
+                self._insert(slots, url_fingerprint)
+
+        self._slots = slots
+
+    def __contains__(self, url):
+        url_fingerprint = fingerprint(url)
+
+        with self._lock:
+            mask = len(self._slots) - 1
+            slot = url_fingerprint & mask
+            while self._slots[slot]:
+                if self._slots[slot] == url_fingerprint:
+                    return True
+
+                slot = (slot + 1) & mask
+
+            return False
+
+    def __len__(self):
+        return self._size
+
+    def get_memory_usage(self):
+        """ Returns the number of bytes used by the table """
+        return len(self._slots) * self._slots.itemsize
+
+    def copy(self):
+        seen = UrlSeenSet.__new__(UrlSeenSet)
+        with self._lock:
+            seen.__setstate__((array('Q', self._slots), self._size))
+
+        return seen
+
+    def __getstate__(self):
+        # The lock cannot be pickled
+        with self._lock:
+            return self._slots, self._size
+
+    def __setstate__(self, state):
+        self._slots, self._size = state
+        self._lock = threading.Lock()
+
+
+class UrlBloomFilter:
+    """
+    Set of seen URLs as a Bloom filter, sized for a number of URLs and a rate of false positives, i.e. unseen URLs
+    reported as seen, which the crawler then skips. Uses a fraction of the memory of a UrlSeenSet (about 2 bytes per
+    URL at a rate of 10^-3), but the rate grows once the capacity is exceeded.
+    """
+    DefaultFalsePositiveRate = 0.001
+
+    def __init__(self, capacity, false_positive_rate=DefaultFalsePositiveRate):
+        # The optimal number of bits and hash functions for the capacity and rate
+        self.num_bits = max(int(math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2)), 8)
+        self.num_hashes = max(int(round(self.num_bits / max(capacity, 1) * math.log(2))), 1)
+
+        self._lock = threading.Lock()
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self._size = 0
+
+    def _positions(self, url):
+        # The hash functions are combinations of two halves of one digest, which is as good as independent hashes
+        digest = blake2b(url.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+
+        return [(first + i * second) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, url):
+        """ Adds a URL, returns False if it had already been seen (or is a false positive) """
+        positions = self._positions(url)
+
+        with self._lock:
+            seen = True
+            for position in positions:
+                byte, bit = position >> 3, 1 << (position & 7)
+                if not self._bits[byte] & bit:
+                    self._bits[byte] |= bit
+                    seen = False
+
+            if not seen:
+                self._size += 1
+
+            return not seen
+
+    def __contains__(self, url):
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(url))
+
+    def __len__(self):
+        return self._size
+
+    def get_memory_usage(self):
+        """ Returns the number of bytes used by the filter """
+        return len(self._bits)
+
+    def copy(self):
+        seen = UrlBloomFilter.__new__(UrlBloomFilter)
+        with self._lock:
+            seen.__setstate__((self.num_bits, self.num_hashes, bytearray(self._bits), self._size))
+
+        return seen
+
+    def __getstate__(self):
+        with self._lock:
+            return self.num_bits, self.num_hashes, self._bits, self._size
+
+    def __setstate__(self, state):
+        self.num_bits, self.num_hashes, self._bits, self._size = state
+        self._lock = threading.Lock()